@@ -161,13 +161,13 @@ contract Operations{
     );
 
     // --- Save Initial Paddy Record ---
-    function saveInitialPaddyRecord(
+    function _saveInitialPaddyRecord(
         string calldata userId,
         string calldata paddyType,
         uint256 quantity,
         uint256 date,
         bool status
-    ) external returns (uint256) {
+    ) internal returns (uint256) {
         uint256 recordId = nextPaddyRecordId;
         if (recordId == 0) {
             recordId = 1;
@@ -194,6 +194,42 @@ contract Operations{
         return recordId;
     }
 
+    function saveInitialPaddyRecord(
+        string calldata userId,
+        string calldata paddyType,
+        uint256 quantity,
+        uint256 date,
+        bool status
+    ) external returns (uint256) {
+        return _saveInitialPaddyRecord(userId, paddyType, quantity, date, status);
+    }
+
+    // --- Batch Initial Paddy Records ---
+    // One transaction for many records: emits one event per element, exactly as the
+    // single-record function does. Ids are consecutive from the returned first id.
+    function saveInitialPaddyRecordsBatch(
+        string[] calldata userIds,
+        string[] calldata paddyTypes,
+        uint256[] calldata quantities,
+        uint256[] calldata dates,
+        bool[] calldata statuses
+    ) external returns (uint256 firstRecordId) {
+        uint256 n = userIds.length;
+        require(
+            paddyTypes.length == n &&
+            quantities.length == n &&
+            dates.length == n &&
+            statuses.length == n,
+            "Array length mismatch"
+        );
+        for (uint256 i = 0; i < n; i++) {
+            uint256 id = _saveInitialPaddyRecord(userIds[i], paddyTypes[i], quantities[i], dates[i], statuses[i]);
+            if (i == 0) {
+                firstRecordId = id;
+            }
+        }
+    }
+
     // --- Save Initial Rice Record ---
     function saveInitialRiceRecord(
         string calldata userId,
@@ -228,17 +264,15 @@ contract Operations{
         return recordId;
     }
 
-    // (bulk-save removed)
-
     // --- Transaction recording ---
-    function recordTransaction(
+    function _recordTransaction(
         string calldata fromParty,
         string calldata toParty,
         string calldata productType,
         uint256 quantity,
         uint256 price,
         bool status
-    ) external returns (uint256) {
+    ) internal returns (uint256) {
         uint256 txId = nextTxId;
         // initialize nextTxId if zero (start at 1)
         if (txId == 0) {
@@ -264,15 +298,52 @@ contract Operations{
         return txId;
     }
 
+    function recordTransaction(
+        string calldata fromParty,
+        string calldata toParty,
+        string calldata productType,
+        uint256 quantity,
+        uint256 price,
+        bool status
+    ) external returns (uint256) {
+        return _recordTransaction(fromParty, toParty, productType, quantity, price, status);
+    }
+
+    // --- Batch Transaction recording ---
+    function recordTransactionsBatch(
+        string[] calldata fromParties,
+        string[] calldata toParties,
+        string[] calldata productTypes,
+        uint256[] calldata quantities,
+        uint256[] calldata prices,
+        bool[] calldata statuses
+    ) external returns (uint256 firstTxId) {
+        uint256 n = fromParties.length;
+        require(
+            toParties.length == n &&
+            productTypes.length == n &&
+            quantities.length == n &&
+            prices.length == n &&
+            statuses.length == n,
+            "Array length mismatch"
+        );
+        for (uint256 i = 0; i < n; i++) {
+            uint256 id = _recordTransaction(fromParties[i], toParties[i], productTypes[i], quantities[i], prices[i], statuses[i]);
+            if (i == 0) {
+                firstTxId = id;
+            }
+        }
+    }
+
     // --- Rice Transaction recording ---
-    function recordRiceTransaction(
+    function _recordRiceTransaction(
         string calldata fromParty,
         string calldata toParty,
         string calldata riceType,
         uint256 quantity,
         uint256 price,
         bool status
-    ) external returns (uint256) {
+    ) internal returns (uint256) {
         uint256 riceTxId = nextRiceTxId;
         // initialize nextRiceTxId if zero (start at 1)
         if (riceTxId == 0) {
@@ -298,14 +369,51 @@ contract Operations{
         return riceTxId;
     }
 
+    function recordRiceTransaction(
+        string calldata fromParty,
+        string calldata toParty,
+        string calldata riceType,
+        uint256 quantity,
+        uint256 price,
+        bool status
+    ) external returns (uint256) {
+        return _recordRiceTransaction(fromParty, toParty, riceType, quantity, price, status);
+    }
+
+    // --- Batch Rice Transaction recording ---
+    function recordRiceTransactionsBatch(
+        string[] calldata fromParties,
+        string[] calldata toParties,
+        string[] calldata riceTypes,
+        uint256[] calldata quantities,
+        uint256[] calldata prices,
+        bool[] calldata statuses
+    ) external returns (uint256 firstRiceTxId) {
+        uint256 n = fromParties.length;
+        require(
+            toParties.length == n &&
+            riceTypes.length == n &&
+            quantities.length == n &&
+            prices.length == n &&
+            statuses.length == n,
+            "Array length mismatch"
+        );
+        for (uint256 i = 0; i < n; i++) {
+            uint256 id = _recordRiceTransaction(fromParties[i], toParties[i], riceTypes[i], quantities[i], prices[i], statuses[i]);
+            if (i == 0) {
+                firstRiceTxId = id;
+            }
+        }
+    }
+
     // --- Record Damage ---
-    function recordDamage(
+    function _recordDamage(
         string calldata userId,
         string calldata paddyType,
         uint256 quantity,
         uint256 damageDate,
         string calldata reason
-    ) external returns (uint256) {
+    ) internal returns (uint256) {
         uint256 damageId = nextDamageId;
         if (damageId == 0) {
             damageId = 1;
@@ -332,15 +440,49 @@ contract Operations{
         return damageId;
     }
 
+    function recordDamage(
+        string calldata userId,
+        string calldata paddyType,
+        uint256 quantity,
+        uint256 damageDate,
+        string calldata reason
+    ) external returns (uint256) {
+        return _recordDamage(userId, paddyType, quantity, damageDate, reason);
+    }
+
+    // --- Batch Damage recording ---
+    function recordDamagesBatch(
+        string[] calldata userIds,
+        string[] calldata paddyTypes,
+        uint256[] calldata quantities,
+        uint256[] calldata damageDates,
+        string[] calldata reasons
+    ) external returns (uint256 firstDamageId) {
+        uint256 n = userIds.length;
+        require(
+            paddyTypes.length == n &&
+            quantities.length == n &&
+            damageDates.length == n &&
+            reasons.length == n,
+            "Array length mismatch"
+        );
+        for (uint256 i = 0; i < n; i++) {
+            uint256 id = _recordDamage(userIds[i], paddyTypes[i], quantities[i], damageDates[i], reasons[i]);
+            if (i == 0) {
+                firstDamageId = id;
+            }
+        }
+    }
+
     // --- Record Milling ---
-    function recordMilling(
+    function _recordMilling(
         uint256 inputPaddy,
         uint256 outputRice,
         uint256 dateTime,
         string calldata paddyType,
         uint256 dryingDuration,
         bool status
-    ) external returns (uint256) {
+    ) internal returns (uint256) {
         uint256 millingId = nextMillingRecordId;
         if (millingId == 0) {
             millingId = 1;
@@ -369,6 +511,43 @@ contract Operations{
         return millingId;
     }
 
+    function recordMilling(
+        uint256 inputPaddy,
+        uint256 outputRice,
+        uint256 dateTime,
+        string calldata paddyType,
+        uint256 dryingDuration,
+        bool status
+    ) external returns (uint256) {
+        return _recordMilling(inputPaddy, outputRice, dateTime, paddyType, dryingDuration, status);
+    }
+
+    // --- Batch Milling recording ---
+    function recordMillingsBatch(
+        uint256[] calldata inputPaddies,
+        uint256[] calldata outputRices,
+        uint256[] calldata dateTimes,
+        string[] calldata paddyTypes,
+        uint256[] calldata dryingDurations,
+        bool[] calldata statuses
+    ) external returns (uint256 firstMillingId) {
+        uint256 n = inputPaddies.length;
+        require(
+            outputRices.length == n &&
+            dateTimes.length == n &&
+            paddyTypes.length == n &&
+            dryingDurations.length == n &&
+            statuses.length == n,
+            "Array length mismatch"
+        );
+        for (uint256 i = 0; i < n; i++) {
+            uint256 id = _recordMilling(inputPaddies[i], outputRices[i], dateTimes[i], paddyTypes[i], dryingDurations[i], statuses[i]);
+            if (i == 0) {
+                firstMillingId = id;
+            }
+        }
+    }
+
     // --- Record Rice Damage ---
     function recordRiceDamage(
         string calldata userId,
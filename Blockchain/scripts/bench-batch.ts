@@ -0,0 +1,92 @@
+import { network } from "hardhat";
+
+// Compares recordTransaction against recordTransactionsBatch on a local chain:
+// gas per record and records per second, for RECORDS records in total.
+//
+//   npx hardhat run scripts/bench-batch.ts
+//   BENCH_NETWORK=operations npx hardhat run scripts/bench-batch.ts   (running node on 8546)
+
+const RECORDS = Number(process.env.BENCH_RECORDS ?? 200);
+const BATCH_SIZES = (process.env.BENCH_BATCH_SIZES ?? "10,50,100")
+  .split(",")
+  .map(Number);
+
+const { viem } = await network.connect({
+  network: process.env.BENCH_NETWORK ?? "hardhatMainnet",
+});
+
+const publicClient = await viem.getPublicClient();
+const operations = await viem.deployContract("Operations");
+
+console.log("Operations deployed at", operations.address);
+console.log(`Recording ${RECORDS} transactions per run\n`);
+
+function record(i: number) {
+  return {
+    fromParty: `FAR${String(i % 1000).padStart(6, "0")}`,
+    toParty: `COL${String(i % 100).padStart(6, "0")}`,
+    productType: "Samba",
+    quantity: BigInt(100 + (i % 50)),
+    price: 12550n,
+    status: true,
+  };
+}
+
+async function run(label: string, send: () => Promise<`0x${string}`[]>) {
+  const start = performance.now();
+  const hashes = await send();
+  const receipts = await Promise.all(
+    hashes.map((hash) => publicClient.waitForTransactionReceipt({ hash })),
+  );
+  const seconds = (performance.now() - start) / 1000;
+
+  const gas = receipts.reduce((sum, r) => sum + r.gasUsed, 0n);
+  const failed = receipts.filter((r) => r.status !== "success").length;
+  console.log(
+    `${label.padEnd(12)} txs=${String(hashes.length).padStart(4)}` +
+      `  gas/record=${String(gas / BigInt(RECORDS)).padStart(7)}` +
+      `  records/s=${(RECORDS / seconds).toFixed(1).padStart(8)}` +
+      (failed ? `  FAILED=${failed}` : ""),
+  );
+}
+
+await run("single", async () => {
+  const hashes: `0x${string}`[] = [];
+  for (let i = 0; i < RECORDS; i++) {
+    const r = record(i);
+    hashes.push(
+      await operations.write.recordTransaction([
+        r.fromParty,
+        r.toParty,
+        r.productType,
+        r.quantity,
+        r.price,
+        r.status,
+      ]),
+    );
+  }
+  return hashes;
+});
+
+for (const size of BATCH_SIZES) {
+  await run(`batch(${size})`, async () => {
+    const hashes: `0x${string}`[] = [];
+    for (let offset = 0; offset < RECORDS; offset += size) {
+      const rows = Array.from(
+        { length: Math.min(size, RECORDS - offset) },
+        (_, i) => record(offset + i),
+      );
+      hashes.push(
+        await operations.write.recordTransactionsBatch([
+          rows.map((r) => r.fromParty),
+          rows.map((r) => r.toParty),
+          rows.map((r) => r.productType),
+          rows.map((r) => r.quantity),
+          rows.map((r) => r.price),
+          rows.map((r) => r.status),
+        ]),
+      );
+    }
+    return hashes;
+  });
+}
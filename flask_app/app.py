@@ -1,501 +1,82 @@
 from flask import Flask, render_template, request, jsonify, session
+import logging
 import os
 from dotenv import load_dotenv
+import logging_config
+# before blockchain is imported: it logs the chain connection state on import
+logging_config.configure()
 import mysql.connector
 import datetime
-from blockchain import add_farmer, add_miller, add_collector, add_wholesaler, add_retailer, add_brewer, add_animal_food, add_exporter, update_farmer, update_miller, update_collector, update_wholesaler, update_retailer, update_brewer, update_animal_food, update_exporter, record_transaction, record_damage, record_milling, record_rice_transaction, revert_rice_transaction, record_rice_damage
+from blockchain import add_farmer, add_miller, add_collector, add_wholesaler, add_retailer, add_brewer, add_animal_food, add_exporter, update_farmer, update_miller, update_collector, update_wholesaler, update_retailer, update_brewer, update_animal_food, update_exporter, record_damage, record_milling, record_rice_damage
 from mysql.connector import errorcode
 # (Blockchain integration removed) This application no longer attempts to register users on-chain.
 # load .env from project root if present
 
 load_dotenv()
 
+# named explicitly: __name__ is '__main__' when started with `python app.py`
+logger = logging.getLogger('app')
+
 app = Flask(__name__)
 # server-side sessions: set a secret key (override with FLASK_SECRET in prod)
 app.secret_key = os.environ.get('FLASK_SECRET', 'dev-secret')
-# MySQL configuration - change via environment variables or edit below
-MYSQL_HOST = os.environ.get('MYSQL_HOST', '127.0.0.1')
-MYSQL_PORT = int(os.environ.get('MYSQL_PORT', 3306))
-MYSQL_USER = os.environ.get('MYSQL_USER', 'root')
-MYSQL_PASSWORD = os.environ.get('MYSQL_PASSWORD', '')
-MYSQL_DATABASE = os.environ.get('MYSQL_DATABASE', 'rice_supply')
-
-
-def get_connection(db=None):
-    cfg = {
-        'host': MYSQL_HOST,
-        'user': MYSQL_USER,
-        'password': MYSQL_PASSWORD,
-        'port': MYSQL_PORT,
-        'autocommit': True,
-    }
-    if db:
-        cfg['database'] = db
-    return mysql.connector.connect(**cfg)
+# MySQL configuration and pooled connections live in db.py (MYSQL_* env vars, MYSQL_POOL_* for the pool)
+import db as _db
+import metrics
+from db import MYSQL_DATABASE, get_connection
+
+# return connections that a request did not close back to the pool
+_db.init_app(app)
+# per-route latency / SQL / chain timings, served on /metrics
+metrics.init_app(app)
+import outbox
+import id_sequence
+import indexer
+import dashboard
+import date_window
+import export
+import farmer_contribution
+import keyset
+import migrations
+import resource_version
+import response_cache
+import roles
+import stock_rollup
+import stock_snapshots
+import transaction_batch
+import user_directory
+import user_import
+
+
+@app.before_request
+def _start_background_workers():
+    # started lazily so only the serving process (not the reloader parent) runs them
+    outbox.ensure_worker()
+    indexer.ensure_worker()
+    stock_snapshots.ensure_worker()
+    resource_version.ensure_worker()
 
 
 def init_db():
-    # Create database if not exists and create users table
+    # Bring the schema up to date; only migrations newer than the recorded version run
+    try:
+        before, after = migrations.migrate()
+        if after != before:
+            logger.info('Database migrated from version %s to %s.', before, after)
+        else:
+            logger.info('Database schema at version %s.', after)
+    except mysql.connector.Error as err:
+        logger.error('Failed initializing database: %s', err)
+        return
+    # remember how stored user types map to roles
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{MYSQL_DATABASE}` DEFAULT CHARACTER SET 'utf8mb4' COLLATE 'utf8mb4_unicode_ci';")
-        cursor.close()
-        conn.close()
-
-        conn = get_connection(MYSQL_DATABASE)
-        cursor = conn.cursor()
-        create_table = '''
-        CREATE TABLE IF NOT EXISTS users (
-            id varchar(255) PRIMARY KEY,
-            user_type VARCHAR(50) NOT NULL,
-            nic VARCHAR(64),
-            full_name VARCHAR(255),
-            company_register_number VARCHAR(128),
-            company_name VARCHAR(255),
-            address TEXT,
-            district VARCHAR(128),
-            contact_number VARCHAR(64),
-            password VARCHAR(255),
-            total_area_of_paddy_land VARCHAR(64),
-            block_hash VARCHAR(255),
-            block_number INT,
-            transaction_hash VARCHAR(255),
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        '''
-        cursor.execute(create_table)
-        # Add new columns if they don't exist
-        try:
-            cursor.execute("ALTER TABLE `users` ADD COLUMN block_number INT AFTER block_hash")
-        except mysql.connector.Error:
-            pass  # Column already exists
-        try:
-            cursor.execute("ALTER TABLE `users` ADD COLUMN transaction_hash VARCHAR(255) AFTER block_number")
-        except mysql.connector.Error:
-            pass  # Column already exists
-        cursor.close()
-        conn.close()
-        # Create transactions table to record transfers/purchases
-        conn = get_connection(MYSQL_DATABASE)
-        cursor = conn.cursor()
-        create_tx = '''
-        CREATE TABLE IF NOT EXISTS `transaction` (
-            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
-            `from` VARCHAR(255),
-            `to` VARCHAR(255),
-            `type` VARCHAR(100),
-            quantity DECIMAL(14,3),
-            `datetime` DATETIME,
-            block_hash VARCHAR(255),
-            block_number INT,
-            transaction_hash VARCHAR(255),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        '''
-        try:
-            cursor.execute(create_tx)
-            # Add new columns if they don't exist
-            try:
-                cursor.execute("ALTER TABLE `transaction` ADD COLUMN block_number INT AFTER block_hash")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            try:
-                cursor.execute("ALTER TABLE `transaction` ADD COLUMN transaction_hash VARCHAR(255) AFTER block_number")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            try:
-                cursor.execute("ALTER TABLE `transaction` ADD COLUMN status TINYINT(1) DEFAULT 1 AFTER `quantity`")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            try:
-                cursor.execute("ALTER TABLE `transaction` ADD COLUMN price DECIMAL(14,3) AFTER `quantity`")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            try:
-                cursor.execute("ALTER TABLE `transaction` DROP COLUMN is_reverted")
-            except mysql.connector.Error:
-                pass  # Column doesn't exist
-        except mysql.connector.Error as e:
-            # Log and continue; table creation is best-effort
-            print('Could not create transaction table:', e)
-        finally:
-            cursor.close()
-            conn.close()
-        # Create stock table to track per-user stock levels
-        conn = get_connection(MYSQL_DATABASE)
-        cursor = conn.cursor()
-        create_stock = '''
-        CREATE TABLE IF NOT EXISTS `stock` (
-            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
-            user_id varchar(255),
-            `type` VARCHAR(128),
-            amount DECIMAL(20,3) DEFAULT 0,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            INDEX (user_id),
-            INDEX (`type`)
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        '''
-        try:
-            cursor.execute(create_stock)
-        except mysql.connector.Error as e:
-            print('Could not create stock table:', e)
-        finally:
-            cursor.close()
-            conn.close()
-        # Create paddy_type table to store available paddy types
-        conn = get_connection(MYSQL_DATABASE)
-        cursor = conn.cursor()
-        create_paddy = '''
-        CREATE TABLE IF NOT EXISTS `paddy_type` (
-            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
-            name VARCHAR(255),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        '''
-        try:
-            cursor.execute(create_paddy)
-        except mysql.connector.Error as e:
-            print('Could not create paddy_type table:', e)
-        finally:
-            cursor.close()
-            conn.close()
-        # Create damage table to track damaged inventory
-        conn = get_connection(MYSQL_DATABASE)
-        cursor = conn.cursor()
-        create_damage = '''
-        CREATE TABLE IF NOT EXISTS `damage` (
-            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
-            user_id VARCHAR(255),
-            paddy_type VARCHAR(128),
-            quantity DECIMAL(14,3),
-            reason TEXT,
-            damage_date DATETIME,
-            block_hash VARCHAR(255),
-            block_number INT,
-            transaction_hash VARCHAR(255),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            INDEX (user_id),
-            INDEX (paddy_type)
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        '''
-        try:
-            cursor.execute(create_damage)
-            # Add new columns if they don't exist
-            try:
-                cursor.execute("ALTER TABLE `damage` ADD COLUMN block_number INT AFTER block_hash")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            try:
-                cursor.execute("ALTER TABLE `damage` ADD COLUMN transaction_hash VARCHAR(255) AFTER block_number")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            try:
-                cursor.execute("ALTER TABLE `damage` ADD COLUMN reverted INT DEFAULT 0 AFTER transaction_hash")
-            except mysql.connector.Error:
-                pass  # Column already exists
-        except mysql.connector.Error as e:
-            print('Could not create damage table:', e)
-        finally:
-            cursor.close()
-            conn.close()
-        # Create milling table to track milling process
-        conn = get_connection(MYSQL_DATABASE)
-        cursor = conn.cursor()
-        create_milling = '''
-        CREATE TABLE IF NOT EXISTS `milling` (
-            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
-            miller_id VARCHAR(255),
-            paddy_type VARCHAR(128),
-            input_paddy DECIMAL(14,3),
-            output_rice DECIMAL(14,3),
-            milling_date DATE,
-            drying_duration INT,
-            status BOOLEAN DEFAULT FALSE,
-            block_hash VARCHAR(255),
-            block_number INT,
-            transaction_hash VARCHAR(255),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            INDEX (miller_id),
-            INDEX (paddy_type)
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        '''
-        try:
-            cursor.execute(create_milling)
-            # Add new columns if they don't exist
-            try:
-                cursor.execute("ALTER TABLE `milling` ADD COLUMN block_number INT AFTER block_hash")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            try:
-                cursor.execute("ALTER TABLE `milling` ADD COLUMN transaction_hash VARCHAR(255) AFTER block_number")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            try:
-                cursor.execute("ALTER TABLE `milling` ADD COLUMN drying_duration INT AFTER milling_date")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            try:
-                cursor.execute("ALTER TABLE `milling` ADD COLUMN status BOOLEAN DEFAULT FALSE AFTER drying_duration")
-            except mysql.connector.Error:
-                pass  # Column already exists
-        except mysql.connector.Error as e:
-            print('Could not create milling table:', e)
-        finally:
-            cursor.close()
-            conn.close()
-        # Create rice_stock table to track rice inventory from milling
-        conn = get_connection(MYSQL_DATABASE)
-        cursor = conn.cursor()
-        create_rice_stock = '''
-        CREATE TABLE IF NOT EXISTS `rice_stock` (
-            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
-            miller_id VARCHAR(255),
-            paddy_type VARCHAR(128),
-            quantity DECIMAL(14,3),
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            INDEX (miller_id),
-            INDEX (paddy_type)
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        '''
-        try:
-            cursor.execute(create_rice_stock)
-        except mysql.connector.Error as e:
-            print('Could not create rice_stock table:', e)
-        finally:
-            cursor.close()
-            conn.close()
-        
-        # Create rice_transaction table to track rice transactions (Miller -> Wholesaler/Retailer/etc)
-        conn = get_connection(MYSQL_DATABASE)
-        cursor = conn.cursor()
-        create_rice_tx = '''
-        CREATE TABLE IF NOT EXISTS `rice_transaction` (
-            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
-            `from` VARCHAR(255),
-            `to` VARCHAR(255),
-            rice_type VARCHAR(100),
-            quantity DECIMAL(14,3),
-            `datetime` DATETIME,
-            block_hash VARCHAR(255),
-            block_number INT,
-            transaction_hash VARCHAR(255),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            INDEX (`from`),
-            INDEX (`to`)
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        '''
-        try:
-            cursor.execute(create_rice_tx)
-            # Add new columns if they don't exist
-            try:
-                cursor.execute("ALTER TABLE `rice_transaction` ADD COLUMN block_number INT AFTER block_hash")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            try:
-                cursor.execute("ALTER TABLE `rice_transaction` ADD COLUMN transaction_hash VARCHAR(255) AFTER block_number")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            try:
-                cursor.execute("ALTER TABLE `rice_transaction` ADD COLUMN price DECIMAL(14,3) AFTER `quantity`")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            try:
-                cursor.execute("ALTER TABLE `rice_transaction` ADD COLUMN reverted TINYINT(1) DEFAULT 0 AFTER `price`")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            try:
-                cursor.execute("ALTER TABLE `rice_transaction` DROP COLUMN is_reverted")
-            except mysql.connector.Error:
-                pass  # Column doesn't exist
-        except mysql.connector.Error as e:
-            print('Could not create rice_transaction table:', e)
-        finally:
-            cursor.close()
-            conn.close()
-        
-        # Create rice_damage table to track rice damage (Wholesaler/Retailer/etc)
-        conn = get_connection(MYSQL_DATABASE)
-        cursor = conn.cursor()
-        create_rice_damage = '''
-        CREATE TABLE IF NOT EXISTS `rice_damage` (
-            id INT NOT NULL PRIMARY KEY,
-            user_id VARCHAR(255),
-            rice_type VARCHAR(128),
-            quantity DECIMAL(14,3),
-            reason TEXT,
-            damage_date DATETIME,
-            block_hash VARCHAR(255),
-            block_number INT,
-            transaction_hash VARCHAR(255),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            INDEX (user_id),
-            INDEX (rice_type)
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        '''
-        try:
-            cursor.execute(create_rice_damage)
-            # Add new columns if they don't exist
-            try:
-                cursor.execute("ALTER TABLE `rice_damage` ADD COLUMN block_number INT AFTER block_hash")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            try:
-                cursor.execute("ALTER TABLE `rice_damage` ADD COLUMN transaction_hash VARCHAR(255) AFTER block_number")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            try:
-                cursor.execute("ALTER TABLE `rice_damage` ADD COLUMN reverted INT DEFAULT 0 AFTER transaction_hash")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            try:
-                cursor.execute("ALTER TABLE `rice_damage` DROP COLUMN rice_damage_id")
-            except mysql.connector.Error:
-                pass  # Column doesn't exist
-        except mysql.connector.Error as e:
-            print('Could not create rice_damage table:', e)
-        finally:
-            cursor.close()
-            conn.close()
-
-        # Create initial_paddy table to track initial paddy amounts for farmers
-        conn = get_connection(MYSQL_DATABASE)
-        cursor = conn.cursor()
-        create_initial_paddy = '''
-        CREATE TABLE IF NOT EXISTS `initial_paddy` (
-            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
-            user_id VARCHAR(255),
-            paddy_type VARCHAR(128),
-            quantity DECIMAL(14,3),
-            reverted TINYINT DEFAULT 0,
-            block_number INT,
-            transaction_id VARCHAR(255),
-            block_hash VARCHAR(255),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-            INDEX (user_id),
-            INDEX (paddy_type)
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        '''
-        try:
-            cursor.execute(create_initial_paddy)
-            # Migrate status column to reverted if it exists
-            try:
-                cursor.execute("ALTER TABLE `initial_paddy` CHANGE COLUMN status reverted TINYINT DEFAULT 0")
-            except mysql.connector.Error:
-                pass  # Column doesn't exist or already renamed
-            # Add paddy_type column if it doesn't exist (for existing tables)
-            try:
-                cursor.execute("ALTER TABLE `initial_paddy` ADD COLUMN paddy_type VARCHAR(128) AFTER user_id")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            # Rename initial_paddy to quantity if needed
-            try:
-                cursor.execute("ALTER TABLE `initial_paddy` CHANGE COLUMN initial_paddy quantity DECIMAL(14,3)")
-            except mysql.connector.Error:
-                pass  # Column already renamed or doesn't exist
-            # Add reverted column if missing (replacing old status)
-            try:
-                cursor.execute("ALTER TABLE `initial_paddy` ADD COLUMN reverted TINYINT DEFAULT 0 AFTER quantity")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            # Drop original_reverted column if it exists
-            try:
-                cursor.execute("ALTER TABLE `initial_paddy` DROP COLUMN `original_reverted`")
-            except mysql.connector.Error:
-                pass  # Column doesn't exist
-            # Add blockchain columns if missing
-            try:
-                cursor.execute("ALTER TABLE `initial_paddy` ADD COLUMN block_number INT AFTER reverted")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            try:
-                cursor.execute("ALTER TABLE `initial_paddy` ADD COLUMN transaction_id VARCHAR(255) AFTER block_number")
-            except mysql.connector.Error:
-                pass  # Column already exists
-            try:
-                cursor.execute("ALTER TABLE `initial_paddy` ADD COLUMN block_hash VARCHAR(255) AFTER transaction_id")
-            except mysql.connector.Error:
-                pass  # Column already exists
-        except mysql.connector.Error as e:
-            print('Could not create initial_paddy table:', e)
-        finally:
-            cursor.close()
-            conn.close()
-
-        # Create rice table to track rice amounts
         conn = get_connection(MYSQL_DATABASE)
         cursor = conn.cursor()
-        create_rice = '''
-        CREATE TABLE IF NOT EXISTS `rice` (
-            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
-            user_id VARCHAR(255),
-            rice_type VARCHAR(128),
-            quantity DECIMAL(14,3),
-            status TINYINT DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-            block_id INT,
-            block_hash VARCHAR(255),
-            block_number INT,
-            transaction_hash VARCHAR(255),
-            INDEX (user_id),
-            INDEX (rice_type),
-            INDEX (status)
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        '''
-        try:
-            cursor.execute(create_rice)
-            conn.commit()
-        except mysql.connector.Error as e:
-            print('Could not create rice table:', e)
-
-        # Add status column if it doesn't exist
-        try:
-            cursor.execute("""
-                ALTER TABLE rice 
-                ADD COLUMN status TINYINT DEFAULT 1
-            """)
-            conn.commit()
-            print('Added status column to rice table')
-        except mysql.connector.Error as e:
-            if 'Duplicate column name' not in str(e):
-                print('Note: Could not add status column to rice table:', e)
-        
-        # Add blockchain columns if they don't exist
-        try:
-            cursor.execute("ALTER TABLE `rice` ADD COLUMN block_id INT AFTER updated_at")
-            conn.commit()
-        except mysql.connector.Error as e:
-            pass  # Column might already exist
-        
-        try:
-            cursor.execute("ALTER TABLE `rice` ADD COLUMN block_hash VARCHAR(255) AFTER block_id")
-            conn.commit()
-        except mysql.connector.Error as e:
-            pass  # Column might already exist
-        
-        try:
-            cursor.execute("ALTER TABLE `rice` ADD COLUMN block_number INT AFTER block_hash")
-            conn.commit()
-        except mysql.connector.Error as e:
-            pass  # Column might already exist
-        
-        try:
-            cursor.execute("ALTER TABLE `rice` ADD COLUMN transaction_hash VARCHAR(255) AFTER block_number")
-            conn.commit()
-        except mysql.connector.Error as e:
-            pass  # Column might already exist
-        
+        roles.load(cursor)
         cursor.close()
         conn.close()
-
-        print('Database initialized (database/table ensured).')
     except mysql.connector.Error as err:
-        print('Failed initializing database:', err)
+        logger.warning('Could not load user roles: %s', err)
 
 
 @app.route('/')
@@ -641,6 +222,28 @@ def exporter_page():
     return render_template('exporter.html')
 
 
+@app.route('/api/dashboard', methods=['GET'])
+def api_dashboard():
+    """Everything a role's page loads on start, in one response (see dashboard.py).
+    Query: role (admin, miller, pmb, collecter); user (only used without a session).
+    Response: { role, user_id, widgets: {name: body}, errors: {name: {status, error}}, urls: {name: url},
+                cursors: {name: X-Next-Cursor of a paged widget} }
+    with an ETag; a matching If-None-Match gets 304.
+    """
+    role = (request.args.get('role') or '').strip().lower()
+    if role not in dashboard.WIDGETS:
+        return jsonify({'ok': False, 'error': 'role must be one of: ' + ', '.join(dashboard.WIDGETS)}), 400
+    user_id = session.get('user_id') or request.args.get('user')
+    try:
+        payload = dashboard.build(app, role, user_id)
+    except mysql.connector.Error as err:
+        return jsonify({'error': str(err)}), 500
+    response = jsonify(payload)
+    response.add_etag()
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+
 @app.route('/api/me', methods=['GET'])
 def api_me():
     """Return the current logged-in user (from server-side session).
@@ -652,75 +255,21 @@ def api_me():
     return jsonify({'ok': True, 'user_id': uid, 'user_type': session.get('user_type'), 'full_name': session.get('full_name')})
 
 
-def log_last_inserted_user(user_type):
-    """Fetch the highest numeric ID for the given user_type and return the next ID.
-    Always return the next ID (e.g., COL6, FAR6, MIL4).
-    """
-    try:
-        # Prefix mapping for each user type
-        prefix_map = {
-            "Farmer": "FAR",
-            "Collecter": "COL",
-            "Miller": "MIL",
-            "Wholesaler": "WHO",
-            "Retailer": "RET",
-            "Beer": "BER",
-            "Animal Food": "ANI",
-            "Exporter": "EXP"
-        }
+def _users_query(args):
+    """(sql, params) for api_get_users; a user_type filter is served from the (role, district, id) index."""
+    user_type = args.get('user_type', '')
+    if user_type:
+        return 'SELECT * FROM users WHERE role = %s ORDER BY id DESC', (roles.canonical(user_type),)
+    return 'SELECT * FROM users ORDER BY id DESC', ()
 
-        # Default prefix = first 3 letters of user_type if not found
-        prefix = prefix_map.get(user_type, user_type[:3].upper())
-
-        conn = get_connection(MYSQL_DATABASE)
-        cur = conn.cursor(dictionary=True)
-
-        # Fetch all IDs for this user type and find the maximum numeric value
-        query = """
-            SELECT id FROM users
-            WHERE user_type = %s
-        """
-        cur.execute(query, (user_type,))
-        rows = cur.fetchall()
-
-        max_number = 0
-        for row in rows:
-            if row and row.get("id"):
-                user_id = str(row["id"])
-                # Extract numeric part (everything after the prefix)
-                numeric_part = user_id[len(prefix):] if len(user_id) > len(prefix) else "0"
-                try:
-                    num = int(numeric_part)
-                    if num > max_number:
-                        max_number = num
-                except (ValueError, TypeError):
-                    continue
-
-        next_number = max_number + 1
-
-        cur.close()
-        conn.close()
-
-        # Build the new ID
-        next_id = f"{prefix}{next_number}"
-        return next_id
-
-    except Exception as e:
-        print("[log_last_inserted_user] Error fetching last inserted user:", e)
-        return None
 
 @app.route('/api/users', methods=['GET'])
 def api_get_users():
     try:
-        user_type = request.args.get('user_type', '')
         conn = get_connection(MYSQL_DATABASE)
         cursor = conn.cursor(dictionary=True)
-        
-        if user_type:
-            cursor.execute('SELECT * FROM users WHERE user_type = %s ORDER BY id DESC', (user_type,))
-        else:
-            cursor.execute('SELECT * FROM users ORDER BY id DESC')
-            
+        cursor.execute(*_users_query(request.args))
+
         rows = cursor.fetchall()
         # add computed user_code to each row (do not store in DB)
         prefix_map = {
@@ -762,6 +311,7 @@ def api_get_users():
 
 
 @app.route('/api/initial_paddy', methods=['GET', 'POST'])
+@response_cache.invalidates('stock')
 def api_get_initial_paddy():
     """GET: Return initial paddy data with farmer information.
     Query params: user_type (optional)
@@ -867,16 +417,16 @@ def api_get_initial_paddy():
                 SELECT ip.id, ip.user_id, u.full_name, u.company_name, u.user_type, u.district, ip.paddy_type, ip.quantity, ip.reverted, ip.block_number, ip.transaction_id, ip.block_hash, ip.created_at
                 FROM initial_paddy ip
                 JOIN users u ON ip.user_id = u.id
-                WHERE u.user_type = %s
+                WHERE u.role = %s
                 ORDER BY ip.created_at DESC
             '''
-            cursor.execute(query, (user_type,))
+            cursor.execute(query, (roles.canonical(user_type),))
         else:
             query = '''
                 SELECT ip.id, ip.user_id, u.full_name, u.company_name, u.user_type, u.district, ip.paddy_type, ip.quantity, ip.reverted, ip.block_number, ip.transaction_id, ip.block_hash, ip.created_at
                 FROM initial_paddy ip
                 JOIN users u ON ip.user_id = u.id
-                WHERE u.user_type IN ('Collecter', 'Miller')
+                WHERE u.role IN ('collecter', 'miller')
                 ORDER BY ip.created_at DESC
             '''
             cursor.execute(query)
@@ -906,6 +456,7 @@ def api_get_initial_paddy():
 
 
 @app.route('/api/initial_rice', methods=['GET', 'POST'])
+@response_cache.invalidates('stock')
 def api_get_initial_rice():
     """GET: Return initial rice data with user information.
     Query params: user_type (optional)
@@ -991,10 +542,10 @@ def api_get_initial_rice():
                        r.transaction_hash
                 FROM rice r
                 JOIN users u ON r.user_id = u.id
-                WHERE u.user_type = %s
+                WHERE u.role = %s
                 ORDER BY r.created_at DESC
             '''
-            cursor.execute(query, (user_type,))
+            cursor.execute(query, (roles.canonical(user_type),))
         else:
             query = '''
                 SELECT r.id,
@@ -1012,7 +563,7 @@ def api_get_initial_rice():
                        r.transaction_hash
                 FROM rice r
                 JOIN users u ON r.user_id = u.id
-                WHERE u.user_type IN ('Miller', 'Wholesaler')
+                WHERE u.role IN ('miller', 'wholesaler')
                 ORDER BY r.created_at DESC
             '''
             cursor.execute(query)
@@ -1042,6 +593,7 @@ def api_get_initial_rice():
 
 
 @app.route('/api/initial_paddy/<int:paddy_id>', methods=['PUT'])
+@response_cache.invalidates('stock')
 def api_update_initial_paddy(paddy_id):
     """Update initial paddy quantity and record to blockchain"""
     try:
@@ -1113,6 +665,7 @@ def api_update_initial_paddy(paddy_id):
 
 
 @app.route('/api/initial_paddy/<int:paddy_id>/revert', methods=['POST'])
+@response_cache.invalidates('stock')
 def api_revert_initial_paddy(paddy_id):
     """Revert initial paddy: add new record with reverted = 1 and deduct from stock"""
     try:
@@ -1195,6 +748,7 @@ def api_revert_initial_paddy(paddy_id):
 
 
 @app.route('/api/initial_rice/<int:rice_id>/revert', methods=['POST'])
+@response_cache.invalidates('stock')
 def api_revert_initial_rice(rice_id):
     """Revert initial rice: add new record with status = 0 (inactive) and deduct from stock"""
     try:
@@ -1271,97 +825,35 @@ def api_revert_initial_rice(rice_id):
             }), 200
         
     except mysql.connector.Error as err:
-        print(f"MySQL Error in revert_initial_rice: {err}")
+        logger.error('MySQL Error in revert_initial_rice: %s', err)
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(err), 'message': 'Database error during rice revert'}), 500
     except Exception as err:
-        print(f"Error in revert_initial_rice: {err}")
+        logger.error('Error in revert_initial_rice: %s', err)
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(err), 'message': 'Error during rice revert'}), 500
 
 
+# users per canonical role, for api_get_stats; served from the (role, district, id) index
+_ROLE_COUNTS_SQL = 'SELECT role, COUNT(*) FROM users GROUP BY role'
+
+
 @app.route('/api/stats', methods=['GET'])
+@response_cache.cached(ttl=300, tags=('users',))
 def api_get_stats():
     """Return basic counts for dashboard: total farmers, collectors, millers."""
     try:
         conn = get_connection(MYSQL_DATABASE)
         cur = conn.cursor()
-        # count by user_type using case-insensitive LIKE to be forgiving
         counts = {'farmers': 0, 'collectors': 0, 'millers': 0, 'wholesalers': 0, 'retailers': 0, 'beer': 0, 'animalfood': 0, 'exporter': 0}
-        try:
-            cur.execute("SELECT user_type, COUNT(*) FROM users GROUP BY LOWER(user_type)")
-        except Exception:
-            # fallback: count with LIKE patterns
-            try:
-                cur.execute("SELECT COUNT(*) FROM users WHERE LOWER(user_type) LIKE %s", ("%farmer%",))
-                counts['farmers'] = cur.fetchone()[0]
-            except Exception:
-                counts['farmers'] = 0
-            try:
-                cur.execute("SELECT COUNT(*) FROM users WHERE LOWER(user_type) LIKE %s", ("%collect%",))
-                counts['collectors'] = cur.fetchone()[0]
-            except Exception:
-                counts['collectors'] = 0
-            try:
-                cur.execute("SELECT COUNT(*) FROM users WHERE LOWER(user_type) LIKE %s", ("%miller%",))
-                counts['millers'] = cur.fetchone()[0]
-            except Exception:
-                counts['millers'] = 0
-            try:
-                cur.execute("SELECT COUNT(*) FROM users WHERE LOWER(user_type) LIKE %s", ("%wholesaler%",))
-                counts['wholesalers'] = cur.fetchone()[0]
-            except Exception:
-                counts['wholesalers'] = 0
-            try:
-                cur.execute("SELECT COUNT(*) FROM users WHERE LOWER(user_type) LIKE %s", ("%retailer%",))
-                counts['retailers'] = cur.fetchone()[0]
-            except Exception:
-                counts['retailers'] = 0
-            try:
-                cur.execute("SELECT COUNT(*) FROM users WHERE LOWER(user_type) LIKE %s", ("%beer%",))
-                counts['beer'] = cur.fetchone()[0]
-            except Exception:
-                counts['beer'] = 0
-            try:
-                cur.execute("SELECT COUNT(*) FROM users WHERE user_type = %s", ("Animal Food",))
-                counts['animalfood'] = cur.fetchone()[0]
-            except Exception:
-                counts['animalfood'] = 0
-            try:
-                cur.execute("SELECT COUNT(*) FROM users WHERE LOWER(user_type) LIKE %s", ("%exporter%",))
-                counts['exporter'] = cur.fetchone()[0]
-            except Exception:
-                counts['exporter'] = 0
-            cur.close()
-            conn.close()
-            return jsonify(counts)
-
-        rows = cur.fetchall()
-        # rows are (user_type, count)
-        for r in rows:
-            try:
-                ut = (r[0] or '').strip().lower()
-                c = int(r[1] or 0)
-                if 'farmer' in ut:
-                    counts['farmers'] += c
-                elif 'collect' in ut:
-                    counts['collectors'] += c
-                elif 'miller' in ut:
-                    counts['millers'] += c
-                elif 'wholesaler' in ut:
-                    counts['wholesalers'] += c
-                elif 'retailer' in ut:
-                    counts['retailers'] += c
-                elif 'exporter' in ut:
-                    counts['exporter'] += c
-                elif 'beer' in ut:
-                    counts['beer'] += c
-                elif 'animal food' in ut:
-                    counts['animalfood'] += c
-            except Exception:
-                continue
+        keys = {'farmer': 'farmers', 'collecter': 'collectors', 'miller': 'millers', 'wholesaler': 'wholesalers',
+                'retailer': 'retailers', 'beer': 'beer', 'animal_food': 'animalfood', 'exporter': 'exporter'}
+        cur.execute(_ROLE_COUNTS_SQL)
+        for role, c in cur.fetchall():
+            if role in keys:
+                counts[keys[role]] += int(c or 0)
 
         cur.close()
         conn.close()
@@ -1371,6 +863,7 @@ def api_get_stats():
 
 
 @app.route('/api/stock_summary', methods=['GET'])
+@response_cache.cached(ttl=60, tags=('stock',))
 def api_get_stock_summary():
     """Return aggregated paddy amounts by user role (PMB, Collecter, Miller).
 
@@ -1381,55 +874,12 @@ def api_get_stock_summary():
         paddy_type = (request.args.get('paddy_type') or '').strip()
         conn = get_connection(MYSQL_DATABASE)
         cur = conn.cursor()
-        # build SQL with optional filter
-        try:
-            if paddy_type:
-                sql = "SELECT LOWER(u.user_type) as ut, SUM(s.amount) FROM `stock` s JOIN users u ON s.user_id = u.id WHERE s.`type` = %s GROUP BY LOWER(u.user_type)"
-                cur.execute(sql, (paddy_type,))
-            else:
-                cur.execute("SELECT LOWER(u.user_type) as ut, SUM(s.amount) FROM `stock` s JOIN users u ON s.user_id = u.id GROUP BY LOWER(u.user_type)")
-            rows = cur.fetchall()
-        except Exception:
-            # fallback: perform individual sums using LIKE, with optional paddy_type filter
-            rows = []
-            try:
-                if paddy_type:
-                    cur.execute("SELECT SUM(amount) FROM `stock` WHERE `type` = %s AND user_id IN (SELECT id FROM users WHERE LOWER(user_type) LIKE %s)", (paddy_type, "%pmb%"))
-                else:
-                    cur.execute("SELECT SUM(amount) FROM `stock` WHERE user_id IN (SELECT id FROM users WHERE LOWER(user_type) LIKE %s)", ("%pmb%",))
-                rows.append(('pmb', cur.fetchone()[0] or 0))
-            except Exception:
-                rows.append(('pmb', 0))
-            try:
-                if paddy_type:
-                    cur.execute("SELECT SUM(amount) FROM `stock` WHERE `type` = %s AND user_id IN (SELECT id FROM users WHERE LOWER(user_type) LIKE %s)", (paddy_type, "%collect%"))
-                else:
-                    cur.execute("SELECT SUM(amount) FROM `stock` WHERE user_id IN (SELECT id FROM users WHERE LOWER(user_type) LIKE %s)", ("%collect%",))
-                rows.append(('collecter', cur.fetchone()[0] or 0))
-            except Exception:
-                rows.append(('collecter', 0))
-            try:
-                if paddy_type:
-                    cur.execute("SELECT SUM(amount) FROM `stock` WHERE `type` = %s AND user_id IN (SELECT id FROM users WHERE LOWER(user_type) LIKE %s)", (paddy_type, "%miller%"))
-                else:
-                    cur.execute("SELECT SUM(amount) FROM `stock` WHERE user_id IN (SELECT id FROM users WHERE LOWER(user_type) LIKE %s)", ("%miller%",))
-                rows.append(('miller', cur.fetchone()[0] or 0))
-            except Exception:
-                rows.append(('miller', 0))
+        rows = stock_rollup.totals(cur, ['role'], paddy_type)
 
         totals = {'pmb': 0.0, 'collecter': 0.0, 'miller': 0.0}
-        for r in rows:
-            try:
-                ut = (r[0] or '').lower()
-                val = float(r[1] or 0)
-                if 'pmb' in ut:
-                    totals['pmb'] += val
-                elif 'collect' in ut:
-                    totals['collecter'] += val
-                elif 'miller' in ut:
-                    totals['miller'] += val
-            except Exception:
-                continue
+        for role, amount in rows:
+            if role in totals:
+                totals[role] += float(amount or 0)
 
         cur.close()
         conn.close()
@@ -1470,23 +920,23 @@ def api_get_stock_by_type():
                         'quantity': float(row[1] or 0)
                     })
             except Exception as e:
-                print(f"Error fetching rice stock: {e}")
+                logger.error('Error fetching rice stock: %s', e)
                 return jsonify([])
         else:
             # Get paddy stock aggregated by type from stock table
             try:
                 if user_id:
                     cur.execute("SELECT `type`, SUM(amount) as total FROM `stock` WHERE user_id = %s GROUP BY `type` ORDER BY `type`", (user_id,))
+                    rows = cur.fetchall()
                 else:
-                    cur.execute("SELECT `type`, SUM(amount) as total FROM `stock` GROUP BY `type` ORDER BY `type`")
-                rows = cur.fetchall()
+                    rows = stock_rollup.totals(cur, ['paddy_type'], users_only=False)
                 for row in rows:
                     result.append({
                         'type': row[0],
                         'quantity': float(row[1] or 0)
                     })
             except Exception as e:
-                print(f"Error fetching paddy stock: {e}")
+                logger.error('Error fetching paddy stock: %s', e)
                 return jsonify([])
         
         cur.close()
@@ -1498,110 +948,106 @@ def api_get_stock_by_type():
 
 @app.route('/api/stock_history', methods=['GET'])
 def api_get_stock_history():
-    """Return daily stock amounts by user role for time-series chart.
-    
-    Response: { dates: [...], pmb: [...], collecter: [...], miller: [...] }
+    """Return closing stock by user role for the time-series chart, from daily snapshots.
+
+    Query params:
+      - paddy_type (optional)
+      - start, end (optional, YYYY-MM-DD): defaults to the 7 days ending today
+      - resolution (optional): day (default) | week | month. A week/month point is the
+        closing balance of its last day inside the range; weeks are labelled by their Monday.
+    Response: { dates: [...], pmb: [...], collecter: [...], miller: [...], resolution }
     """
+    paddy_type = (request.args.get('paddy_type') or '').strip()
+    resolution = (request.args.get('resolution') or 'day').strip().lower()
+    if resolution not in ('day', 'week', 'month'):
+        return jsonify({'error': 'resolution must be day, week or month'}), 400
+    today = datetime.date.today()
+    try:
+        end = datetime.date.fromisoformat(request.args['end']) if request.args.get('end') else today
+        start = datetime.date.fromisoformat(request.args['start']) if request.args.get('start') else end - datetime.timedelta(days=6)
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD'}), 400
+    if start > end:
+        return jsonify({'error': 'start must not be after end'}), 400
+    if (end - start).days > stock_snapshots.MAX_HISTORY_DAYS:
+        return jsonify({'error': f'range is limited to {stock_snapshots.MAX_HISTORY_DAYS} days'}), 400
+
     try:
-        paddy_type = (request.args.get('paddy_type') or '').strip()
         conn = get_connection(MYSQL_DATABASE)
         cur = conn.cursor()
-        try:
-            if paddy_type:
-                sql = "SELECT LOWER(u.user_type) as ut, SUM(s.amount) FROM `stock` s JOIN users u ON s.user_id = u.id WHERE s.`type` = %s GROUP BY LOWER(u.user_type)"
-                cur.execute(sql, (paddy_type,))
-            else:
-                cur.execute("SELECT LOWER(u.user_type) as ut, SUM(s.amount) FROM `stock` s JOIN users u ON s.user_id = u.id GROUP BY LOWER(u.user_type)")
-            rows = cur.fetchall()
-        except Exception:
-            rows = []
-
-        totals = {'pmb': 0.0, 'collecter': 0.0, 'miller': 0.0}
-        for r in rows:
-            try:
-                ut = (r[0] or '').lower()
-                val = float(r[1] or 0)
-                if 'pmb' in ut:
-                    totals['pmb'] += val
-                elif 'collect' in ut:
-                    totals['collecter'] += val
-                elif 'miller' in ut:
-                    totals['miller'] += val
-            except Exception:
-                continue
-
+        days = stock_snapshots.history(cur, start, end, paddy_type)
+        if start <= today <= end:
+            # today's point comes from the live rollup rather than the last snapshot
+            days[today] = {role: float(amount or 0) for role, amount in stock_rollup.totals(cur, ['role'], paddy_type)}
         cur.close()
         conn.close()
-        
-        # Generate 7 days of data (simulation: variations around current totals)
-        import datetime
-        import random
-        dates = []
-        pmb_series = []
-        col_series = []
-        mil_series = []
-        today = datetime.date.today()
-        for i in range(6, -1, -1):
-            d = today - datetime.timedelta(days=i)
-            dates.append(d.strftime('%Y-%m-%d'))
-            factor = 0.8 + (0.4 * (6-i)/6)
-            pmb_series.append(round(totals['pmb'] * factor + random.uniform(-5, 5), 2))
-            col_series.append(round(totals['collecter'] * factor + random.uniform(-10, 10), 2))
-            mil_series.append(round(totals['miller'] * factor + random.uniform(-10, 10), 2))
-        
-        return jsonify({
-            'dates': dates,
-            'pmb': pmb_series,
-            'collecter': col_series,
-            'miller': mil_series
-        })
     except mysql.connector.Error as err:
         return jsonify({'error': str(err)}), 500
 
+    # days are visited in order, so the last day of each bucket wins
+    points = {}
+    for day in sorted(days):
+        if resolution == 'week':
+            label = (day - datetime.timedelta(days=day.weekday())).isoformat()
+        elif resolution == 'month':
+            label = day.strftime('%Y-%m')
+        else:
+            label = day.isoformat()
+        points[label] = days[day]
+
+    series = {'pmb': [], 'collecter': [], 'miller': []}
+    for by_role in points.values():
+        totals = {'pmb': 0.0, 'collecter': 0.0, 'miller': 0.0}
+        for name, val in by_role.items():
+            # snapshots taken before users.role existed stored LOWER(user_type)
+            role = roles.canonical(name)
+            if role in totals:
+                totals[role] += val
+        for key, val in totals.items():
+            series[key].append(round(val, 2))
+
+    return jsonify({
+        'dates': list(points),
+        'pmb': series['pmb'],
+        'collecter': series['collecter'],
+        'miller': series['miller'],
+        'resolution': resolution
+    })
+
 
 @app.route('/api/users/by_type', methods=['GET'])
 def api_get_users_by_type():
     """Return list of users for a given user type.
     Query params:
-      - type (string): user type to filter by (case-insensitive, substring match)
+      - type (string): user type to filter by (any spelling, e.g. collector, Miller)
     Response: JSON array of {id, full_name, user_code}
     """
     typ = (request.args.get('type') or request.args.get('user_type') or '').strip()
     if not typ:
         return jsonify({'error': 'query parameter "type" is required'}), 400
 
-    try:
-        conn = get_connection(MYSQL_DATABASE)
-        cur = conn.cursor(dictionary=True)
-        # Case-insensitive substring match to be forgiving with stored values
-        sql = 'SELECT id, full_name, company_name, user_type FROM users WHERE LOWER(user_type) LIKE %s ORDER BY id'
-        cur.execute(sql, (f"%{typ.lower()}%",))
-        rows = cur.fetchall()
-
-        prefix_map = {
-            'Farmer': 'FAR',
-            'Collecter': 'COL',
-            'Miller': 'MIL',
-            'Wholesaler': 'WHO',
-            'Retailer': 'RET',
-            'Beer': 'BER',
-            'Animal Food': 'ANI',
-            'Exporter': 'EXP'
-        }
-        out = []
-        for r in rows:
-            try:
-                prefix = prefix_map.get(r.get('user_type'), 'USR')
-                user_code = f"{prefix}{int(r.get('id')):06d}" if r.get('id') is not None else None
-            except Exception:
-                user_code = None
-            out.append({'id': r.get('id'), 'full_name': r.get('full_name'), 'company_name': r.get('company_name'), 'user_code': user_code})
+    rows = sorted(user_directory.by_role(roles.canonical(typ)), key=lambda u: u.id)
+
+    prefix_map = {
+        'Farmer': 'FAR',
+        'Collecter': 'COL',
+        'Miller': 'MIL',
+        'Wholesaler': 'WHO',
+        'Retailer': 'RET',
+        'Beer': 'BER',
+        'Animal Food': 'ANI',
+        'Exporter': 'EXP'
+    }
+    out = []
+    for r in rows:
+        try:
+            prefix = prefix_map.get(r.user_type, 'USR')
+            user_code = f"{prefix}{int(r.id):06d}" if r.id is not None else None
+        except Exception:
+            user_code = None
+        out.append({'id': r.id, 'full_name': r.full_name, 'company_name': r.company_name, 'user_code': user_code})
 
-        cur.close()
-        conn.close()
-        return jsonify(out)
-    except mysql.connector.Error as err:
-        return jsonify({'error': str(err)}), 500
+    return jsonify(out)
 
 
 @app.route('/api/users/<user_id>', methods=['GET'])
@@ -1609,29 +1055,28 @@ def api_get_user(user_id):
     """Return user details including contact information.
     Response: JSON object with {id, full_name, user_type, contact_number, address, district, ...}
     """
-    try:
-        conn = get_connection(MYSQL_DATABASE)
-        cur = conn.cursor(dictionary=True)
-        sql = 'SELECT id, full_name, user_type, contact_number, address, district FROM users WHERE id = %s LIMIT 1'
-        cur.execute(sql, (user_id,))
-        user = cur.fetchone()
-        cur.close()
-        conn.close()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        return jsonify(user)
-    except mysql.connector.Error as err:
-        return jsonify({'error': str(err)}), 500
+    user = user_directory.get(user_id)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    return jsonify({
+        'id': user.id,
+        'full_name': user.full_name,
+        'user_type': user.user_type,
+        'contact_number': user.contact_number,
+        'address': user.address,
+        'district': user.district
+    })
 
 
 @app.route('/api/transactions', methods=['POST'])
+@response_cache.invalidates('stock')
 def api_add_transaction():
     """Insert a transaction record into the transaction table.
     Expects JSON body: { from, to, type, quantity, datetime, price, status }
     status: 1 = normal transaction, 0 = revert transaction (restores stock)
     price: optional price per unit
+    Returns 202: the stock change is committed and the blockchain record is queued;
+    poll status_url for block_hash / transaction_hash / chain_tx_id.
     """
     payload = request.get_json() or {}
     from_val = payload.get('from')
@@ -1665,13 +1110,7 @@ def api_add_transaction():
             pass
         cur = conn.cursor(buffered=True)
         # Determine sender type
-        sender_type = None
-        try:
-            cur.execute('SELECT user_type FROM users WHERE id = %s LIMIT 1', (str(from_val),))
-            urow = cur.fetchone()
-            sender_type = urow[0] if urow else None
-        except Exception:
-            sender_type = None
+        sender_type = user_directory.user_type(from_val)
 
         # Check if sender is a farmer (farmers don't have stock tracking)
         is_sender_farmer = isinstance(sender_type, str) and sender_type.strip().lower().startswith('farmer')
@@ -1870,87 +1309,29 @@ def api_add_transaction():
             conn.close()
             return jsonify({'ok': False, 'error': 'Failed updating recipient stock: ' + str(e)}), 500
 
-        # Now insert the transaction record (after stock updates)
-        block_hash = None
-        block_number = None
-        transaction_hash = None
-        blockchain_transaction_id = None
-        block_number = None
-        transaction_hash = None
+        # Now insert the transaction record (after stock updates).
+        # The on-chain record is written by the outbox worker after commit, so the
+        # stock rows locked above are released without waiting for a block.
         try:
-            # Record transaction on blockchain
-            try:
-                # Convert quantity to int for blockchain (assuming kg)
-                qty_int = int(float(qty))
-                
-                if is_rice_transaction:
-                    # Use rice transaction blockchain function
-                    # status=True for normal (1), False for revert (0)
-                    result = record_rice_transaction(
-                        str(from_val),
-                        str(to_val),
-                        ttype,
-                        qty_int,
-                        price,
-                        status == 1  # Convert status 1/0 to True/False
-                    )
-                    if result and isinstance(result, dict):
-                        block_hash = result.get('block_hash')
-                        block_number = result.get('block_number')
-                        transaction_hash = result.get('transaction_hash')
-                        blockchain_transaction_id = result.get('transaction_id')
-                    print(f"Blockchain RICE transaction recorded. Block hash: {block_hash}")
-                else:
-                    # Use regular paddy transaction blockchain function
-                    # status=True for normal (1), False for revert (0)
-                    result = record_transaction(
-                        str(from_val),
-                        str(to_val),
-                        ttype,
-                        qty_int,
-                        price,
-                        0.0,
-                        status == 1  # Convert status 1/0 to True/False
-                    )
-                    if result and isinstance(result, dict):
-                        block_hash = result.get('block_hash')
-                        block_number = result.get('block_number')
-                        transaction_hash = result.get('transaction_hash')
-                        blockchain_transaction_id = result.get('transaction_id')
-                        print(f"DEBUG app.py: blockchain_transaction_id = {blockchain_transaction_id}")
-                    print(f"Blockchain PADDY transaction recorded. Block hash: {block_hash}")
-            except Exception as e:
-                print(f"Failed to record transaction on blockchain: {e}")
-                # Continue with database insert even if blockchain fails
-                block_hash = None
-                block_number = None
-                transaction_hash = None
-                blockchain_transaction_id = None
-            
-            # Insert into appropriate table based on transaction type
             if is_rice_transaction:
-                # Insert into rice_transaction table with reverted and blockchain transaction_id
+                # Insert into rice_transaction table with reverted flag
                 # For rice_transaction: status=0 means revert (reverted=1), status=1 means normal (reverted=0)
                 reverted_value = 1 if status == 0 else 0
-                if blockchain_transaction_id:
-                    print(f"DEBUG: Inserting rice transaction with blockchain_transaction_id = {blockchain_transaction_id}, reverted = {reverted_value}")
-                    insert_sql = 'INSERT INTO `rice_transaction` (id, `from`, `to`, rice_type, quantity, price, reverted, `datetime`, block_hash, block_number, transaction_hash) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'
-                    cur.execute(insert_sql, (blockchain_transaction_id, str(from_val), str(to_val), ttype, qty, price, reverted_value, dt, block_hash, block_number, transaction_hash))
-                else:
-                    print(f"DEBUG: Inserting rice transaction WITHOUT blockchain_transaction_id, reverted = {reverted_value}")
-                    insert_sql = 'INSERT INTO `rice_transaction` (`from`, `to`, rice_type, quantity, price, reverted, `datetime`, block_hash, block_number, transaction_hash) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'
-                    cur.execute(insert_sql, (str(from_val), str(to_val), ttype, qty, price, reverted_value, dt, block_hash, block_number, transaction_hash))
+                insert_sql = 'INSERT INTO `rice_transaction` (`from`, `to`, rice_type, quantity, price, reverted, `datetime`) VALUES (%s, %s, %s, %s, %s, %s, %s)'
+                cur.execute(insert_sql, (str(from_val), str(to_val), ttype, qty, price, reverted_value, dt))
             else:
-                # Insert into regular transaction table (paddy) with status and blockchain transaction_id
-                if blockchain_transaction_id:
-                    print(f"DEBUG: Inserting paddy transaction with blockchain_transaction_id = {blockchain_transaction_id}")
-                    insert_sql = 'INSERT INTO `transaction` (id, `from`, `to`, `type`, quantity, price, status, `datetime`, block_hash, block_number, transaction_hash) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'
-                    cur.execute(insert_sql, (blockchain_transaction_id, str(from_val), str(to_val), ttype, qty, price, int(status), dt, block_hash, block_number, transaction_hash))
-                else:
-                    print(f"DEBUG: Inserting paddy transaction WITHOUT blockchain_transaction_id")
-                    insert_sql = 'INSERT INTO `transaction` (`from`, `to`, `type`, quantity, price, status, `datetime`, block_hash, block_number, transaction_hash) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'
-                    cur.execute(insert_sql, (str(from_val), str(to_val), ttype, qty, price, int(status), dt, block_hash, block_number, transaction_hash))
+                # Insert into regular transaction table (paddy) with status
+                insert_sql = 'INSERT INTO `transaction` (`from`, `to`, `type`, quantity, price, status, `datetime`) VALUES (%s, %s, %s, %s, %s, %s, %s)'
+                cur.execute(insert_sql, (str(from_val), str(to_val), ttype, qty, price, int(status), dt))
             last_id = cur.lastrowid
+            outbox_id = outbox.enqueue(cur, 'rice_transaction' if is_rice_transaction else 'transaction', last_id, {
+                'from': str(from_val),
+                'to': str(to_val),
+                'type': ttype,
+                'quantity': qty,
+                'price': price,
+                'status': 1 if status == 1 else 0,
+            })
         except mysql.connector.Error as e:
             try:
                 conn.rollback()
@@ -1962,7 +1343,7 @@ def api_add_transaction():
 
         # If this is a revert transaction, mark the original transaction with status = 0
         original_transaction_id = payload.get('original_transaction_id')
-        print(f"DEBUG: is_revert={is_revert}, original_transaction_id={original_transaction_id}")
+        logger.debug('is_revert=%s, original_transaction_id=%s', is_revert, original_transaction_id)
         if is_revert and original_transaction_id:
             try:
                 # Extract numeric ID from strings like 'srv-8' or just '8'
@@ -1977,34 +1358,155 @@ def api_add_transaction():
                     update_sql = 'UPDATE `rice_transaction` SET reverted = 1 WHERE id = %s'
                 else:
                     update_sql = 'UPDATE `transaction` SET status = 0 WHERE id = %s'
-                print(f"DEBUG: Executing UPDATE for original transaction id={numeric_id}")
+                logger.debug('Executing UPDATE for original transaction id=%s', numeric_id)
                 cur.execute(update_sql, (int(numeric_id),))
                 affected_rows = cur.rowcount
-                print(f"DEBUG: Updated {affected_rows} row(s) for original transaction")
+                logger.debug('Updated %s row(s) for original transaction', affected_rows)
             except Exception as e:
-                print(f"ERROR: Failed to mark original transaction as reverted: {e}")
+                logger.error('Failed to mark original transaction as reverted: %s', e)
                 # Continue anyway - revert transaction was created
 
-        # commit both transaction insert and stock update
-        try:
-            conn.commit()
-        except Exception:
-            try:
-                conn.rollback()
-            except Exception:
-                pass
-            cur.close()
-            conn.close()
-            return jsonify({'ok': False, 'error': 'Failed to commit transaction'}), 500
+        # commit both transaction insert and stock update
+        try:
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            cur.close()
+            conn.close()
+            return jsonify({'ok': False, 'error': 'Failed to commit transaction'}), 500
+
+        cur.close()
+        conn.close()
+        outbox.notify()
+        return jsonify({
+            'ok': True,
+            'id': last_id,
+            'block_hash': None,
+            'outbox_id': outbox_id,
+            'chain_status': outbox.STATUS_PENDING,
+            'status_url': f'/api/transactions/outbox/{outbox_id}',
+        }), 202
+    except mysql.connector.Error as err:
+        return jsonify({'ok': False, 'error': str(err)}), 500
+
+
+@app.route('/api/transactions/bulk', methods=['POST'])
+@response_cache.invalidates('stock')
+def api_add_transactions_bulk():
+    """Apply many transfers in one database transaction (see transaction_batch).
+    Expects JSON body: { transactions: [ {from, to, type, quantity, datetime, price, status}, ... ], atomic }
+    or a bare list. Items that fail are reported per index and the rest are
+    applied, unless atomic is true, in which case any failure writes nothing.
+    """
+    payload = request.get_json(silent=True)
+    atomic = False
+    if isinstance(payload, dict):
+        atomic = bool(payload.get('atomic'))
+        payload = payload.get('transactions')
+    if not isinstance(payload, list) or not payload:
+        return jsonify({'ok': False, 'error': 'Expected a non-empty list of transactions'}), 400
+    if len(payload) > transaction_batch.BATCH_MAX_ITEMS:
+        return jsonify({'ok': False, 'error': f'at most {transaction_batch.BATCH_MAX_ITEMS} transactions per batch'}), 400
+
+    try:
+        conn = get_connection(MYSQL_DATABASE)
+        try:
+            results, outbox_ids = transaction_batch.run(conn, payload, atomic)
+        finally:
+            conn.close()
+    except mysql.connector.Error as err:
+        return jsonify({'ok': False, 'error': str(err)}), 500
+
+    if outbox_ids:
+        outbox.notify()
+    applied = len(outbox_ids)
+    return jsonify({
+        'ok': applied == len(payload),
+        'applied': applied,
+        'failed': len(payload) - applied,
+        'chain_status': outbox.STATUS_PENDING if applied else None,
+        'results': results,
+    }), (202 if applied else 400)
+
+
+@app.route('/api/transactions/outbox/<int:outbox_id>', methods=['GET'])
+def api_transaction_outbox_status(outbox_id):
+    """Blockchain submission status for a transaction created by POST /api/transactions.
+    chain_status: pending | processing | confirmed | failed. Once confirmed, block_hash,
+    block_number, transaction_hash and chain_tx_id (the on-chain txId) are filled in.
+    """
+    try:
+        row = outbox.get_status(outbox_id)
+        if not row:
+            return jsonify({'ok': False, 'error': 'Outbox entry not found'}), 404
+        row['chain_status'] = row.pop('status')
+        return jsonify({'ok': True, **row})
+    except mysql.connector.Error as err:
+        return jsonify({'ok': False, 'error': str(err)}), 500
+
+
+@app.route('/api/chain/index_status', methods=['GET'])
+def api_chain_index_status():
+    """Last block mirrored into the chain_* tables per source (operations, accounts)."""
+    try:
+        return jsonify({'ok': True, 'sources': indexer.status()})
+    except mysql.connector.Error as err:
+        return jsonify({'ok': False, 'error': str(err)}), 500
+
+
+@app.route('/api/chain/transactions', methods=['GET'])
+def api_chain_transactions():
+    """On-chain transactions from the indexer's mirror table (no RPC calls).
+    Query params: kind (paddy|rice, optional), party (user id on either side, optional),
+    limit (default 100, max 1000)
+    """
+    kind = request.args.get('kind')
+    party = request.args.get('party')
+    try:
+        limit = max(1, min(int(request.args.get('limit', 100)), 1000))
+    except ValueError:
+        return jsonify({'ok': False, 'error': 'limit must be an integer'}), 400
+
+    where = []
+    params = []
+    if kind:
+        where.append('kind = %s')
+        params.append(kind)
+    if party:
+        # two index lookups instead of an OR that would scan the table
+        sql = (
+            'SELECT * FROM ('
+            ' (SELECT * FROM `chain_transaction` WHERE from_party = %s{k} ORDER BY chain_timestamp DESC LIMIT %s)'
+            ' UNION'
+            ' (SELECT * FROM `chain_transaction` WHERE to_party = %s{k} ORDER BY chain_timestamp DESC LIMIT %s)'
+            ') t ORDER BY chain_timestamp DESC, chain_id DESC LIMIT %s'
+        ).format(k=' AND kind = %s' if kind else '')
+        side = [party] + params + [limit]
+        params = side + side + [limit]
+    else:
+        sql = 'SELECT * FROM `chain_transaction`'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY block_number DESC, log_index DESC LIMIT %s'
+        params.append(limit)
 
+    try:
+        conn = get_connection(MYSQL_DATABASE)
+        cur = conn.cursor(dictionary=True)
+        cur.execute(sql, params)
+        rows = cur.fetchall()
         cur.close()
         conn.close()
-        return jsonify({'ok': True, 'id': last_id, 'block_hash': block_hash}), 201
+        return jsonify({'ok': True, 'data': rows, 'count': len(rows)})
     except mysql.connector.Error as err:
         return jsonify({'ok': False, 'error': str(err)}), 500
 
 
 @app.route('/api/transactions/<int:transaction_id>', methods=['PUT'])
+@response_cache.invalidates('stock')
 def api_update_transaction(transaction_id):
     """Update a transaction quantity and adjust stock accordingly.
     Expects JSON body: { quantity }
@@ -2033,13 +1535,7 @@ def api_update_transaction(transaction_id):
         # Adjust stock based on the new quantity
         if old_quantity != new_quantity:
             # Determine sender type
-            sender_type = None
-            try:
-                cur.execute('SELECT user_type FROM users WHERE id = %s LIMIT 1', (tx_row['from'],))
-                urow = cur.fetchone()
-                sender_type = urow[0] if urow else None
-            except Exception:
-                sender_type = None
+            sender_type = user_directory.user_type(tx_row['from'])
             
             # Update stock for sender
             if isinstance(sender_type, str) and not sender_type.strip().lower().startswith('farmer'):
@@ -2118,9 +1614,7 @@ def api_update_transaction(transaction_id):
         
         # Adjust sender (from) stock if not a farmer: subtract the difference
         # (Farmers don't track stock going out)
-        cur.execute('SELECT user_type FROM users WHERE id = %s', (str(from_user),))
-        from_user_type = cur.fetchone()
-        is_farmer = from_user_type and 'farmer' in (from_user_type.get('user_type') or '').lower()
+        is_farmer = 'farmer' in (user_directory.user_type(from_user) or '').lower()
         
         if not is_farmer:
             cur.execute('SELECT id, amount FROM `stock` WHERE user_id = %s AND `type` = %s FOR UPDATE', 
@@ -2154,51 +1648,52 @@ def api_update_transaction(transaction_id):
 
 
 @app.route('/api/transactions', methods=['GET'])
+@resource_version.conditional(('transaction', 'rice_transaction', 'users'), user_args=('to', 'from', 'user'))
 def api_get_transactions():
-    """Return transactions from both transaction and rice_transaction tables.
+    """Return transactions from both transaction and rice_transaction tables, newest first.
     Optional query param `to` to filter by recipient, `from` to filter by sender, `user` for either.
+
+    Paged by keyset over (datetime, id, kind):
+      - limit (optional): rows per page, default 200, at most 1000
+      - cursor (optional): the X-Next-Cursor header of the previous page
+    The body stays a JSON array; X-Next-Cursor is set when there may be more rows.
+    Pages that need every row follow it (fetchAllPages in static/paging.js).
     """
     to_param = request.args.get('to')
     from_param = request.args.get('from')
     user_param = request.args.get('user')
-    
+    try:
+        limit = min(max(int(request.args.get('limit') or 200), 1), 1000)
+        cursor = keyset.decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # every branch is a single indexed range: (to, datetime), (from, datetime) or (datetime)
+    if to_param:
+        filters = [('t.`to` = %s', [str(to_param)])]
+    elif from_param:
+        filters = [('t.`from` = %s', [str(from_param)])]
+    elif user_param:
+        # sent OR received, split so each side keeps its index; self-transfers come from the first
+        filters = [('t.`to` = %s', [str(user_param)]),
+                   ('t.`from` = %s AND NOT (t.`to` <=> %s)', [str(user_param), str(user_param)])]
+    else:
+        filters = [('1=1', [])]
+    branches = [(kind, table, 't', where, params)
+                for kind, table in (('paddy', 'transaction'), ('rice', 'rice_transaction'))
+                for where, params in filters]
+
     try:
         conn = get_connection(MYSQL_DATABASE)
+        cur = conn.cursor()
+        keys = keyset.page(cur, branches, cursor, limit)
+        cur.close()
+
         cur = conn.cursor(dictionary=True)
-        
-        # Query paddy transactions with user details
-        paddy_transactions = []
-        if to_param:
-            sql = '''SELECT t.id, t.`from`, t.`to`, t.`type`, t.quantity, t.price, t.status, 
-                     t.`datetime`, t.block_hash, t.block_number, t.transaction_hash, t.created_at,
-                     u_from.full_name as from_name, u_from.address as from_address, u_from.contact_number as from_contact,
-                     u_to.full_name as to_name, u_to.address as to_address, u_to.contact_number as to_contact
-                     FROM `transaction` t
-                     LEFT JOIN users u_from ON t.`from` = u_from.id
-                     LEFT JOIN users u_to ON t.`to` = u_to.id
-                     WHERE t.`to` = %s ORDER BY t.id DESC'''
-            cur.execute(sql, (str(to_param),))
-        elif from_param:
-            sql = '''SELECT t.id, t.`from`, t.`to`, t.`type`, t.quantity, t.price, t.status,
-                     t.`datetime`, t.block_hash, t.block_number, t.transaction_hash, t.created_at,
-                     u_from.full_name as from_name, u_from.address as from_address, u_from.contact_number as from_contact,
-                     u_to.full_name as to_name, u_to.address as to_address, u_to.contact_number as to_contact
-                     FROM `transaction` t
-                     LEFT JOIN users u_from ON t.`from` = u_from.id
-                     LEFT JOIN users u_to ON t.`to` = u_to.id
-                     WHERE t.`from` = %s ORDER BY t.id DESC'''
-            cur.execute(sql, (str(from_param),))
-        elif user_param:
-            sql = '''SELECT t.id, t.`from`, t.`to`, t.`type`, t.quantity, t.price, t.status,
-                     t.`datetime`, t.block_hash, t.block_number, t.transaction_hash, t.created_at,
-                     u_from.full_name as from_name, u_from.address as from_address, u_from.contact_number as from_contact,
-                     u_to.full_name as to_name, u_to.address as to_address, u_to.contact_number as to_contact
-                     FROM `transaction` t
-                     LEFT JOIN users u_from ON t.`from` = u_from.id
-                     LEFT JOIN users u_to ON t.`to` = u_to.id
-                     WHERE t.`from` = %s OR t.`to` = %s ORDER BY t.id DESC'''
-            cur.execute(sql, (str(user_param), str(user_param)))
-        else:
+        details = {}
+        paddy_ids = [row_id for kind, row_id, _ in keys if kind == 'paddy']
+        rice_ids = [row_id for kind, row_id, _ in keys if kind == 'rice']
+        if paddy_ids:
             sql = '''SELECT t.id, t.`from`, t.`to`, t.`type`, t.quantity, t.price, t.status,
                      t.`datetime`, t.block_hash, t.block_number, t.transaction_hash, t.created_at,
                      u_from.full_name as from_name, u_from.address as from_address, u_from.contact_number as from_contact,
@@ -2206,66 +1701,36 @@ def api_get_transactions():
                      FROM `transaction` t
                      LEFT JOIN users u_from ON t.`from` = u_from.id
                      LEFT JOIN users u_to ON t.`to` = u_to.id
-                     ORDER BY t.id DESC LIMIT 200'''
-            cur.execute(sql)
-        paddy_transactions = cur.fetchall()
-        
-        # Query rice transactions
-        rice_transactions = []
-        if to_param:
-            sql = '''SELECT rt.id, rt.`from`, rt.`to`, rt.rice_type as `type`, rt.quantity, rt.price, rt.reverted, 
-                     rt.`datetime`, rt.block_hash, rt.block_number, rt.transaction_hash, rt.created_at,
-                     u_from.full_name as from_name, u_from.address as from_address, u_from.contact_number as from_contact,
-                     u_to.full_name as to_name, u_to.address as to_address, u_to.contact_number as to_contact
-                     FROM `rice_transaction` rt
-                     LEFT JOIN users u_from ON rt.`from` = u_from.id
-                     LEFT JOIN users u_to ON rt.`to` = u_to.id
-                     WHERE rt.`to` = %s ORDER BY rt.id DESC'''
-            cur.execute(sql, (str(to_param),))
-        elif from_param:
-            sql = '''SELECT rt.id, rt.`from`, rt.`to`, rt.rice_type as `type`, rt.quantity, rt.price, rt.reverted, 
-                     rt.`datetime`, rt.block_hash, rt.block_number, rt.transaction_hash, rt.created_at,
-                     u_from.full_name as from_name, u_from.address as from_address, u_from.contact_number as from_contact,
-                     u_to.full_name as to_name, u_to.address as to_address, u_to.contact_number as to_contact
-                     FROM `rice_transaction` rt
-                     LEFT JOIN users u_from ON rt.`from` = u_from.id
-                     LEFT JOIN users u_to ON rt.`to` = u_to.id
-                     WHERE rt.`from` = %s ORDER BY rt.id DESC'''
-            cur.execute(sql, (str(from_param),))
-        elif user_param:
-            sql = '''SELECT rt.id, rt.`from`, rt.`to`, rt.rice_type as `type`, rt.quantity, rt.price, rt.reverted, 
-                     rt.`datetime`, rt.block_hash, rt.block_number, rt.transaction_hash, rt.created_at,
-                     u_from.full_name as from_name, u_from.address as from_address, u_from.contact_number as from_contact,
-                     u_to.full_name as to_name, u_to.address as to_address, u_to.contact_number as to_contact
-                     FROM `rice_transaction` rt
-                     LEFT JOIN users u_from ON rt.`from` = u_from.id
-                     LEFT JOIN users u_to ON rt.`to` = u_to.id
-                     WHERE rt.`from` = %s OR rt.`to` = %s ORDER BY rt.id DESC'''
-            cur.execute(sql, (str(user_param), str(user_param)))
-        else:
-            sql = '''SELECT rt.id, rt.`from`, rt.`to`, rt.rice_type as `type`, rt.quantity, rt.price, rt.reverted, 
+                     WHERE t.id IN (%s)''' % ', '.join(['%s'] * len(paddy_ids))
+            cur.execute(sql, paddy_ids)
+            details.update((('paddy', r['id']), r) for r in cur.fetchall())
+        if rice_ids:
+            sql = '''SELECT rt.id, rt.`from`, rt.`to`, rt.rice_type as `type`, rt.quantity, rt.price, rt.reverted,
                      rt.`datetime`, rt.block_hash, rt.block_number, rt.transaction_hash, rt.created_at,
                      u_from.full_name as from_name, u_from.address as from_address, u_from.contact_number as from_contact,
                      u_to.full_name as to_name, u_to.address as to_address, u_to.contact_number as to_contact
                      FROM `rice_transaction` rt
                      LEFT JOIN users u_from ON rt.`from` = u_from.id
                      LEFT JOIN users u_to ON rt.`to` = u_to.id
-                     ORDER BY rt.id DESC LIMIT 200'''
-            cur.execute(sql)
-        rice_transactions = cur.fetchall()
-        
-        # Merge and sort by datetime
-        all_transactions = paddy_transactions + rice_transactions
-        all_transactions.sort(key=lambda x: x.get('datetime') or x.get('created_at') or '', reverse=True)
-        
+                     WHERE rt.id IN (%s)''' % ', '.join(['%s'] * len(rice_ids))
+            cur.execute(sql, rice_ids)
+            details.update((('rice', r['id']), r) for r in cur.fetchall())
         cur.close()
         conn.close()
-        return jsonify(all_transactions)
     except mysql.connector.Error as err:
         return jsonify({'error': str(err)}), 500
 
+    # keep the page order; a row deleted between the two queries is skipped
+    all_transactions = [details[(kind, row_id)] for kind, row_id, _ in keys if (kind, row_id) in details]
+    response = jsonify(all_transactions)
+    if len(keys) == limit:
+        kind, row_id, dt = keys[-1]
+        response.headers['X-Next-Cursor'] = keyset.encode_cursor(dt, row_id, kind)
+    return response
+
 
 @app.route('/api/paddy_types', methods=['GET'])
+@response_cache.cached(ttl=3600, tags=('paddy_types',), key='paddy_type')
 def api_get_paddy_types():
     """Return list of all paddy types from paddy_type table."""
     try:
@@ -2283,6 +1748,7 @@ def api_get_paddy_types():
 
 
 @app.route('/api/paddy_type_list', methods=['GET'])
+@response_cache.cached(ttl=3600, tags=('paddy_types',), key='paddy_type')
 def api_get_paddy_type_list():
     """Return list of all paddy types from paddy_type table."""
     try:
@@ -2298,6 +1764,7 @@ def api_get_paddy_type_list():
 
 
 @app.route('/api/rice_types', methods=['GET'])
+@response_cache.cached(ttl=3600, tags=('paddy_types',), key='paddy_type')
 def api_get_rice_types():
     """Return list of rice types from paddy_type table."""
     try:
@@ -2312,95 +1779,106 @@ def api_get_rice_types():
         return jsonify({'error': str(err)}), 500
 
 
+def _rice_transactions_query(args):
+    """(sql, params) for the rice transactions matching the api_get_rice_transactions filters.
+
+    Raises ValueError for a malformed from_date/to_date window.
+    """
+    transaction_type = args.get('transaction_type')
+    rice_type = args.get('rice_type')
+    window = date_window.parse(args, 'from_date', 'to_date')
+    search = args.get('search')
+    transaction_id = args.get('transaction_id')
+
+    sql = '''
+        SELECT 
+            rt.id,
+            rt.`from`,
+            rt.`to`,
+            rt.rice_type,
+            rt.quantity,
+            rt.price,
+            rt.reverted,
+            rt.datetime,
+            rt.block_hash,
+            rt.block_number,
+            rt.transaction_hash,
+            u_from.user_type as from_user_type,
+            u_from.full_name as from_full_name,
+            u_to.user_type as to_user_type,
+            u_to.full_name as to_full_name
+        FROM rice_transaction rt
+        LEFT JOIN users u_from ON rt.`from` = u_from.id
+        LEFT JOIN users u_to ON rt.`to` = u_to.id
+        WHERE 1=1
+    '''
+    params = []
+
+    if transaction_type:
+        # Transaction type format: "from_type-to_type" e.g., "miller-wholesaler"
+        types = transaction_type.split('-')
+        if len(types) == 2:
+            from_type, to_type = types
+            sql += ' AND u_from.role = %s AND u_to.role = %s'
+            params.append(roles.canonical(from_type))
+            params.append(roles.canonical(to_type))
+
+    if rice_type:
+        sql += ' AND rt.rice_type = %s'
+        params.append(str(rice_type))
+
+    cond, cond_params = date_window.predicate('rt.datetime', window)
+    sql += ' AND ' + cond
+    params.extend(cond_params)
+
+    if search:
+        sql += ' AND (rt.`from` LIKE %s OR rt.`to` LIKE %s OR u_from.full_name LIKE %s OR u_to.full_name LIKE %s)'
+        search_pattern = '%' + str(search) + '%'
+        params.extend([search_pattern, search_pattern, search_pattern, search_pattern])
+
+    if transaction_id:
+        sql += ' AND rt.id LIKE %s'
+        params.append('%' + str(transaction_id) + '%')
+
+    sql += ' ORDER BY rt.datetime DESC, rt.id DESC'
+    return sql, params
+
+
 @app.route('/api/rice_transactions', methods=['GET'])
 def api_get_rice_transactions():
     """Return list of rice transactions with optional filters."""
-    transaction_type = request.args.get('transaction_type')
-    rice_type = request.args.get('rice_type')
-    from_date = request.args.get('from_date')
-    to_date = request.args.get('to_date')
-    search = request.args.get('search')
-    transaction_id = request.args.get('transaction_id')
-    
     try:
         conn = get_connection(MYSQL_DATABASE)
         cur = conn.cursor(dictionary=True)
-        
-        sql = '''
-            SELECT 
-                rt.id,
-                rt.`from`,
-                rt.`to`,
-                rt.rice_type,
-                rt.quantity,
-                rt.price,
-                rt.status,
-                rt.is_reverted,
-                rt.datetime,
-                rt.block_hash,
-                rt.block_number,
-                rt.transaction_hash,
-                u_from.user_type as from_user_type,
-                u_from.full_name as from_full_name,
-                u_to.user_type as to_user_type,
-                u_to.full_name as to_full_name
-            FROM rice_transaction rt
-            LEFT JOIN users u_from ON rt.`from` = u_from.id
-            LEFT JOIN users u_to ON rt.`to` = u_to.id
-            WHERE 1=1
-        '''
-        params = []
-        
-        if transaction_type:
-            # Transaction type format: "from_type-to_type" e.g., "miller-wholesaler"
-            types = transaction_type.split('-')
-            if len(types) == 2:
-                from_type, to_type = types
-                sql += ' AND LOWER(u_from.user_type) LIKE %s AND LOWER(u_to.user_type) LIKE %s'
-                params.append('%' + from_type.lower() + '%')
-                params.append('%' + to_type.lower() + '%')
-        
-        if rice_type:
-            sql += ' AND rt.rice_type = %s'
-            params.append(str(rice_type))
-        
-        if from_date:
-            sql += ' AND DATE(rt.datetime) >= %s'
-            params.append(str(from_date))
-        
-        if to_date:
-            sql += ' AND DATE(rt.datetime) <= %s'
-            params.append(str(to_date))
-        
-        if search:
-            sql += ' AND (rt.`from` LIKE %s OR rt.`to` LIKE %s OR u_from.full_name LIKE %s OR u_to.full_name LIKE %s)'
-            search_pattern = '%' + str(search) + '%'
-            params.extend([search_pattern, search_pattern, search_pattern, search_pattern])
-        
-        if transaction_id:
-            sql += ' AND rt.id LIKE %s'
-            params.append('%' + str(transaction_id) + '%')
-        
-        sql += ' ORDER BY rt.datetime DESC, rt.id DESC'
-        
-        if params:
-            cur.execute(sql, params)
-        else:
-            cur.execute(sql)
-        
+        sql, params = _rice_transactions_query(request.args)
+        cur.execute(sql, params)
         rows = cur.fetchall()
         
         cur.close()
         conn.close()
         
         return jsonify(rows if rows else [])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except mysql.connector.Error as err:
         return jsonify({'error': str(err)}), 500
 
 
+@app.route('/api/export/rice_transactions', methods=['GET'])
+def api_export_rice_transactions():
+    """Stream every rice transaction api_get_rice_transactions would list.
+    Same filters, plus format=ndjson (default) or csv.
+    """
+    return export.response('rice_transactions', lambda cur: _rice_transactions_query(request.args),
+                           request.args.get('format'))
+
+
 @app.route('/api/rice_transactions/<int:transaction_id>/revert', methods=['POST'])
+@response_cache.invalidates('stock')
 def api_revert_rice_transaction(transaction_id):
-    """Revert a rice transaction by recording a reverse transaction on blockchain and updating stock."""
+    """Revert a rice transaction: move the rice stock back, record the reverse transaction and
+    queue it for the chain. Responds 202 like POST /api/transactions; poll status_url for the receipt.
+    """
     try:
         conn = get_connection(MYSQL_DATABASE)
         cur = conn.cursor(dictionary=True)
@@ -2420,9 +1898,9 @@ def api_revert_rice_transaction(transaction_id):
         quantity = float(tx['quantity'])
         price = float(tx['price']) if tx['price'] else 0.0
         
-        print(f"Reverting rice transaction: {transaction_id}")
-        print(f"  From: {from_party}, To: {to_party}, Type: {rice_type}, Qty: {quantity}, Price: {price}")
-        print(f"DEBUG: Retrieved price from DB: {tx['price']}, converted to: {price}")
+        logger.debug('Reverting rice transaction: %s', transaction_id)
+        logger.debug('  From: %s, To: %s, Type: %s, Qty: %s, Price: %s', from_party, to_party, rice_type, quantity, price)
+        logger.debug('Retrieved price from DB: %s, converted to: %s', tx['price'], price)
         
         # Start database transaction
         try:
@@ -2478,45 +1956,26 @@ def api_revert_rice_transaction(transaction_id):
             conn.close()
             return jsonify({'ok': False, 'error': f'Failed updating stock: {str(e)}'}), 500
         
-        # Record revert transaction on blockchain
-        block_hash = None
-        block_number = None
-        transaction_hash = None
-        revert_transaction_id = None
-        
-        try:
-            qty_int = int(quantity)
-            result = revert_rice_transaction(str(from_party), str(to_party), rice_type, qty_int, price)
-            if result and isinstance(result, dict):
-                block_hash = result.get('block_hash')
-                block_number = result.get('block_number')
-                transaction_hash = result.get('transaction_hash')
-                revert_transaction_id = result.get('transaction_id')
-            print(f"Blockchain RICE revert recorded. Block hash: {block_hash}")
-        except Exception as e:
-            print(f"Failed to record revert on blockchain: {e}")
-            # Continue with database update even if blockchain fails
-        
-        # Mark the original transaction as reverted
+        # Mark the original as reverted and insert the reverse record; the chain write
+        # goes through the outbox, so the rice_stock locks are not held while it is mined
         try:
-            print(f"DEBUG: Marking original transaction {transaction_id} as reverted")
             cur.execute('UPDATE `rice_transaction` SET reverted = 1 WHERE id = %s', (transaction_id,))
-        except mysql.connector.Error as e:
-            print(f"Warning: Failed to mark original transaction as reverted: {e}")
-            # Continue anyway
-        
-        # Insert revert transaction record
-        try:
-            print(f"DEBUG: Inserting revert with price={price}")
             # Use UTC time string to match the format sent from clients (new Date().toISOString())
             revert_time = datetime.datetime.utcnow().isoformat() + "Z"
-            if revert_transaction_id:
-                insert_sql = 'INSERT INTO `rice_transaction` (id, `from`, `to`, rice_type, quantity, price, reverted, `datetime`, block_hash, block_number, transaction_hash) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'
-                cur.execute(insert_sql, (revert_transaction_id, str(to_party), str(from_party), rice_type, quantity, price, 1, revert_time, block_hash, block_number, transaction_hash))
-            else:
-                insert_sql = 'INSERT INTO `rice_transaction` (`from`, `to`, rice_type, quantity, price, reverted, `datetime`, block_hash, block_number, transaction_hash) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'
-                cur.execute(insert_sql, (str(to_party), str(from_party), rice_type, quantity, price, 1, revert_time, block_hash, block_number, transaction_hash))
-            
+            cur.execute(
+                'INSERT INTO `rice_transaction` (`from`, `to`, rice_type, quantity, price, reverted, `datetime`) '
+                'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                (str(to_party), str(from_party), rice_type, quantity, price, 1, revert_time))
+            revert_id = cur.lastrowid
+            # on-chain the revert is the original transfer recorded with status False
+            outbox_id = outbox.enqueue(cur, 'rice_transaction', revert_id, {
+                'from': str(from_party),
+                'to': str(to_party),
+                'type': rice_type,
+                'quantity': quantity,
+                'price': price,
+                'status': 0,
+            })
             conn.commit()
         except mysql.connector.Error as e:
             try:
@@ -2529,15 +1988,25 @@ def api_revert_rice_transaction(transaction_id):
         
         cur.close()
         conn.close()
+        outbox.notify()
         
-        return jsonify({'ok': True, 'message': 'Rice transaction reverted successfully', 'block_hash': block_hash}), 200
+        return jsonify({
+            'ok': True,
+            'message': 'Rice transaction reverted successfully',
+            'id': revert_id,
+            'block_hash': None,
+            'outbox_id': outbox_id,
+            'chain_status': outbox.STATUS_PENDING,
+            'status_url': f'/api/transactions/outbox/{outbox_id}',
+        }), 202
     
     except Exception as e:
-        print(f"Error reverting rice transaction: {e}")
+        logger.error('Error reverting rice transaction: %s', e)
         return jsonify({'ok': False, 'error': str(e)}), 500
 
 
 @app.route('/api/damages', methods=['POST'])
+@response_cache.invalidates('stock')
 def api_add_damage():
     """Insert a damage record into the damage table and deduct from stock.
     Expects JSON body: { user_id, paddy_type, quantity, reason, damage_date, reverted }
@@ -2573,13 +2042,7 @@ def api_add_damage():
         cur = conn.cursor(buffered=True)
         
         # Determine user type to decide which blockchain function to use
-        user_type = None
-        try:
-            cur.execute('SELECT user_type FROM users WHERE id = %s LIMIT 1', (str(user_id),))
-            urow = cur.fetchone()
-            user_type = urow[0] if urow else None
-        except Exception:
-            user_type = None
+        user_type = user_directory.user_type(user_id)
         
         # Determine if this is rice damage based on kind override or user type
         kind_override = (payload.get('kind') or '').strip().lower()
@@ -2703,7 +2166,7 @@ def api_add_damage():
                     block_hash = result.get('block_hash')
                     block_number = result.get('block_number')
                     transaction_hash = result.get('transaction_hash')
-                print(f"Blockchain RICE damage recorded. Block hash: {block_hash}")
+                logger.debug('Blockchain RICE damage recorded. Block hash: %s', block_hash)
             else:
                 # Use regular paddy damage blockchain function
                 result = record_damage(
@@ -2717,9 +2180,9 @@ def api_add_damage():
                     block_hash = result.get('block_hash')
                     block_number = result.get('block_number')
                     transaction_hash = result.get('transaction_hash')
-                print(f"Blockchain PADDY damage recorded. Block hash: {block_hash}")
+                logger.debug('Blockchain PADDY damage recorded. Block hash: %s', block_hash)
         except Exception as e:
-            print(f"Failed to record damage on blockchain: {e}")
+            logger.warning('Failed to record damage on blockchain: %s', e)
             # Continue with database insert even if blockchain fails
             block_hash = None
             block_number = None
@@ -2778,6 +2241,7 @@ def api_add_damage():
 
 
 @app.route('/api/damages', methods=['GET'])
+@resource_version.conditional(('damage', 'rice_damage'), user_args=('user_id',))
 def api_get_damages():
     """Return damage records from both damage and rice_damage tables.
     Optional query param `user_id` to filter by user.
@@ -2889,6 +2353,7 @@ def api_get_damage(damage_id):
 
 
 @app.route('/api/damages/<int:damage_id>', methods=['PUT'])
+@response_cache.invalidates('stock')
 def api_update_damage(damage_id):
     """Update a damage record (quantity and/or reason). Optional query param `kind` = 'paddy'|'rice' to disambiguate.
     Expects JSON body: { quantity, reason }
@@ -2972,6 +2437,7 @@ def api_update_damage(damage_id):
 
 
 @app.route('/api/damages/<int:damage_id>/revert', methods=['POST'])
+@response_cache.invalidates('stock')
 def api_revert_damage(damage_id):
     """Revert a damage record by updating the reverted status and restoring stock."""
     kind = request.args.get('kind')
@@ -3076,7 +2542,7 @@ def api_revert_damage(damage_id):
                     block_number = result.get('block_number')
                     transaction_hash = result.get('transaction_hash')
                     damage_id_result = result.get('transaction_id')
-                print(f"Blockchain rice damage revert recorded. Block hash: {block_hash}, Damage ID: {damage_id_result}")
+                logger.debug('Blockchain rice damage revert recorded. Block hash: %s, Damage ID: %s', block_hash, damage_id_result)
             else:
                 # For paddy damage, call record_damage
                 result = record_damage(
@@ -3091,9 +2557,9 @@ def api_revert_damage(damage_id):
                     block_number = result.get('block_number')
                     transaction_hash = result.get('transaction_hash')
                     damage_id_result = result.get('damage_id')
-                print(f"Blockchain paddy damage revert recorded. Block hash: {block_hash}, Damage ID: {damage_id_result}")
+                logger.debug('Blockchain paddy damage revert recorded. Block hash: %s, Damage ID: %s', block_hash, damage_id_result)
         except Exception as e:
-            print(f"Failed to record damage revert on blockchain: {e}")
+            logger.warning('Failed to record damage revert on blockchain: %s', e)
             # Continue with database insert even if blockchain fails
             block_hash = None
             block_number = None
@@ -3123,6 +2589,7 @@ def api_revert_damage(damage_id):
 
 
 @app.route('/api/stock_by_district', methods=['GET'])
+@response_cache.cached(ttl=60, tags=('stock', 'users'))
 def api_get_stock_by_district():
     """Return stock grouped by district for Millers and Collectors.
     Optional query param: paddy_type to filter by specific paddy type.
@@ -3149,32 +2616,15 @@ def api_get_stock_by_district():
         cur = conn.cursor()
         
         if paddy_type:
-            # Single paddy type selected - simple aggregation
-            # Query for collectors stock by district
-            collector_sql = '''
-                SELECT u.district, SUM(s.amount) as total
-                FROM stock s
-                JOIN users u ON s.user_id = u.id
-                WHERE LOWER(u.user_type) LIKE %s AND s.type = %s
-                GROUP BY u.district
-                ORDER BY u.district
-            '''
-            cur.execute(collector_sql, ('%collect%', paddy_type))
-            collector_rows = cur.fetchall()
-            collector_data = {str(row[0] or 'Unknown'): float(row[1] or 0) for row in collector_rows}
-            
-            # Query for millers stock by district
-            miller_sql = '''
-                SELECT u.district, SUM(s.amount) as total
-                FROM stock s
-                JOIN users u ON s.user_id = u.id
-                WHERE LOWER(u.user_type) LIKE %s AND s.type = %s
-                GROUP BY u.district
-                ORDER BY u.district
-            '''
-            cur.execute(miller_sql, ('%miller%', paddy_type))
-            miller_rows = cur.fetchall()
-            miller_data = {str(row[0] or 'Unknown'): float(row[1] or 0) for row in miller_rows}
+            # Single paddy type selected - sum the rollup per role and district
+            collector_data = {}
+            miller_data = {}
+            for role, district, amount in stock_rollup.totals(cur, ['role', 'district'], paddy_type):
+                district = str(district or 'Unknown')
+                if role == 'collecter':
+                    collector_data[district] = collector_data.get(district, 0) + float(amount or 0)
+                elif role == 'miller':
+                    miller_data[district] = miller_data.get(district, 0) + float(amount or 0)
             
             # Combine all districts
             all_districts = sorted(set(list(collector_data.keys()) + list(miller_data.keys())))
@@ -3193,29 +2643,9 @@ def api_get_stock_by_district():
             })
         else:
             # No paddy type selected - return breakdown by type
-            # Query for collectors stock by district and paddy type
-            collector_sql = '''
-                SELECT u.district, s.type, SUM(s.amount) as total
-                FROM stock s
-                JOIN users u ON s.user_id = u.id
-                WHERE LOWER(u.user_type) LIKE %s
-                GROUP BY u.district, s.type
-                ORDER BY u.district, s.type
-            '''
-            cur.execute(collector_sql, ('%collect%',))
-            collector_rows = cur.fetchall()
-            
-            # Query for millers stock by district and paddy type
-            miller_sql = '''
-                SELECT u.district, s.type, SUM(s.amount) as total
-                FROM stock s
-                JOIN users u ON s.user_id = u.id
-                WHERE LOWER(u.user_type) LIKE %s
-                GROUP BY u.district, s.type
-                ORDER BY u.district, s.type
-            '''
-            cur.execute(miller_sql, ('%miller%',))
-            miller_rows = cur.fetchall()
+            rows = stock_rollup.totals(cur, ['role', 'district', 'paddy_type'])
+            collector_rows = [r[1:] for r in rows if r[0] == 'collecter']
+            miller_rows = [r[1:] for r in rows if r[0] == 'miller']
             
             cur.close()
             conn.close()
@@ -3234,7 +2664,7 @@ def api_get_stock_by_district():
                 all_paddy_types.add(ptype)
                 if ptype not in collector_data:
                     collector_data[ptype] = {}
-                collector_data[ptype][district] = amount
+                collector_data[ptype][district] = collector_data[ptype].get(district, 0) + amount
             
             for row in miller_rows:
                 district = str(row[0] or 'Unknown')
@@ -3244,7 +2674,7 @@ def api_get_stock_by_district():
                 all_paddy_types.add(ptype)
                 if ptype not in miller_data:
                     miller_data[ptype] = {}
-                miller_data[ptype][district] = amount
+                miller_data[ptype][district] = miller_data[ptype].get(district, 0) + amount
             
             all_districts = sorted(all_districts)
             all_paddy_types = sorted(all_paddy_types)
@@ -3293,24 +2723,24 @@ def api_get_stock_by_user():
         cur = conn.cursor(dictionary=True)
 
         params = []
-        user_like = f"%{user_type.lower()}%"
+        role = roles.canonical(user_type)
 
         if paddy_type:
             sql = '''
                 SELECT u.id, u.full_name, u.nic, u.district, SUM(s.amount) AS total
                 FROM stock s
                 JOIN users u ON s.user_id = u.id
-                WHERE LOWER(u.user_type) LIKE %s AND s.type = %s
+                WHERE u.role = %s AND s.type = %s
             '''
-            params = [user_like, paddy_type]
+            params = [role, paddy_type]
         else:
             sql = '''
                 SELECT u.id, u.full_name, u.nic, u.district, SUM(s.amount) AS total
                 FROM stock s
                 JOIN users u ON s.user_id = u.id
-                WHERE LOWER(u.user_type) LIKE %s
+                WHERE u.role = %s
             '''
-            params = [user_like]
+            params = [role]
 
         if district:
             sql += " AND u.district = %s"
@@ -3344,6 +2774,7 @@ def api_get_stock_by_user():
 
 
 @app.route('/api/stock_by_user_type', methods=['GET'])
+@response_cache.cached(ttl=60, tags=('stock', 'users'))
 def api_get_stock_by_user_type():
     """Return stock grouped by user_type (Miller, Collecter, PMB) and paddy type.
     Optional query param: paddy_type to filter by specific paddy type.
@@ -3362,28 +2793,9 @@ def api_get_stock_by_user_type():
         conn = get_connection(MYSQL_DATABASE)
         cur = conn.cursor()
         
-        # Query for stock grouped by user_type and paddy_type
-        if paddy_type:
-            sql = '''
-                SELECT UPPER(u.user_type) as user_type, s.type as paddy_type, SUM(s.amount) as total
-                FROM stock s
-                JOIN users u ON s.user_id = u.id
-                WHERE s.type = %s
-                GROUP BY UPPER(u.user_type), s.type
-                ORDER BY UPPER(u.user_type), s.type
-            '''
-            cur.execute(sql, (paddy_type,))
-        else:
-            sql = '''
-                SELECT UPPER(u.user_type) as user_type, s.type as paddy_type, SUM(s.amount) as total
-                FROM stock s
-                JOIN users u ON s.user_id = u.id
-                GROUP BY UPPER(u.user_type), s.type
-                ORDER BY UPPER(u.user_type), s.type
-            '''
-            cur.execute(sql)
-        
-        rows = cur.fetchall()
+        # Stock grouped by user_type and paddy_type, from the rollup
+        rows = [(role.upper(), ptype, amount)
+                for role, ptype, amount in stock_rollup.totals(cur, ['role', 'paddy_type'], paddy_type)]
         cur.close()
         conn.close()
         
@@ -3421,8 +2833,10 @@ def api_farmer_lookup():
     """Get farmer contribution details with transactions grouped by paddy type and destination.
     Query params:
       - farmer_id (required): The farmer's user ID
-      - date_from (optional): Start date filter (YYYY-MM-DD)
-      - date_to (optional): End date filter (YYYY-MM-DD)
+      - date_from (optional): Start date filter (YYYY-MM-DD), inclusive
+      - date_to (optional): End date filter (YYYY-MM-DD), inclusive
+      - tz (optional): IANA zone the dates are in (see date_window)
+      - limit, cursor (optional): page through `transactions` as on /api/transactions
     
     Response: {
         farmer: { id, full_name, field_area },
@@ -3430,176 +2844,158 @@ def api_farmer_lookup():
         breakdown: [{ paddy_type, to_collector, to_miller, to_pmb, total }],
         transactions: [{ date, paddy_type, to_party, to_party_type, quantity }]
     }
+    summary and breakdown come from farmer_contribution and cover the whole window.
+    transactions is newest first and one page (limit, default 200, at most 1000),
+    with X-Next-Cursor set when there may be more; the pages fetch the rest on demand.
     """
-    print("=== Farmer Lookup API Called ===")
     farmer_id = request.args.get('farmer_id', '').strip()
-    date_from = request.args.get('date_from', '').strip()
-    date_to = request.args.get('date_to', '').strip()
-    
-    print(f"Farmer ID: {farmer_id}")
-    print(f"Date From: {date_from}")
-    print(f"Date To: {date_to}")
     
     if not farmer_id:
-        print("ERROR: farmer_id is required")
         return jsonify({'error': 'farmer_id is required'}), 400
+    try:
+        window = date_window.parse(request.args)
+        limit = min(max(int(request.args.get('limit') or 200), 1), 1000)
+        cursor = keyset.decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
         conn = get_connection(MYSQL_DATABASE)
         cur = conn.cursor(dictionary=True)
         
         # Get farmer details
-        print(f"Querying farmer with ID: {farmer_id}")
         cur.execute('SELECT id, full_name, total_area_of_paddy_land FROM users WHERE id = %s LIMIT 1', (farmer_id,))
         farmer = cur.fetchone()
-        print(f"Farmer found: {farmer}")
         
         if not farmer:
             cur.close()
             conn.close()
-            print("ERROR: Farmer not found")
             return jsonify({'error': 'Farmer not found'}), 404
+        cur.close()
         
-        # Build query for transactions where farmer is sender (include all, even reverted)
-        sql = '''
-            SELECT t.id, t.`from`, t.`to`, t.`type` as paddy_type, t.quantity, t.price, t.status, t.is_reverted, 
-                   t.`datetime`, t.created_at, t.block_hash, t.block_number, t.transaction_hash,
-                   u.user_type as to_user_type, u.full_name as to_full_name, u.company_name as to_company_name
-            FROM `transaction` t
-            LEFT JOIN users u ON t.`to` = u.id
-            WHERE t.`from` = %s
-        '''
-        params = [farmer_id]
-        
-        if date_from:
-            sql += ' AND DATE(t.`datetime`) >= %s'
-            params.append(date_from)
-        if date_to:
-            sql += ' AND DATE(t.`datetime`) <= %s'
-            params.append(date_to)
-        
-        sql += ' ORDER BY t.`datetime` DESC'
-        
-        print(f"Executing SQL: {sql}")
-        print(f"With params: {params}")
-        
-        cur.execute(sql, tuple(params))
-        transactions = cur.fetchall()
-        
-        print(f"Found {len(transactions)} transactions")
-        
+        cur = conn.cursor()
+        # the rollup is per stored day, so it takes the requested days as they are
+        contributions = farmer_contribution.totals(cur, farmer_id, window.first_day, window.last_day)
+        
+        # the farmer's transactions (reverted included), or one page of them, on the (from, datetime) index
+        cond, cond_params = date_window.predicate('t.`datetime`', window)
+        where = "t.`from` = %s AND t.`type` IS NOT NULL AND t.`type` <> '' AND " + cond
+        params = [farmer_id] + cond_params
+        keys = keyset.page(cur, [('paddy', 'transaction', 't', where, params)], cursor, limit)
         cur.close()
+        
+        transactions = []
+        if keys:
+            cur = conn.cursor(dictionary=True)
+            cur.execute('''
+                SELECT t.id, t.`from`, t.`to`, t.`type` as paddy_type, t.quantity, t.price, t.status,
+                       t.`datetime`, t.created_at, t.block_hash, t.block_number, t.transaction_hash,
+                       u.user_type as to_user_type, u.full_name as to_full_name, u.company_name as to_company_name
+                FROM `transaction` t
+                LEFT JOIN users u ON t.`to` = u.id
+                WHERE t.id IN (%s)''' % ', '.join(['%s'] * len(keys)), [row_id for _, row_id, _ in keys])
+            by_id = {tx['id']: tx for tx in cur.fetchall()}
+            transactions = [by_id[row_id] for _, row_id, _ in keys if row_id in by_id]
+            cur.close()
         conn.close()
         
-        # Process data
+        # destination role -> summary/breakdown field
+        role_fields = {'collecter': 'to_collector', 'miller': 'to_miller', 'pmb': 'to_pmb'}
+        summary = {'total_paddy': 0, 'to_collector': 0, 'to_miller': 0, 'to_pmb': 0, 'transaction_count': 0}
         breakdown_data = {}  # {paddy_type: {to_collector, to_miller, to_pmb, total}}
-        transaction_list = []
-        
-        total_paddy = 0
-        to_collector = 0
-        to_miller = 0
-        to_pmb = 0
+        for paddy_type, role, quantity, tx_count in contributions:
+            qty = float(quantity or 0)
+            data = breakdown_data.setdefault(paddy_type, {'to_collector': 0, 'to_miller': 0, 'to_pmb': 0, 'total': 0})
+            field = role_fields.get(role)
+            if field:
+                data[field] += qty
+                summary[field] += qty
+            data['total'] += qty
+            summary['total_paddy'] += qty
+            summary['transaction_count'] += int(tx_count or 0)
+        
+        breakdown_list = [dict(paddy_type=paddy_type, **data) for paddy_type, data in sorted(breakdown_data.items())]
         
+        transaction_list = []
         for tx in transactions:
-            paddy_type = tx['paddy_type'] if tx['paddy_type'] else None
-            if not paddy_type:  # Skip transactions without paddy type
-                print(f"Skipping transaction {tx['id']} - no paddy type")
-                continue
-                
-            qty = float(tx['quantity']) if tx['quantity'] else 0
-            to_user_type = tx['to_user_type'].upper() if tx['to_user_type'] else 'UNKNOWN'
-            to_party_name = tx['to_company_name'] if tx['to_company_name'] else (tx['to_full_name'] if tx['to_full_name'] else tx['to'])
-            
-            # Check if transaction is reverted - only check status = 0
-            is_reverted = tx.get('status', 1) == 0
-            
-            print(f"Processing tx {tx['id']}: {paddy_type}, {qty} kg to {to_user_type}, status={tx.get('status')}, reverted={is_reverted}")
-            
-            # Initialize breakdown for this paddy type if needed
-            if paddy_type not in breakdown_data:
-                breakdown_data[paddy_type] = {
-                    'to_collector': 0,
-                    'to_miller': 0,
-                    'to_pmb': 0,
-                    'total': 0
-                }
-            
-            # Determine if we add or subtract based on revert status
-            multiplier = -1 if is_reverted else 1
-            adjusted_qty = qty * multiplier
-            
-            # Accumulate by destination type (add if active, subtract if reverted)
-            if to_user_type == 'COLLECTER':
-                breakdown_data[paddy_type]['to_collector'] += adjusted_qty
-                to_collector += adjusted_qty
-            elif to_user_type == 'MILLER':
-                breakdown_data[paddy_type]['to_miller'] += adjusted_qty
-                to_miller += adjusted_qty
-            elif to_user_type == 'PMB':
-                breakdown_data[paddy_type]['to_pmb'] += adjusted_qty
-                to_pmb += adjusted_qty
-            
-            breakdown_data[paddy_type]['total'] += adjusted_qty
-            total_paddy += adjusted_qty
-            
-            # Add ALL transactions to the transaction list (including reverted)
             tx_date = tx['datetime'] if tx['datetime'] else tx['created_at']
             transaction_list.append({
                 'date': tx_date.isoformat() if tx_date else '',
-                'paddy_type': paddy_type,
-                'to_party': to_party_name,
+                'paddy_type': tx['paddy_type'],
+                'to_party': tx['to_company_name'] or tx['to_full_name'] or tx['to'],
                 'to_party_id': tx['to'],
-                'to_party_type': to_user_type,
-                'quantity': qty,
+                'to_party_type': tx['to_user_type'].upper() if tx['to_user_type'] else 'UNKNOWN',
+                'quantity': float(tx['quantity']) if tx['quantity'] else 0,
                 'price': float(tx['price']) if tx['price'] else 0,
                 'block_hash': tx['block_hash'] or '',
                 'block_number': tx['block_number'] or '',
                 'transaction_hash': tx['transaction_hash'] or '',
-                'is_reverted': is_reverted
-            })
-        
-        # Convert breakdown to list
-        breakdown_list = []
-        for paddy_type, data in breakdown_data.items():
-            breakdown_list.append({
-                'paddy_type': paddy_type,
-                'to_collector': data['to_collector'],
-                'to_miller': data['to_miller'],
-                'to_pmb': data['to_pmb'],
-                'total': data['total']
+                'is_reverted': tx.get('status', 1) == 0
             })
         
-        # Sort breakdown by paddy type
-        breakdown_list.sort(key=lambda x: x['paddy_type'])
-        
-        result = {
+        response = jsonify({
             'farmer': {
                 'id': farmer['id'],
                 'full_name': farmer['full_name'],
                 'field_area': float(farmer['total_area_of_paddy_land']) if farmer.get('total_area_of_paddy_land') else 0
             },
-            'summary': {
-                'total_paddy': total_paddy,
-                'to_collector': to_collector,
-                'to_miller': to_miller,
-                'to_pmb': to_pmb,
-                'transaction_count': len(transaction_list)
-            },
+            'summary': summary,
             'breakdown': breakdown_list,
             'transactions': transaction_list
-        }
-        
-        print(f"Returning result with {len(breakdown_list)} paddy types and {len(transaction_list)} transactions")
-        return jsonify(result)
+        })
+        if len(keys) == limit:
+            kind, row_id, dt = keys[-1]
+            response.headers['X-Next-Cursor'] = keyset.encode_cursor(dt, row_id, kind)
+        return response
         
     except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
+        logger.error('MySQL Error: %s', err)
         return jsonify({'error': str(err)}), 500
-    except Exception as e:
-        print(f"General Error: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({'error': str(e)}), 500
+
+
+def _damage_lookup_query(args):
+    """(sql, params) for the damage records matching the api_damage_lookup filters.
+
+    Raises ValueError for a malformed date_from/date_to window.
+    """
+    user_type = args.get('user_type', '').strip()
+    paddy_type = args.get('paddy_type', '').strip()
+    window = date_window.parse(args)
+
+    query = '''
+        SELECT 
+            d.id,
+            d.user_id,
+            d.paddy_type,
+            d.quantity,
+            d.reason,
+            d.damage_date,
+            d.block_hash,
+            d.block_number,
+            d.transaction_hash,
+            u.full_name as user_name,
+            u.user_type
+        FROM damage d
+        LEFT JOIN users u ON d.user_id = u.id
+        WHERE 1=1
+    '''
+    params = []
+
+    # Add filters
+    if user_type:
+        query += ' AND u.role = %s'
+        params.append(roles.canonical(user_type))
+
+    if paddy_type:
+        query += ' AND d.paddy_type = %s'
+        params.append(paddy_type)
+
+    cond, cond_params = date_window.predicate('d.damage_date', window)
+    query += ' AND ' + cond
+    params.extend(cond_params)
+
+    query += ' ORDER BY d.quantity ASC'
+    return query, params
 
 
 @app.route('/api/damage_lookup', methods=['GET'])
@@ -3619,56 +3015,18 @@ def api_damage_lookup():
         date_from = request.args.get('date_from', '').strip()
         date_to = request.args.get('date_to', '').strip()
         
-        print(f"=== Damage Lookup Debug ===")
-        print(f"User Type: {user_type}")
-        print(f"Paddy Type: {paddy_type}")
-        print(f"Date From: {date_from}")
-        print(f"Date To: {date_to}")
+        logger.debug('=== Damage Lookup Debug ===')
+        logger.debug('User Type: %s', user_type)
+        logger.debug('Paddy Type: %s', paddy_type)
+        logger.debug('Date From: %s', date_from)
+        logger.debug('Date To: %s', date_to)
         
         conn = get_connection(MYSQL_DATABASE)
         cursor = conn.cursor(dictionary=True)
+        query, params = _damage_lookup_query(request.args)
         
-        # Build query
-        query = '''
-            SELECT 
-                d.id,
-                d.user_id,
-                d.paddy_type,
-                d.quantity,
-                d.reason,
-                d.damage_date,
-                d.block_hash,
-                d.block_number,
-                d.transaction_hash,
-                u.full_name as user_name,
-                u.user_type
-            FROM damage d
-            LEFT JOIN users u ON d.user_id = u.id
-            WHERE 1=1
-        '''
-        params = []
-        
-        # Add filters
-        if user_type:
-            query += ' AND u.user_type = %s'
-            params.append(user_type)
-        
-        if paddy_type:
-            query += ' AND d.paddy_type = %s'
-            params.append(paddy_type)
-        
-        if date_from:
-            query += ' AND DATE(d.damage_date) >= %s'
-            params.append(date_from)
-        
-        if date_to:
-            query += ' AND DATE(d.damage_date) <= %s'
-            params.append(date_to)
-        
-        query += ' ORDER BY d.quantity ASC'
-        
-        print(f"Query: {query}")
-        print(f"Params: {params}")
+        logger.debug('Query: %s', query)
+        logger.debug('Params: %s', params)
         
         cursor.execute(query, params)
         damage_records = cursor.fetchall()
@@ -3676,7 +3034,7 @@ def api_damage_lookup():
         cursor.close()
         conn.close()
         
-        print(f"Found {len(damage_records)} damage records")
+        logger.debug('Found %s damage records', len(damage_records))
         
         # Process results
         result = []
@@ -3697,17 +3055,28 @@ def api_damage_lookup():
         
         return jsonify(result)
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except mysql.connector.Error as err:
-        print(f"MySQL Error: {err}")
+        logger.error('MySQL Error: %s', err)
         return jsonify({'error': str(err)}), 500
     except Exception as e:
-        print(f"General Error: {e}")
+        logger.error('General Error: %s', e)
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/export/damages', methods=['GET'])
+def api_export_damages():
+    """Stream every damage record api_damage_lookup would list.
+    Same filters, plus format=ndjson (default) or csv.
+    """
+    return export.response('damages', lambda cur: _damage_lookup_query(request.args), request.args.get('format'))
+
+
 @app.route('/api/stock_user_detail', methods=['GET'])
+@resource_version.conditional(('stock',), user_args=('user_id',))
 def api_get_stock_user_detail():
     """Return per-paddy-type stock for a given user_id.
     Query param: user_id
@@ -3733,7 +3102,39 @@ def api_get_stock_user_detail():
         return jsonify({'error': str(err)}), 500
 
 
+@app.route('/api/users/bulk', methods=['POST'])
+@response_cache.invalidates('users')
+def api_bulk_add_users():
+    """Import many users from CSV or JSON lines (see user_import).
+
+    Optional query params: userType (default for rows without one) and
+    format=csv|jsonl (otherwise taken from the content type or sniffed).
+    Responds with per-row results; on-chain registration is queued.
+    """
+    fmt = request.args.get('format')
+    if not fmt:
+        ctype = request.content_type or ''
+        fmt = 'csv' if 'csv' in ctype else 'jsonl' if 'json' in ctype else None
+    try:
+        upload = request.files.get('file')
+        text = upload.read().decode('utf-8-sig') if upload else request.get_data(as_text=True)
+        rows = user_import.parse(text, fmt)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'ok': False, 'error': f'could not parse import: {e}'}), 400
+    if not rows:
+        return jsonify({'ok': False, 'error': 'no rows to import'}), 400
+    if len(rows) > user_import.IMPORT_MAX_ROWS:
+        return jsonify({'ok': False, 'error': f'at most {user_import.IMPORT_MAX_ROWS} rows per import'}), 400
+    try:
+        result = user_import.run(rows, request.args.get('userType'))
+    except mysql.connector.Error as err:
+        return jsonify({'ok': False, 'error': str(err)}), 500
+    logger.info('Bulk import: %s/%s users in %ss', result['inserted'], result['total'], result['seconds'])
+    return jsonify(result), (200 if result['inserted'] else 400)
+
+
 @app.route('/api/users', methods=['POST'])
+@response_cache.invalidates('users', 'stock')
 def api_add_user():
     payload = request.get_json() or {}
     user_type = payload.get('userType')
@@ -3747,7 +3148,11 @@ def api_add_user():
     district = payload.get('district')
     contact_number = payload.get('contactNumber')
     total_area = payload.get('totalAreaOfPaddyLand')
-    id = (log_last_inserted_user(user_type))
+    try:
+        # PMB has the fixed id 'PMB' (set below); everyone else gets the next number of their prefix
+        id = None if isinstance(user_type, str) and user_type.strip().lower().startswith('pmb') else id_sequence.next_id(user_type)
+    except mysql.connector.Error as err:
+        return jsonify({'ok': False, 'error': f'Could not allocate user id: {err}'}), 500
 
     # If creating a PMB account, enforce single-account rule and fixed id
     try:
@@ -3755,7 +3160,7 @@ def api_add_user():
             conn_chk = get_connection(MYSQL_DATABASE)
             cur_chk = conn_chk.cursor()
             # check if any existing PMB user exists (by user_type or id)
-            cur_chk.execute("SELECT id FROM users WHERE LOWER(user_type) = %s OR LOWER(id) = %s LIMIT 1", ('pmb', 'pmb'))
+            cur_chk.execute("SELECT id FROM users WHERE role = %s OR id = %s LIMIT 1", ('pmb', 'PMB'))
             existing = cur_chk.fetchone()
             cur_chk.close()
             conn_chk.close()
@@ -3793,9 +3198,9 @@ def api_add_user():
                     block_hash = result.get('block_hash')
                     block_number = result.get('block_number')
                     transaction_hash = result.get('transaction_hash')
-                print("add_farmer call finished. Block hash:", block_hash)
+                logger.debug('add_farmer call finished. Block hash: %s', block_hash)
             except Exception as e:
-                print("add_farmer raised an exception:", e)
+                logger.warning('add_farmer raised an exception: %s', e)
         elif(user_type=="Miller"):
             try:
                 result = add_miller(
@@ -3811,9 +3216,9 @@ def api_add_user():
                     block_hash = result.get('block_hash')
                     block_number = result.get('block_number')
                     transaction_hash = result.get('transaction_hash')
-                print("add_miller call finished. Block hash:", block_hash)
+                logger.debug('add_miller call finished. Block hash: %s', block_hash)
             except Exception as e:
-                print("add_miller raised an exception:", e)
+                logger.warning('add_miller raised an exception: %s', e)
         elif(user_type=="Collecter"):
             try:
                 result = add_collector(
@@ -3828,9 +3233,9 @@ def api_add_user():
                     block_hash = result.get('block_hash')
                     block_number = result.get('block_number')
                     transaction_hash = result.get('transaction_hash')
-                print("add_collector call finished. Block hash:", block_hash)
+                logger.debug('add_collector call finished. Block hash: %s', block_hash)
             except Exception as e:
-                print("add_collector raised an exception:", e)
+                logger.warning('add_collector raised an exception: %s', e)
         elif(user_type=="Wholesaler"):
             try:
                 result = add_wholesaler(
@@ -3846,9 +3251,9 @@ def api_add_user():
                     block_hash = result.get('block_hash')
                     block_number = result.get('block_number')
                     transaction_hash = result.get('transaction_hash')
-                print("add_wholesaler call finished. Block hash:", block_hash)
+                logger.debug('add_wholesaler call finished. Block hash: %s', block_hash)
             except Exception as e:
-                print("add_wholesaler raised an exception:", e)
+                logger.warning('add_wholesaler raised an exception: %s', e)
         elif(user_type=="Retailer"):
             try:
                 result = add_retailer(
@@ -3863,9 +3268,9 @@ def api_add_user():
                     block_hash = result.get('block_hash')
                     block_number = result.get('block_number')
                     transaction_hash = result.get('transaction_hash')
-                print("add_retailer call finished. Block hash:", block_hash)
+                logger.debug('add_retailer call finished. Block hash: %s', block_hash)
             except Exception as e:
-                print("add_retailer raised an exception:", e)
+                logger.warning('add_retailer raised an exception: %s', e)
         elif(user_type=="Beer"):
             try:
                 result = add_brewer(
@@ -3881,9 +3286,9 @@ def api_add_user():
                     block_hash = result.get('block_hash')
                     block_number = result.get('block_number')
                     transaction_hash = result.get('transaction_hash')
-                print("add_brewer call finished. Block hash:", block_hash)
+                logger.debug('add_brewer call finished. Block hash: %s', block_hash)
             except Exception as e:
-                print("add_brewer raised an exception:", e)
+                logger.warning('add_brewer raised an exception: %s', e)
         elif(user_type=="Animal Food"):
             try:
                 result = add_animal_food(
@@ -3899,9 +3304,9 @@ def api_add_user():
                     block_hash = result.get('block_hash')
                     block_number = result.get('block_number')
                     transaction_hash = result.get('transaction_hash')
-                print("add_animal_food call finished. Block hash:", block_hash)
+                logger.debug('add_animal_food call finished. Block hash: %s', block_hash)
             except Exception as e:
-                print("add_animal_food raised an exception:", e)
+                logger.warning('add_animal_food raised an exception: %s', e)
         elif(user_type=="Exporter"):
             try:
                 result = add_exporter(
@@ -3917,9 +3322,9 @@ def api_add_user():
                     block_hash = result.get('block_hash')
                     block_number = result.get('block_number')
                     transaction_hash = result.get('transaction_hash')
-                print("add_exporter call finished. Block hash:", block_hash)
+                logger.debug('add_exporter call finished. Block hash: %s', block_hash)
             except Exception as e:
-                print("add_exporter raised an exception:", e)
+                logger.warning('add_exporter raised an exception: %s', e)
         conn = get_connection(MYSQL_DATABASE)
         cursor = conn.cursor()
         insert_sql = '''
@@ -3944,6 +3349,7 @@ def api_add_user():
             conn.commit()
         except Exception:
             pass
+        user_directory.invalidate()
 
         # compute a user_code for the response (do not persist)
         prefix_map = {
@@ -4021,7 +3427,7 @@ def api_add_user():
                                 try:
                                     ip_cur.execute('INSERT INTO `initial_paddy` (user_id, paddy_type, quantity) VALUES (%s, %s, %s)', (str(created_user_id), ptype, qty))
                                 except Exception as e:
-                                    print(f"Failed to insert initial paddy: {e}")
+                                    logger.warning('Failed to insert initial paddy: %s', e)
                                     pass
                     
                     try:
@@ -4030,7 +3436,7 @@ def api_add_user():
                         pass
                     ip_cur.close()
                 except Exception as e:
-                    print(f"Failed to insert initial paddy from stock: {e}")
+                    logger.warning('Failed to insert initial paddy from stock: %s', e)
                     pass
 
         # If the client provided initial rice stock (for Miller), insert them into rice_stock table
@@ -4083,7 +3489,7 @@ def api_add_user():
                                 try:
                                     rice_cur.execute('INSERT INTO `rice` (user_id, rice_type, quantity) VALUES (%s, %s, %s)', (str(created_user_id), rice_type, qty))
                                 except Exception as e:
-                                    print(f"Failed to insert rice: {e}")
+                                    logger.warning('Failed to insert rice: %s', e)
                                     pass
                     
                     try:
@@ -4092,7 +3498,7 @@ def api_add_user():
                         pass
                     rice_cur.close()
                 except Exception as e:
-                    print(f"Failed to insert rice to rice table: {e}")
+                    logger.warning('Failed to insert rice to rice table: %s', e)
                     pass
 
         # If the user is a Collecter or Miller and initial paddy is provided, save it to initial_paddy table
@@ -4115,7 +3521,7 @@ def api_add_user():
                     ip_cur.close()
                 except Exception as e:
                     # ignore initial paddy insertion errors to avoid blocking user creation
-                    print(f"Failed to insert initial paddy: {e}")
+                    logger.warning('Failed to insert initial paddy: %s', e)
                     pass
 
         # return the inserted row with a computed user_code
@@ -4155,6 +3561,7 @@ def api_add_user():
 
 
 @app.route('/api/milling', methods=['POST'])
+@response_cache.invalidates('stock')
 def api_add_milling():
     """Insert a milling record into the milling table.
     Expects JSON body: { miller_id, paddy_type, input_paddy, output_rice, milling_date, drying_duration, status }
@@ -4235,9 +3642,9 @@ def api_add_milling():
                 block_number = result.get('block_number')
                 transaction_hash = result.get('transaction_hash')
                 milling_id_blockchain = result.get('milling_id')
-            print(f"Blockchain milling recorded. Block hash: {block_hash}, Milling ID: {milling_id_blockchain}")
+            logger.debug('Blockchain milling recorded. Block hash: %s, Milling ID: %s', block_hash, milling_id_blockchain)
         except Exception as e:
-            print(f"Failed to record milling on blockchain: {e}")
+            logger.warning('Failed to record milling on blockchain: %s', e)
             # Continue with database insert even if blockchain fails
             block_hash = None
             block_number = None
@@ -4274,67 +3681,82 @@ def api_add_milling():
         return jsonify({'ok': False, 'error': str(err)}), 500
 
 
+def _milling_query(cur, args):
+    """(sql, params) for the milling records matching the api_get_milling filters, newest first.
+
+    A miller_id filter is resolved to miller ids on `cur` first. Raises ValueError
+    for a malformed from_date/to_date window.
+    """
+    miller_id_param = args.get('miller_id')
+    paddy_type_param = args.get('paddy_type')
+    window = date_window.parse(args, 'from_date', 'to_date')
+
+    # the miller's name comes from the same query
+    sql = '''SELECT m.id, m.miller_id, m.paddy_type, m.input_paddy, m.output_rice, m.milling_date, m.drying_duration, m.status,
+             m.block_hash, m.block_number, m.transaction_hash, m.created_at,
+             CASE WHEN u.id IS NULL THEN 'Unknown' ELSE u.full_name END AS miller_name
+             FROM `milling` m LEFT JOIN users u ON u.id = m.miller_id WHERE 1=1'''
+    params = []
+
+    # Add miller_id filter (matches the miller's id, id prefix or name)
+    if miller_id_param:
+        term = str(miller_id_param).strip()
+        # millers come from the role index; names from the full_name ngram FULLTEXT index,
+        # which needs at least two characters
+        if len(term) >= 2:
+            cur.execute(
+                "SELECT id FROM users WHERE role = 'miller' AND (id LIKE %s OR MATCH(full_name) AGAINST (%s IN BOOLEAN MODE))",
+                (term.replace('%', r'\%').replace('_', r'\_') + '%', '"' + term.replace('"', '') + '"')
+            )
+        else:
+            cur.execute("SELECT id FROM users WHERE role = 'miller' AND (id LIKE %s OR full_name LIKE %s)", (f'{term}%', f'%{term}%'))
+        miller_ids = {term} | {r[0] if isinstance(r, tuple) else r['id'] for r in cur.fetchall()}
+        sql += ' AND m.miller_id IN (%s)' % ', '.join(['%s'] * len(miller_ids))
+        params.extend(sorted(miller_ids))
+
+    # Add paddy_type filter
+    if paddy_type_param:
+        sql += ' AND m.paddy_type = %s'
+        params.append(str(paddy_type_param))
+
+    # Add date range filters (milling_date is a DATE)
+    cond, cond_params = date_window.predicate('m.milling_date', window, is_date=True)
+    sql += ' AND ' + cond
+    params.extend(cond_params)
+
+    sql += ' ORDER BY m.milling_date DESC, m.id DESC'
+    return sql, params
+
+
 @app.route('/api/milling', methods=['GET'])
 def api_get_milling():
     """Return milling records with optional filters for miller_id, paddy_type, from_date, and to_date.
     Query params: miller_id, paddy_type, from_date (YYYY-MM-DD), to_date (YYYY-MM-DD)
     """
-    miller_id_param = request.args.get('miller_id')
-    paddy_type_param = request.args.get('paddy_type')
-    from_date_param = request.args.get('from_date')
-    to_date_param = request.args.get('to_date')
-    
     try:
         conn = get_connection(MYSQL_DATABASE)
         cur = conn.cursor(dictionary=True)
-        
-        # Build dynamic SQL query with filters
-        sql = 'SELECT id, miller_id, paddy_type, input_paddy, output_rice, milling_date, drying_duration, status, block_hash, block_number, transaction_hash, created_at FROM `milling` WHERE 1=1'
-        params = []
-        
-        # Add miller_id filter (check both miller_id and users.full_name for flexibility)
-        if miller_id_param:
-            sql += ' AND (miller_id = %s OR miller_id IN (SELECT id FROM users WHERE full_name LIKE %s OR id LIKE %s))'
-            params.extend([str(miller_id_param), f'%{miller_id_param}%', f'%{miller_id_param}%'])
-        
-        # Add paddy_type filter
-        if paddy_type_param:
-            sql += ' AND paddy_type = %s'
-            params.append(str(paddy_type_param))
-        
-        # Add date range filters
-        if from_date_param:
-            sql += ' AND milling_date >= %s'
-            params.append(str(from_date_param))
-        
-        if to_date_param:
-            sql += ' AND milling_date <= %s'
-            params.append(str(to_date_param))
-        
-        sql += ' ORDER BY milling_date DESC, id DESC LIMIT 500'
-        
-        if params:
-            cur.execute(sql, params)
-        else:
-            cur.execute(sql)
-        
+        sql, params = _milling_query(cur, request.args)
+        cur.execute(sql + ' LIMIT 500', params)
         rows = cur.fetchall()
         
-        # Enrich rows with miller name from users table
-        if rows:
-            for row in rows:
-                miller_id = row['miller_id']
-                cur.execute('SELECT full_name FROM users WHERE id = %s', (str(miller_id),))
-                user_row = cur.fetchone()
-                row['miller_name'] = user_row['full_name'] if user_row else 'Unknown'
-        
         cur.close()
         conn.close()
         return jsonify(rows)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except mysql.connector.Error as err:
         return jsonify({'error': str(err)}), 500
 
 
+@app.route('/api/export/milling', methods=['GET'])
+def api_export_milling():
+    """Stream every milling record matching the api_get_milling filters, without its 500-row cap.
+    Same filters, plus format=ndjson (default) or csv.
+    """
+    return export.response('milling', lambda cur: _milling_query(cur, request.args), request.args.get('format'))
+
+
 @app.route('/api/milling/<int:milling_id>', methods=['GET'])
 def api_get_single_milling(milling_id):
     """Get a single milling record by ID."""
@@ -4354,6 +3776,7 @@ def api_get_single_milling(milling_id):
 
 
 @app.route('/api/milling/<int:milling_id>/revert', methods=['POST'])
+@response_cache.invalidates('stock')
 def api_revert_milling(milling_id):
     """Revert a milling record by inserting a new reversal record with status = 0 on both DB and blockchain."""
     try:
@@ -4398,9 +3821,9 @@ def api_revert_milling(milling_id):
         try:
             update_sql = 'UPDATE `milling` SET status = 0 WHERE id = %s'
             cur.execute(update_sql, (milling_id,))
-            print(f"DEBUG: Updated original milling record {milling_id} to status = 0")
+            logger.debug('Updated original milling record %s to status = 0', milling_id)
         except Exception as e:
-            print(f"ERROR: Failed to update original milling record status: {e}")
+            logger.error('Failed to update original milling record status: %s', e)
         
         # Record reversal on blockchain with status = 0 (False)
         milling_id_blockchain = None
@@ -4433,9 +3856,9 @@ def api_revert_milling(milling_id):
                 block_number = result.get('block_number')
                 transaction_hash = result.get('transaction_hash')
                 milling_id_blockchain = result.get('milling_id')
-            print(f"Blockchain reversal recorded. Block hash: {block_hash}, Milling ID: {milling_id_blockchain}")
+            logger.debug('Blockchain reversal recorded. Block hash: %s, Milling ID: %s', block_hash, milling_id_blockchain)
         except Exception as e:
-            print(f"Failed to record reversal on blockchain: {e}")
+            logger.warning('Failed to record reversal on blockchain: %s', e)
             # Continue with database insert even if blockchain fails
         
         # Insert a new reversal record with status = 0 and blockchain details
@@ -4455,6 +3878,7 @@ def api_revert_milling(milling_id):
 
 
 @app.route('/api/users/<user_id>', methods=['PUT'])
+@response_cache.invalidates('users')
 def api_update_user(user_id):
     payload = request.get_json() or {}
     
@@ -4591,6 +4015,7 @@ def api_update_user(user_id):
         try:
             cursor.execute(update_sql, tuple(update_values))
             conn.commit()
+            user_directory.invalidate()
         except Exception as e:
             try:
                 conn.rollback()
@@ -4620,6 +4045,7 @@ def api_update_user(user_id):
 
 
 @app.route('/api/rice_distribution', methods=['GET'])
+@response_cache.cached(ttl=60, tags=('stock', 'users'))
 def api_rice_distribution():
     """Return rice distribution by user type (Miller, Wholesaler, PMB).
     Optional query params: district and paddy_type to filter by district and rice type.
@@ -4638,7 +4064,7 @@ def api_rice_distribution():
                 SUM(CAST(rs.quantity AS DECIMAL(14,3))) as total_quantity
             FROM rice_stock rs
             LEFT JOIN users u ON rs.miller_id = u.id
-            WHERE u.user_type IN ('Miller', 'Wholesaler', 'PMB')
+            WHERE u.role IN ('miller', 'wholesaler', 'pmb')
         '''
         params = []
         
@@ -4664,7 +4090,7 @@ def api_rice_distribution():
             SELECT DISTINCT u.district 
             FROM rice_stock rs
             LEFT JOIN users u ON rs.miller_id = u.id
-            WHERE u.user_type IN ('Miller', 'Wholesaler', 'PMB')
+            WHERE u.role IN ('miller', 'wholesaler', 'pmb')
             AND u.district IS NOT NULL AND u.district != ''
             ORDER BY u.district
         ''')
@@ -4744,7 +4170,20 @@ def debug_rice_stock():
         return jsonify({'error': str(err)}), 500
 
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Request latency, SQL and blockchain timings in Prometheus text format."""
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/debug/pool', methods=['GET'])
+def debug_pool():
+    """Connection pool statistics (open / idle / in_use connections, checkouts, waits and wait time)."""
+    return jsonify(_db.pool_stats())
+
+
 @app.route('/api/rice_stock', methods=['GET'])
+@resource_version.conditional(('rice_stock', 'users'))
 def api_rice_stock():
     """Return rice stock data with optional filtering by district, user_type, and paddy_type."""
     district_param = request.args.get('district')
@@ -4776,8 +4215,8 @@ def api_rice_stock():
             params.append(str(district_param))
         
         if user_type_param:
-            sql += ' AND u.user_type = %s'
-            params.append(str(user_type_param))
+            sql += ' AND u.role = %s'
+            params.append(roles.canonical(user_type_param))
         
         if paddy_type_param:
             sql += ' AND rs.paddy_type = %s'
@@ -1,7 +1,17 @@
 from web3 import Web3
 import json
+import logging
 import os
+import threading
+import time
+from concurrent.futures import Future
 from dotenv import load_dotenv
+from hexbytes import HexBytes
+from web3.exceptions import TimeExhausted, TransactionNotFound
+
+import metrics
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
@@ -25,15 +35,15 @@ else:
     account = Account.from_key(PRIVATE_KEY)
     WALLET_ADDRESS = Web3.to_checksum_address(account.address)
 
-print(f"Using wallet address: {WALLET_ADDRESS}")
+logger.info('Using wallet address: %s', WALLET_ADDRESS)
 
 # --- Connect to UserAccounts Blockchain (Sepolia) ---
 web3_accounts = Web3(Web3.HTTPProvider(ACCOUNTS_RPC_URL))
-print(f"UserAccounts Blockchain Connected to {ACCOUNTS_RPC_URL}: {web3_accounts.is_connected()}")
+logger.info('UserAccounts Blockchain Connected to %s: %s', ACCOUNTS_RPC_URL, web3_accounts.is_connected())
 
 # --- Connect to Operations Blockchain ---
 web3_operations = Web3(Web3.HTTPProvider(OPERATIONS_RPC_URL))
-print("Operations Blockchain Connected:", web3_operations.is_connected())
+logger.info('Operations Blockchain Connected: %s', web3_operations.is_connected())
 
 # --- Load UserAccounts ABI ---
 with open("user-accounts-abi.json") as f:
@@ -46,7 +56,7 @@ if not user_accounts_address:
         with open("user-accounts-abi-address.json") as f:
             user_accounts_address = json.load(f)["address"]
     except FileNotFoundError:
-        print("Warning: CONTRACT_ADDRESS not set in .env and user-accounts-abi-address.json not found")
+        logger.warning('CONTRACT_ADDRESS not set in .env and user-accounts-abi-address.json not found')
         user_accounts_address = None
 
 user_accounts_contract = web3_accounts.eth.contract(
@@ -65,7 +75,7 @@ if not operations_address:
         with open("operations-abi-address.json") as f:
             operations_address = json.load(f)["address"]
     except FileNotFoundError:
-        print("Warning: OPERATIONS_ADDRESS not set in .env and operations-abi-address.json not found")
+        logger.warning('OPERATIONS_ADDRESS not set in .env and operations-abi-address.json not found')
         operations_address = None
 
 operations_contract = web3_operations.eth.contract(
@@ -73,8 +83,8 @@ operations_contract = web3_operations.eth.contract(
     abi=operations_abi
 )
 
-print(f"UserAccounts Contract: {user_accounts_address}")
-print(f"Operations Contract: {operations_address}")
+logger.info('UserAccounts Contract: %s', user_accounts_address)
+logger.info('Operations Contract: %s', operations_address)
 
 # Legacy compatibility - Keep web3 and contract references for backward compatibility
 web3 = web3_accounts  # Default to accounts blockchain
@@ -92,33 +102,389 @@ def get_gas_price(web3_instance):
         # Add 10% buffer for faster confirmation
         return int(gas_price * 1.1)
     except Exception as e:
-        print(f"Failed to fetch gas price: {e}, using default")
+        logger.warning('Failed to fetch gas price: %s, using default', e)
         return web3_instance.to_wei('20', 'gwei')
 
 
+# ========================================
+# NONCE MANAGEMENT
+# ========================================
+
+# Node error messages meaning our idea of the next nonce is out of date
+_NONCE_ERRORS = ('nonce too low', 'nonce too high', 'already known', 'replacement transaction underpriced', 'invalid nonce')
+
+
+class NonceManager:
+    """Hands out nonces for one (chain, wallet) pair from memory.
+
+    The first reserve() syncs with the node's pending transaction count; after that
+    nonces are allocated locally, so concurrent senders never get the same nonce and
+    no RPC round trip is needed per transaction. A nonce whose send failed is handed
+    out again before any new one, so a failed send does not leave a gap that would
+    stall every later transaction. Nonce-related node errors drop the local state so
+    the next reserve() resyncs with the node.
+    """
+
+    def __init__(self, web3_instance, address):
+        self.web3 = web3_instance
+        self.address = address
+        self._lock = threading.Lock()
+        self._next = None
+        self._released = []  # reserved but never sent; reused lowest first
+
+    def _sync(self):
+        self._next = self.web3.eth.get_transaction_count(self.address, 'pending')
+        self._released = []
+
+    def reserve(self):
+        with self._lock:
+            if self._next is None:
+                self._sync()
+            if self._released:
+                return self._released.pop(0)
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+    def release(self, nonce, error=None):
+        """Give back a nonce whose transaction was not accepted by the node."""
+        with self._lock:
+            if error is not None and any(msg in str(error).lower() for msg in _NONCE_ERRORS):
+                self._next = None
+                self._released = []
+                return
+            if self._next is not None and nonce < self._next and nonce not in self._released:
+                self._released.append(nonce)
+                self._released.sort()
+
+    def resync(self):
+        with self._lock:
+            self._sync()
+
+
+_chain_ids = {}
+
+
+def get_chain_id(web3_instance):
+    """eth_chainId never changes for a connection, so fetch it once instead of per transaction."""
+    chain_id = _chain_ids.get(id(web3_instance))
+    if chain_id is None:
+        chain_id = web3_instance.eth.chain_id
+        _chain_ids[id(web3_instance)] = chain_id
+    return chain_id
+
+
+_nonce_managers = {}
+_nonce_managers_lock = threading.Lock()
+
+
+def get_nonce_manager(web3_instance, address=None):
+    """Return the process-wide NonceManager for (chain id, address).
+
+    Keyed by chain rather than by web3 instance: web3_accounts and web3_operations
+    may point at the same chain with the same wallet, and one account must have a
+    single allocator whichever instance sends.
+    """
+    address = address or WALLET_ADDRESS
+    key = (get_chain_id(web3_instance), address.lower())
+    with _nonce_managers_lock:
+        manager = _nonce_managers.get(key)
+        if manager is None:
+            manager = NonceManager(web3_instance, address)
+            _nonce_managers[key] = manager
+        return manager
+
+
+def send_transaction(web3_instance, contract_function, tx_params, from_address=None):
+    """Build, sign and send a contract call using a nonce from the NonceManager.
+
+    Returns the transaction hash; raises if the node rejects the transaction.
+    """
+    from_address = from_address or WALLET_ADDRESS
+    nonces = get_nonce_manager(web3_instance, from_address)
+    nonce = nonces.reserve()
+    try:
+        tx = contract_function.build_transaction(dict(tx_params, **{
+            'from': from_address,
+            'nonce': nonce,
+            'chainId': get_chain_id(web3_instance),
+        }))
+        signed_tx = web3_instance.eth.account.sign_transaction(tx, PRIVATE_KEY)
+        return web3_instance.eth.send_raw_transaction(signed_tx.raw_transaction)
+    except Exception as e:
+        nonces.release(nonce, e)
+        raise
+
+
+# ========================================
+# GAS ESTIMATION
+# ========================================
+
+# multiplier applied to eth_estimateGas results before using them as the gas limit
+GAS_SAFETY_MARGIN = float(os.getenv('GAS_SAFETY_MARGIN', 1.2))
+# a cached estimate for a trusted function is re-checked after this many uses
+GAS_ESTIMATE_REUSE = int(os.getenv('GAS_ESTIMATE_REUSE', 100))
+# functions that cannot revert (append-only Operations recorders); once an estimate is
+# cached for the same argument shape they are sent without any simulation RPC
+TRUSTED_CONTRACT_FUNCTIONS = set(filter(None, os.getenv(
+    'TRUSTED_CONTRACT_FUNCTIONS',
+    'recordTransaction,recordRiceTransaction,recordDamage,recordMilling,recordRiceDamage,'
+    'saveInitialPaddyRecord,saveInitialRiceRecord',
+).split(',')))
+
+_gas_estimates = {}  # (chain, contract, signature, argument shape) -> [estimate, uses]
+_gas_estimates_lock = threading.Lock()
+
+
+class TransactionReverted(Exception):
+    """A mined transaction whose receipt has status 0; nothing it did is on-chain."""
+
+
+def _arg_shape(value):
+    # storage cost depends on how many 32-byte words a string takes and on whether
+    # a value slot is written as zero, so calls with the same shape cost the same gas
+    if isinstance(value, str):
+        return ('s', (len(value.encode('utf-8')) + 31) // 32)
+    if isinstance(value, (list, tuple)):
+        return tuple(_arg_shape(v) for v in value)
+    return bool(value)
+
+
+def _gas_key(web3_instance, contract_function):
+    return (
+        id(web3_instance),
+        contract_function.address,
+        contract_function.abi_element_identifier,
+        _arg_shape(contract_function.args),
+    )
+
+
+def estimate_gas(web3_instance, contract_function, value=0, from_address=None):
+    """Gas limit for a contract call: eth_estimateGas times GAS_SAFETY_MARGIN.
+
+    eth_estimateGas executes the call, so a revert raises here just as the old
+    .call() simulation did, in a single RPC. Functions in TRUSTED_CONTRACT_FUNCTIONS
+    reuse the cached estimate for calls with the same argument shape and skip the RPC;
+    a reverted receipt drops that estimate again (see forget_reverted_estimate()).
+    """
+    key = _gas_key(web3_instance, contract_function)
+    if contract_function.fn_name in TRUSTED_CONTRACT_FUNCTIONS:
+        with _gas_estimates_lock:
+            cached = _gas_estimates.get(key)
+            if cached and cached[1] < GAS_ESTIMATE_REUSE:
+                cached[1] += 1
+                return int(cached[0] * GAS_SAFETY_MARGIN)
+
+    estimate = contract_function.estimate_gas({
+        'from': from_address or WALLET_ADDRESS,
+        'value': value,
+    })
+    with _gas_estimates_lock:
+        _gas_estimates[key] = [estimate, 0]
+    return int(estimate * GAS_SAFETY_MARGIN)
+
+
+def forget_reverted_estimate(contract, tx_hash):
+    """Drop the cached estimate a reverted transaction was sent with.
+
+    A cached estimate ignores storage state (a first write to a slot costs more
+    than a later one), so a reverted trusted call was most likely out of gas. The
+    call is decoded from the transaction's input, which costs one RPC, and only on
+    this path. The next call with the same argument shape is estimated afresh.
+    """
+    try:
+        tx = contract.w3.eth.get_transaction(tx_hash)
+        fn, params = contract.decode_function_input(tx['input'])
+        sent = getattr(contract.functions, fn.fn_name)(*(params[arg['name']] for arg in fn.abi['inputs']))
+        with _gas_estimates_lock:
+            _gas_estimates.pop(_gas_key(contract.w3, sent), None)
+    except Exception as e:
+        logger.warning('Could not drop the gas estimate of reverted transaction %s: %s', HexBytes(tx_hash).hex(), e)
+
+
+# ========================================
+# RECEIPT TRACKING
+# ========================================
+
+# seconds between receipt polls while transactions are pending
+RECEIPT_POLL_INTERVAL = float(os.getenv('RECEIPT_POLL_INTERVAL', 0.5))
+# seconds before a pending transaction's future fails with TimeExhausted
+RECEIPT_TIMEOUT = float(os.getenv('RECEIPT_TIMEOUT', 300))
+
+
+class ReceiptTracker:
+    """Resolves receipts for every pending transaction on one chain from a single thread.
+
+    track() returns a concurrent.futures.Future immediately; its tx_hash attribute
+    is the hash being tracked. The polling loop asks for receipts only when a new
+    block has appeared (or a hash has not been checked yet), so the cost scales
+    with blocks rather than with waiting callers. Deadlines are checked on every
+    poll, so a stalled or unreachable node still fails futures with TimeExhausted.
+    When a receipt arrives the optional on_receipt callback runs (e.g. to decode
+    events) and its return value becomes the future's result.
+    """
+
+    def __init__(self, web3_instance, poll_interval=RECEIPT_POLL_INTERVAL, timeout=RECEIPT_TIMEOUT):
+        self.web3 = web3_instance
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._pending = {}  # tx_hash -> (future, on_receipt, deadline)
+        self._unchecked = set()  # hashes added since the last poll
+        self._last_block = None
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def track(self, tx_hash, on_receipt=None):
+        future = Future()
+        future.tx_hash = tx_hash
+        with self._cond:
+            self._pending[tx_hash] = (future, on_receipt, time.monotonic() + self.timeout)
+            self._unchecked.add(tx_hash)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='receipt-tracker', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            try:
+                self._poll()
+            except Exception as e:
+                logger.warning('Receipt tracker poll failed: %s', e)
+            time.sleep(self.poll_interval)
+
+    def _expire(self, tx_hashes):
+        for tx_hash in tx_hashes:
+            with self._cond:
+                entry = self._pending.pop(tx_hash, None)
+            if entry is not None:
+                entry[0].set_exception(TimeExhausted(
+                    f"Transaction {tx_hash.hex()} is not in the chain after {self.timeout} seconds"))
+
+    def _poll(self):
+        now = time.monotonic()
+        with self._cond:
+            overdue = {h for h, entry in self._pending.items() if entry[2] <= now}
+        try:
+            block = self.web3.eth.block_number
+        except Exception:
+            self._expire(overdue)
+            raise
+        with self._cond:
+            if block != self._last_block:
+                to_check = list(self._pending)
+            else:
+                # no new block: fresh hashes, plus a last look at the overdue ones
+                to_check = [h for h in self._pending if h in self._unchecked or h in overdue]
+            self._unchecked.clear()
+        self._last_block = block
+
+        for tx_hash in to_check:
+            try:
+                receipt = self.web3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                receipt = None
+            except Exception:
+                if tx_hash not in overdue:
+                    raise
+                receipt = None
+            with self._cond:
+                entry = self._pending.get(tx_hash)
+                if entry is None:
+                    continue
+                if receipt is None and now < entry[2]:
+                    continue
+                del self._pending[tx_hash]
+            future, on_receipt, _ = entry
+            if receipt is None:
+                future.set_exception(TimeExhausted(
+                    f"Transaction {tx_hash.hex()} is not in the chain after {self.timeout} seconds"))
+                continue
+            try:
+                future.set_result(on_receipt(receipt) if on_receipt else receipt)
+            except Exception as e:
+                future.set_exception(e)
+
+
+_receipt_trackers = {}
+_receipt_trackers_lock = threading.Lock()
+
+
+def get_receipt_tracker(web3_instance):
+    """Return the process-wide ReceiptTracker for a web3 instance (one polling loop per chain)."""
+    with _receipt_trackers_lock:
+        tracker = _receipt_trackers.get(id(web3_instance))
+        if tracker is None:
+            tracker = ReceiptTracker(web3_instance)
+            _receipt_trackers[id(web3_instance)] = tracker
+        return tracker
+
+
+def track_receipt(web3_instance, tx_hash, on_receipt=None):
+    """Future resolving to on_receipt(receipt) (or the receipt) once tx_hash is mined."""
+    return get_receipt_tracker(web3_instance).track(tx_hash, on_receipt)
+
+
+def _operations_result(event_name=None, id_arg=None, id_key=None, contract=None):
+    """on_receipt callback: block info plus the record id decoded from an Operations event.
+
+    A reverted receipt raises TransactionReverted instead, so no caller takes the
+    block of a failed transaction as proof of the record. `contract` is the one the
+    transaction called (Operations unless given).
+    """
+    def on_receipt(receipt):
+        logger.debug('Transaction mined! Block number: %s', receipt.blockNumber)
+        logger.debug('Transaction mined! Block hash: %s', receipt.blockHash.hex())
+        if receipt.get('status') == 0:
+            forget_reverted_estimate(contract or operations_contract, receipt.transactionHash)
+            raise TransactionReverted(f"Transaction {receipt.transactionHash.hex()} reverted on-chain")
+        result = {
+            'block_hash': receipt.blockHash.hex(),
+            'block_number': receipt.blockNumber,
+            'transaction_hash': receipt.transactionHash.hex(),
+        }
+        if event_name:
+            event = getattr(operations_contract.events, event_name)()
+            record_id = None
+            for log in receipt.get('logs', []):
+                try:
+                    record_id = event.process_log(log)['args'][id_arg]
+                    break
+                except Exception:
+                    continue
+            if record_id is None:
+                logger.warning('No %s event found in transaction %s', event_name, receipt.transactionHash.hex())
+            else:
+                logger.debug('Saved %s: %s', id_key, record_id)
+            result[id_key] = int(record_id) if record_id is not None else None
+        return result
+    return on_receipt
+
+
 def build_and_send_transaction(web3_instance, contract_function, from_address, value=0):
     """Helper function to build, sign, and send a transaction."""
     try:
-        # Build transaction
-        tx = contract_function.build_transaction({
-            'from': from_address,
-            'nonce': web3_instance.eth.get_transaction_count(from_address),
-            'gas': 2000000,
+        tx_hash = send_transaction(web3_instance, contract_function, {
+            'gas': estimate_gas(web3_instance, contract_function, value, from_address),
             'gasPrice': get_gas_price(web3_instance),
             'value': value
-        })
-        
-        # Sign transaction
-        signed_tx = web3_instance.eth.account.sign_transaction(tx, PRIVATE_KEY)
-        
-        # Send transaction
-        tx_hash = web3_instance.eth.send_raw_transaction(signed_tx.raw_transaction)
-        print("Transaction sent:", tx_hash.hex())
+        }, from_address=from_address)
+        logger.debug('Transaction sent: %s', tx_hash.hex())
         
         # Wait for receipt
-        receipt = web3_instance.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
-        print("Transaction mined! Block number:", receipt.blockNumber)
-        print("Transaction hash:", tx_hash.hex())
+        receipt = track_receipt(web3_instance, tx_hash).result(timeout=300)
+        if receipt.get('status') == 0:
+            raise TransactionReverted(f"Transaction {tx_hash.hex()} reverted on-chain")
+        logger.debug('Transaction mined! Block number: %s', receipt.blockNumber)
+        logger.debug('Transaction hash: %s', tx_hash.hex())
         
         return {
             'block_hash': receipt.blockHash.hex(),
@@ -126,7 +492,7 @@ def build_and_send_transaction(web3_instance, contract_function, from_address, v
             'transaction_hash': tx_hash.hex()
         }
     except Exception as e:
-        print(f"Transaction failed: {e}")
+        logger.warning('Transaction failed: %s', e)
         return None
 
 
@@ -156,30 +522,21 @@ def add_farmer(
     value = web3_accounts.to_wei(value_eth, 'ether')
 
     try:
-        user_accounts_contract.functions.registerFarmer(farmer_input).call({
-            'from': WALLET_ADDRESS,
-            'value': value
-        })
-        print("Call simulation succeeded (no revert).")
+        gas = estimate_gas(web3_accounts, user_accounts_contract.functions.registerFarmer(farmer_input), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = user_accounts_contract.functions.registerFarmer(farmer_input).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_accounts.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    tx_hash = send_transaction(web3_accounts, user_accounts_contract.functions.registerFarmer(farmer_input), {
+        'gas': gas,
         'gasPrice': web3_accounts.to_wei('20', 'gwei'),
         'value': value
     })
+    logger.debug('Transaction sent: %s', tx_hash.hex())
 
-    signed_tx = web3_accounts.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_accounts.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-
-    receipt = web3_accounts.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
+    receipt = track_receipt(web3_accounts, tx_hash).result()
+    logger.debug('Transaction mined! Block number: %s', receipt.blockNumber)
+    logger.debug('Transaction mined! Block hash: %s', receipt.blockHash.hex())
     return {
         'block_hash': receipt.blockHash.hex(),
         'block_number': receipt.blockNumber,
@@ -205,29 +562,20 @@ def update_farmer(
     value = web3_accounts.to_wei(value_eth, 'ether')
 
     try:
-        user_accounts_contract.functions.updateFarmer(farmer_input).call({
-            'from': WALLET_ADDRESS,
-            'value': value,
-        })
-        print("Call simulation succeeded (no revert).")
+        gas = estimate_gas(web3_accounts, user_accounts_contract.functions.updateFarmer(farmer_input), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = user_accounts_contract.functions.updateFarmer(farmer_input).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_accounts.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    tx_hash = send_transaction(web3_accounts, user_accounts_contract.functions.updateFarmer(farmer_input), {
+        'gas': gas,
         'gasPrice': web3_accounts.to_wei('20', 'gwei'),
         'value': value,
     })
-
-    signed_tx = web3_accounts.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_accounts.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_accounts.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    receipt = track_receipt(web3_accounts, tx_hash).result()
+    logger.debug('Transaction mined! Block number: %s', receipt.blockNumber)
+    logger.debug('Transaction mined! Block hash: %s', receipt.blockHash.hex())
     return {
         'block_hash': receipt.blockHash.hex(),
         'block_number': receipt.blockNumber,
@@ -239,17 +587,17 @@ def view_farmer(farmer_id: str):
     """View a farmer by ID."""
     try:
         farmer = user_accounts_contract.functions.getFarmer(farmer_id).call()
-        print("\n--- Farmer Data ---")
-        print("ID:", farmer[0])
-        print("NIC:", farmer[1])
-        print("Full Name:", farmer[2])
-        print("Address:", farmer[3])
-        print("District:", farmer[4])
-        print("Contact:", farmer[5])
-        print("Total Paddy Field Area:", farmer[6])
+        logger.debug('--- Farmer Data ---')
+        logger.debug('ID: %s', farmer[0])
+        logger.debug('NIC: %s', farmer[1])
+        logger.debug('Full Name: %s', farmer[2])
+        logger.debug('Address: %s', farmer[3])
+        logger.debug('District: %s', farmer[4])
+        logger.debug('Contact: %s', farmer[5])
+        logger.debug('Total Paddy Field Area: %s', farmer[6])
         return farmer
     except Exception as e:
-        print("Error fetching farmer:", e)
+        logger.error('Error fetching farmer: %s', e)
         return None
 
 
@@ -278,29 +626,20 @@ def add_collector(
     value = web3_accounts.to_wei(value_eth, 'ether')
 
     try:
-        user_accounts_contract.functions.registerCollector(collector_input).call({
-            'from': WALLET_ADDRESS,
-            'value': value,
-        })
-        print("Call simulation succeeded (no revert).")
+        gas = estimate_gas(web3_accounts, user_accounts_contract.functions.registerCollector(collector_input), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = user_accounts_contract.functions.registerCollector(collector_input).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_accounts.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    tx_hash = send_transaction(web3_accounts, user_accounts_contract.functions.registerCollector(collector_input), {
+        'gas': gas,
         'gasPrice': web3_accounts.to_wei('20', 'gwei'),
         'value': value,
     })
-
-    signed_tx = web3_accounts.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_accounts.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_accounts.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    receipt = track_receipt(web3_accounts, tx_hash).result()
+    logger.debug('Transaction mined! Block number: %s', receipt.blockNumber)
+    logger.debug('Transaction mined! Block hash: %s', receipt.blockHash.hex())
     return {
         'block_hash': receipt.blockHash.hex(),
         'block_number': receipt.blockNumber,
@@ -328,29 +667,20 @@ def update_collector(
     value = web3_accounts.to_wei(value_eth, 'ether')
 
     try:
-        user_accounts_contract.functions.updateCollector(collector_input).call({
-            'from': WALLET_ADDRESS,
-            'value': value,
-        })
-        print("Call simulation succeeded (no revert).")
+        gas = estimate_gas(web3_accounts, user_accounts_contract.functions.updateCollector(collector_input), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = user_accounts_contract.functions.updateCollector(collector_input).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_accounts.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    tx_hash = send_transaction(web3_accounts, user_accounts_contract.functions.updateCollector(collector_input), {
+        'gas': gas,
         'gasPrice': web3_accounts.to_wei('20', 'gwei'),
         'value': value,
     })
-
-    signed_tx = web3_accounts.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_accounts.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_accounts.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    receipt = track_receipt(web3_accounts, tx_hash).result()
+    logger.debug('Transaction mined! Block number: %s', receipt.blockNumber)
+    logger.debug('Transaction mined! Block hash: %s', receipt.blockHash.hex())
     return {
         'block_hash': receipt.blockHash.hex(),
         'block_number': receipt.blockNumber,
@@ -362,16 +692,16 @@ def view_collector(collector_id: str):
     """View a collector by ID."""
     try:
         collector = user_accounts_contract.functions.getCollector(collector_id).call()
-        print("\n--- Collector Data ---")
-        print("ID:", collector[0])
-        print("NIC:", collector[1])
-        print("Full Name:", collector[2])
-        print("Address:", collector[3])
-        print("District:", collector[4])
-        print("Contact:", collector[5])
+        logger.debug('--- Collector Data ---')
+        logger.debug('ID: %s', collector[0])
+        logger.debug('NIC: %s', collector[1])
+        logger.debug('Full Name: %s', collector[2])
+        logger.debug('Address: %s', collector[3])
+        logger.debug('District: %s', collector[4])
+        logger.debug('Contact: %s', collector[5])
         return collector
     except Exception as e:
-        print("Error fetching collector:", e)
+        logger.error('Error fetching collector: %s', e)
         return None
 
 
@@ -402,29 +732,20 @@ def add_miller(
     value = web3_accounts.to_wei(value_eth, 'ether')
 
     try:
-        user_accounts_contract.functions.registerMiller(miller_input).call({
-            'from': WALLET_ADDRESS,
-            'value': value,
-        })
-        print("Call simulation succeeded (no revert).")
+        gas = estimate_gas(web3_accounts, user_accounts_contract.functions.registerMiller(miller_input), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = user_accounts_contract.functions.registerMiller(miller_input).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_accounts.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    tx_hash = send_transaction(web3_accounts, user_accounts_contract.functions.registerMiller(miller_input), {
+        'gas': gas,
         'gasPrice': web3_accounts.to_wei('20', 'gwei'),
         'value': value,
     })
-
-    signed_tx = web3_accounts.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_accounts.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_accounts.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    receipt = track_receipt(web3_accounts, tx_hash).result()
+    logger.debug('Transaction mined! Block number: %s', receipt.blockNumber)
+    logger.debug('Transaction mined! Block hash: %s', receipt.blockHash.hex())
     return {
         'block_hash': receipt.blockHash.hex(),
         'block_number': receipt.blockNumber,
@@ -454,29 +775,20 @@ def update_miller(
     value = web3_accounts.to_wei(value_eth, 'ether')
 
     try:
-        user_accounts_contract.functions.updateMiller(miller_input).call({
-            'from': WALLET_ADDRESS,
-            'value': value,
-        })
-        print("Call simulation succeeded (no revert).")
+        gas = estimate_gas(web3_accounts, user_accounts_contract.functions.updateMiller(miller_input), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = user_accounts_contract.functions.updateMiller(miller_input).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_accounts.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    tx_hash = send_transaction(web3_accounts, user_accounts_contract.functions.updateMiller(miller_input), {
+        'gas': gas,
         'gasPrice': web3_accounts.to_wei('20', 'gwei'),
         'value': value,
     })
-
-    signed_tx = web3_accounts.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_accounts.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_accounts.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    receipt = track_receipt(web3_accounts, tx_hash).result()
+    logger.debug('Transaction mined! Block number: %s', receipt.blockNumber)
+    logger.debug('Transaction mined! Block hash: %s', receipt.blockHash.hex())
     return {
         'block_hash': receipt.blockHash.hex(),
         'block_number': receipt.blockNumber,
@@ -488,16 +800,16 @@ def view_miller(miller_id: str):
     """View a miller by ID."""
     try:
         miller = user_accounts_contract.functions.getMiller(miller_id).call()
-        print("\n--- Miller Data ---")
-        print("ID:", miller[0])
-        print("Company Register Number:", miller[1])
-        print("Company Name:", miller[2])
-        print("Address:", miller[3])
-        print("District:", miller[4])
-        print("Contact:", miller[5])
+        logger.debug('--- Miller Data ---')
+        logger.debug('ID: %s', miller[0])
+        logger.debug('Company Register Number: %s', miller[1])
+        logger.debug('Company Name: %s', miller[2])
+        logger.debug('Address: %s', miller[3])
+        logger.debug('District: %s', miller[4])
+        logger.debug('Contact: %s', miller[5])
         return miller
     except Exception as e:
-        print("Error fetching miller:", e)
+        logger.error('Error fetching miller: %s', e)
         return None
 
 
@@ -528,29 +840,20 @@ def add_wholesaler(
     value = web3_accounts.to_wei(value_eth, 'ether')
 
     try:
-        user_accounts_contract.functions.registerWholesaler(wholesaler_input).call({
-            'from': WALLET_ADDRESS,
-            'value': value,
-        })
-        print("Call simulation succeeded (no revert).")
+        gas = estimate_gas(web3_accounts, user_accounts_contract.functions.registerWholesaler(wholesaler_input), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = user_accounts_contract.functions.registerWholesaler(wholesaler_input).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_accounts.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    tx_hash = send_transaction(web3_accounts, user_accounts_contract.functions.registerWholesaler(wholesaler_input), {
+        'gas': gas,
         'gasPrice': web3_accounts.to_wei('20', 'gwei'),
         'value': value,
     })
-
-    signed_tx = web3_accounts.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_accounts.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_accounts.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    receipt = track_receipt(web3_accounts, tx_hash).result()
+    logger.debug('Transaction mined! Block number: %s', receipt.blockNumber)
+    logger.debug('Transaction mined! Block hash: %s', receipt.blockHash.hex())
     return {
         'block_hash': receipt.blockHash.hex(),
         'block_number': receipt.blockNumber,
@@ -580,29 +883,20 @@ def update_wholesaler(
     value = web3_accounts.to_wei(value_eth, 'ether')
 
     try:
-        user_accounts_contract.functions.updateWholesaler(wholesaler_input).call({
-            'from': WALLET_ADDRESS,
-            'value': value,
-        })
-        print("Call simulation succeeded (no revert).")
+        gas = estimate_gas(web3_accounts, user_accounts_contract.functions.updateWholesaler(wholesaler_input), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = user_accounts_contract.functions.updateWholesaler(wholesaler_input).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_accounts.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    tx_hash = send_transaction(web3_accounts, user_accounts_contract.functions.updateWholesaler(wholesaler_input), {
+        'gas': gas,
         'gasPrice': web3_accounts.to_wei('20', 'gwei'),
         'value': value,
     })
-
-    signed_tx = web3_accounts.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_accounts.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_accounts.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    receipt = track_receipt(web3_accounts, tx_hash).result()
+    logger.debug('Transaction mined! Block number: %s', receipt.blockNumber)
+    logger.debug('Transaction mined! Block hash: %s', receipt.blockHash.hex())
     return {
         'block_hash': receipt.blockHash.hex(),
         'block_number': receipt.blockNumber,
@@ -635,29 +929,20 @@ def add_retailer(
     value = web3_accounts.to_wei(value_eth, 'ether')
 
     try:
-        user_accounts_contract.functions.registerRetailer(retailer_input).call({
-            'from': WALLET_ADDRESS,
-            'value': value,
-        })
-        print("Call simulation succeeded (no revert).")
+        gas = estimate_gas(web3_accounts, user_accounts_contract.functions.registerRetailer(retailer_input), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = user_accounts_contract.functions.registerRetailer(retailer_input).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_accounts.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    tx_hash = send_transaction(web3_accounts, user_accounts_contract.functions.registerRetailer(retailer_input), {
+        'gas': gas,
         'gasPrice': web3_accounts.to_wei('20', 'gwei'),
         'value': value,
     })
-
-    signed_tx = web3_accounts.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_accounts.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_accounts.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    receipt = track_receipt(web3_accounts, tx_hash).result()
+    logger.debug('Transaction mined! Block number: %s', receipt.blockNumber)
+    logger.debug('Transaction mined! Block hash: %s', receipt.blockHash.hex())
     return {
         'block_hash': receipt.blockHash.hex(),
         'block_number': receipt.blockNumber,
@@ -685,29 +970,20 @@ def update_retailer(
     value = web3_accounts.to_wei(value_eth, 'ether')
 
     try:
-        user_accounts_contract.functions.updateRetailer(retailer_input).call({
-            'from': WALLET_ADDRESS,
-            'value': value,
-        })
-        print("Call simulation succeeded (no revert).")
+        gas = estimate_gas(web3_accounts, user_accounts_contract.functions.updateRetailer(retailer_input), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = user_accounts_contract.functions.updateRetailer(retailer_input).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_accounts.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    tx_hash = send_transaction(web3_accounts, user_accounts_contract.functions.updateRetailer(retailer_input), {
+        'gas': gas,
         'gasPrice': web3_accounts.to_wei('20', 'gwei'),
         'value': value,
     })
-
-    signed_tx = web3_accounts.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_accounts.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_accounts.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    receipt = track_receipt(web3_accounts, tx_hash).result()
+    logger.debug('Transaction mined! Block number: %s', receipt.blockNumber)
+    logger.debug('Transaction mined! Block hash: %s', receipt.blockHash.hex())
     return {
         'block_hash': receipt.blockHash.hex(),
         'block_number': receipt.blockNumber,
@@ -742,29 +1018,20 @@ def add_brewer(
     value = web3_accounts.to_wei(value_eth, 'ether')
 
     try:
-        user_accounts_contract.functions.registerBrewer(brewer_input).call({
-            'from': WALLET_ADDRESS,
-            'value': value,
-        })
-        print("Call simulation succeeded (no revert).")
+        gas = estimate_gas(web3_accounts, user_accounts_contract.functions.registerBrewer(brewer_input), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = user_accounts_contract.functions.registerBrewer(brewer_input).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_accounts.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    tx_hash = send_transaction(web3_accounts, user_accounts_contract.functions.registerBrewer(brewer_input), {
+        'gas': gas,
         'gasPrice': web3_accounts.to_wei('20', 'gwei'),
         'value': value,
     })
-
-    signed_tx = web3_accounts.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_accounts.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_accounts.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    receipt = track_receipt(web3_accounts, tx_hash).result()
+    logger.debug('Transaction mined! Block number: %s', receipt.blockNumber)
+    logger.debug('Transaction mined! Block hash: %s', receipt.blockHash.hex())
     return {
         'block_hash': receipt.blockHash.hex(),
         'block_number': receipt.blockNumber,
@@ -794,29 +1061,20 @@ def update_brewer(
     value = web3_accounts.to_wei(value_eth, 'ether')
 
     try:
-        user_accounts_contract.functions.updateBrewer(brewer_input).call({
-            'from': WALLET_ADDRESS,
-            'value': value,
-        })
-        print("Call simulation succeeded (no revert).")
+        gas = estimate_gas(web3_accounts, user_accounts_contract.functions.updateBrewer(brewer_input), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = user_accounts_contract.functions.updateBrewer(brewer_input).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_accounts.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    tx_hash = send_transaction(web3_accounts, user_accounts_contract.functions.updateBrewer(brewer_input), {
+        'gas': gas,
         'gasPrice': web3_accounts.to_wei('20', 'gwei'),
         'value': value,
     })
-
-    signed_tx = web3_accounts.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_accounts.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_accounts.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    receipt = track_receipt(web3_accounts, tx_hash).result()
+    logger.debug('Transaction mined! Block number: %s', receipt.blockNumber)
+    logger.debug('Transaction mined! Block hash: %s', receipt.blockHash.hex())
     return {
         'block_hash': receipt.blockHash.hex(),
         'block_number': receipt.blockNumber,
@@ -851,29 +1109,20 @@ def add_animal_food(
     value = web3_accounts.to_wei(value_eth, 'ether')
 
     try:
-        user_accounts_contract.functions.registerAnimalFood(animal_food_input).call({
-            'from': WALLET_ADDRESS,
-            'value': value,
-        })
-        print("Call simulation succeeded (no revert).")
+        gas = estimate_gas(web3_accounts, user_accounts_contract.functions.registerAnimalFood(animal_food_input), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = user_accounts_contract.functions.registerAnimalFood(animal_food_input).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_accounts.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    tx_hash = send_transaction(web3_accounts, user_accounts_contract.functions.registerAnimalFood(animal_food_input), {
+        'gas': gas,
         'gasPrice': web3_accounts.to_wei('20', 'gwei'),
         'value': value,
     })
-
-    signed_tx = web3_accounts.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_accounts.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_accounts.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    receipt = track_receipt(web3_accounts, tx_hash).result()
+    logger.debug('Transaction mined! Block number: %s', receipt.blockNumber)
+    logger.debug('Transaction mined! Block hash: %s', receipt.blockHash.hex())
     return {
         'block_hash': receipt.blockHash.hex(),
         'block_number': receipt.blockNumber,
@@ -903,29 +1152,20 @@ def update_animal_food(
     value = web3_accounts.to_wei(value_eth, 'ether')
 
     try:
-        user_accounts_contract.functions.updateAnimalFood(animal_food_input).call({
-            'from': WALLET_ADDRESS,
-            'value': value,
-        })
-        print("Call simulation succeeded (no revert).")
+        gas = estimate_gas(web3_accounts, user_accounts_contract.functions.updateAnimalFood(animal_food_input), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = user_accounts_contract.functions.updateAnimalFood(animal_food_input).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_accounts.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    tx_hash = send_transaction(web3_accounts, user_accounts_contract.functions.updateAnimalFood(animal_food_input), {
+        'gas': gas,
         'gasPrice': web3_accounts.to_wei('20', 'gwei'),
         'value': value,
     })
-
-    signed_tx = web3_accounts.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_accounts.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_accounts.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    receipt = track_receipt(web3_accounts, tx_hash).result()
+    logger.debug('Transaction mined! Block number: %s', receipt.blockNumber)
+    logger.debug('Transaction mined! Block hash: %s', receipt.blockHash.hex())
     return {
         'block_hash': receipt.blockHash.hex(),
         'block_number': receipt.blockNumber,
@@ -959,29 +1199,20 @@ def add_exporter(
     value = web3_accounts.to_wei(value_eth, 'ether')
 
     try:
-        user_accounts_contract.functions.registerExporter(exporter_input).call({
-            'from': WALLET_ADDRESS,
-            'value': value,
-        })
-        print("Call simulation succeeded (no revert).")
+        gas = estimate_gas(web3_accounts, user_accounts_contract.functions.registerExporter(exporter_input), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = user_accounts_contract.functions.registerExporter(exporter_input).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_accounts.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    tx_hash = send_transaction(web3_accounts, user_accounts_contract.functions.registerExporter(exporter_input), {
+        'gas': gas,
         'gasPrice': web3_accounts.to_wei('20', 'gwei'),
         'value': value,
     })
-
-    signed_tx = web3_accounts.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_accounts.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_accounts.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    receipt = track_receipt(web3_accounts, tx_hash).result()
+    logger.debug('Transaction mined! Block number: %s', receipt.blockNumber)
+    logger.debug('Transaction mined! Block hash: %s', receipt.blockHash.hex())
     return {
         'block_hash': receipt.blockHash.hex(),
         'block_number': receipt.blockNumber,
@@ -1011,29 +1242,20 @@ def update_exporter(
     value = web3_accounts.to_wei(value_eth, 'ether')
 
     try:
-        user_accounts_contract.functions.updateExporter(exporter_input).call({
-            'from': WALLET_ADDRESS,
-            'value': value,
-        })
-        print("Call simulation succeeded (no revert).")
+        gas = estimate_gas(web3_accounts, user_accounts_contract.functions.updateExporter(exporter_input), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = user_accounts_contract.functions.updateExporter(exporter_input).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_accounts.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    tx_hash = send_transaction(web3_accounts, user_accounts_contract.functions.updateExporter(exporter_input), {
+        'gas': gas,
         'gasPrice': web3_accounts.to_wei('20', 'gwei'),
         'value': value,
     })
-
-    signed_tx = web3_accounts.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_accounts.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_accounts.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    receipt = track_receipt(web3_accounts, tx_hash).result()
+    logger.debug('Transaction mined! Block number: %s', receipt.blockNumber)
+    logger.debug('Transaction mined! Block hash: %s', receipt.blockHash.hex())
     return {
         'block_hash': receipt.blockHash.hex(),
         'block_number': receipt.blockNumber,
@@ -1041,6 +1263,63 @@ def update_exporter(
     }
 
 
+# ========================================
+# QUEUED USER REGISTRATION
+# ========================================
+
+# user_type -> (UserAccounts register function, builder of its input tuple from user details);
+# the tuples match what api_add_user passes to add_farmer, add_miller, ...
+USER_REGISTRATIONS = {
+    'Farmer': ('registerFarmer', lambda uid, d: (
+        uid, d.get('full_name') or '', d.get('district') or '', int(float(d.get('total_area') or 0)))),
+    'Collecter': ('registerCollector', lambda uid, d: (
+        uid, d.get('full_name') or '', d.get('address') or '', d.get('district') or '', d.get('contact_number') or '')),
+    'Miller': ('registerMiller', lambda uid, d: (
+        uid, d.get('company_register_number') or '', d.get('company_name') or '', d.get('address') or '',
+        d.get('district') or '', d.get('contact_number') or '')),
+    'Wholesaler': ('registerWholesaler', lambda uid, d: (
+        uid, d.get('company_register_number') or '', d.get('company_name') or '', d.get('address') or '',
+        d.get('district') or '', d.get('contact_number') or '')),
+    'Retailer': ('registerRetailer', lambda uid, d: (
+        uid, d.get('full_name') or d.get('company_name') or '', d.get('address') or '',
+        d.get('district') or '', d.get('contact_number') or '')),
+    'Beer': ('registerBrewer', lambda uid, d: (
+        uid, d.get('company_register_number') or '', d.get('company_name') or d.get('full_name') or '',
+        d.get('address') or '', d.get('district') or '', d.get('contact_number') or '')),
+    'Animal Food': ('registerAnimalFood', lambda uid, d: (
+        uid, d.get('company_register_number') or '', d.get('company_name') or d.get('full_name') or '',
+        d.get('address') or '', d.get('district') or '', d.get('contact_number') or '')),
+    'Exporter': ('registerExporter', lambda uid, d: (
+        uid, d.get('company_register_number') or '', d.get('company_name') or d.get('full_name') or '',
+        d.get('address') or '', d.get('district') or '', d.get('contact_number') or '')),
+}
+
+
+def register_user(user_type, user_id, details, wait=True):
+    """Register a user of any type on UserAccounts.
+
+    details holds full_name, company_register_number, company_name, address,
+    district, contact_number and total_area. With wait=False a Future of the
+    result is returned as soon as the transaction is sent, so a caller can send
+    many registrations before waiting on any receipt.
+    """
+    fn_name, build = USER_REGISTRATIONS[user_type]
+    contract_function = getattr(user_accounts_contract.functions, fn_name)(build(user_id, details))
+    tx_hash = send_transaction(web3_accounts, contract_function, {
+        'gas': estimate_gas(web3_accounts, contract_function),
+        'gasPrice': get_gas_price(web3_accounts),
+        'value': 0,
+    })
+    logger.debug('%s sent for %s: %s', fn_name, user_id, tx_hash.hex())
+    future = track_receipt(web3_accounts, tx_hash, _operations_result(contract=user_accounts_contract))
+    return future if not wait else future.result(timeout=300)
+
+
+def track_user_registration(tx_hash):
+    """register_user(wait=False)'s Future for a registration sent earlier as tx_hash."""
+    return track_receipt(web3_accounts, HexBytes(tx_hash), _operations_result(contract=user_accounts_contract))
+
+
 
 # ========================================
 # TRANSACTION FUNCTIONS
@@ -1054,94 +1333,69 @@ def record_transaction(
     price: float = 0.0,
     value_eth: float = 0.0,
     status: bool = True,  # True for normal (1), False for revert (0)
+    wait: bool = True,
 ):
-    """Record a transaction on the blockchain."""
+    """Record a transaction on the blockchain.
+
+    With wait=False a Future is returned as soon as the transaction is sent; it
+    resolves to the same result dict once the receipt arrives.
+    """
     value = web3_operations.to_wei(value_eth, 'ether')
     # Convert price to 2 decimal places and multiply by 100 to preserve precision in blockchain
     price_int = int(round(float(price) * 100, 0)) if price else 0
 
     try:
-        operations_contract.functions.recordTransaction(
+        gas = estimate_gas(web3_operations, operations_contract.functions.recordTransaction(
             from_party,
             to_party,
             product_type,
             quantity,
             price_int,
             status
-        ).call({
-            'from': WALLET_ADDRESS,
-            'value': value,
-        })
-        print("Call simulation succeeded (no revert).")
+        ), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = operations_contract.functions.recordTransaction(
+    tx_hash = send_transaction(web3_operations, operations_contract.functions.recordTransaction(
         from_party,
         to_party,
         product_type,
         quantity,
         price_int,
         status
-    ).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_operations.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    ), {
+        'gas': gas,
         'gasPrice': web3_operations.to_wei('20', 'gwei'),
         'value': value,
     })
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    future = track_receipt(web3_operations, tx_hash, _operations_result('TransactionRecorded', 'txId', 'transaction_id'))
+    if not wait:
+        return future
+    return future.result()
 
-    signed_tx = web3_operations.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_operations.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_operations.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
-    
-    # Extract transaction ID from TransactionRecorded event
-    transaction_id = None
-    try:
-        print(f"DEBUG: Number of logs in receipt: {len(receipt.get('logs', []))}")
-        for i, log in enumerate(receipt.get('logs', [])):
-            print(f"DEBUG: Processing log {i}, topics: {log.get('topics', [])}")
-            try:
-                # Try TransactionRecorded event
-                decoded = operations_contract.events.TransactionRecorded().process_log(log)
-                tx_id = decoded['args']['txId']
-                transaction_id = tx_id
-                print(f"✓ Saved transaction id: {tx_id}")
-                break
-            except Exception as e:
-                print(f"DEBUG: Log {i} decode failed: {str(e)[:100]}")
-    except Exception as e:
-        print(f"Could not extract transaction ID from event: {e}")
-    
-    if transaction_id is None:
-        print("WARNING: No transaction ID extracted from event logs")
-    
-    return {
-        'block_hash': receipt.blockHash.hex(),
-        'block_number': receipt.blockNumber,
-        'transaction_hash': tx_hash.hex(),
-        'transaction_id': transaction_id
-    }
+
+def track_transaction(tx_hash):
+    """record_transaction(wait=False)'s Future for a transaction sent earlier as tx_hash."""
+    return track_receipt(web3_operations, HexBytes(tx_hash),
+                         _operations_result('TransactionRecorded', 'txId', 'transaction_id'))
 
 
 def view_all_transactions():
     """View all recorded transactions."""
     try:
         transactions = operations_contract.functions.getAllTransactions().call()
-        print("\n--- All Recorded Transactions ---")
+        logger.debug('--- All Recorded Transactions ---')
         for tx in transactions:
-            print("\nFrom:", tx[0])
-            print("To:", tx[1])
-            print("Product Type:", tx[2])
-            print("Quantity:", tx[3])
-            print("Timestamp:", tx[4])
+            logger.debug('From: %s', tx[0])
+            logger.debug('To: %s', tx[1])
+            logger.debug('Product Type: %s', tx[2])
+            logger.debug('Quantity: %s', tx[3])
+            logger.debug('Timestamp: %s', tx[4])
         return transactions
     except Exception as e:
-        print("Error fetching transactions:", e)
+        logger.error('Error fetching transactions: %s', e)
         return []
 
 
@@ -1156,88 +1410,59 @@ def record_damage(
     damage_date: int,
     reason: str,
     value_eth: float = 0.0,
+    wait: bool = True,
 ):
     """Record damage on the blockchain. Includes a `reason` field added in the updated contract."""
     # Pass arguments separately to match ABI: recordDamage(string,string,uint256,uint256,string)
     value = web3_operations.to_wei(value_eth, 'ether')
 
     try:
-        operations_contract.functions.recordDamage(
+        gas = estimate_gas(web3_operations, operations_contract.functions.recordDamage(
             user_id,
             paddy_type,
             int(quantity),
             int(damage_date),
             reason,
-        ).call({
-            'from': WALLET_ADDRESS,
-            'value': value,
-        })
-        print("Call simulation succeeded (no revert).")
+        ), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = operations_contract.functions.recordDamage(
+    tx_hash = send_transaction(web3_operations, operations_contract.functions.recordDamage(
         user_id,
         paddy_type,
         int(quantity),
         int(damage_date),
         reason,
-    ).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_operations.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    ), {
+        'gas': gas,
         'gasPrice': web3_operations.to_wei('20', 'gwei'),
         'value': value,
     })
-
-    signed_tx = web3_operations.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_operations.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_operations.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
-    # Try to decode DamageRecorded event to get damage id
-    dmg_id = None
-    try:
-        for log in receipt.logs:
-            try:
-                decoded = operations_contract.events.DamageRecorded().process_log(log)
-                dmg_id = decoded['args'].get('damageId')
-                if dmg_id is None:
-                    dmg_id = decoded['args'].get('damage_id') or decoded['args'].get('id')
-                if dmg_id is not None:
-                    print(f"✓ Saved damage id: {dmg_id}")
-                    break
-            except Exception:
-                continue
-    except Exception as e:
-        print("Failed to decode DamageRecorded event:", e)
-    return {
-        'block_hash': receipt.blockHash.hex(),
-        'block_number': receipt.blockNumber,
-        'transaction_hash': tx_hash.hex(),
-        'damage_id': int(dmg_id) if dmg_id is not None else None
-    }
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    future = track_receipt(web3_operations, tx_hash, _operations_result('DamageRecorded', 'damageId', 'damage_id'))
+    if not wait:
+        return future
+    return future.result()
 
 
 def view_all_damage_records():
     """View all damage records."""
     try:
         damage_records = operations_contract.functions.getAllDamageRecords().call()
-        print("\n--- All Damage Records ---")
+        logger.debug('--- All Damage Records ---')
         for dr in damage_records:
-            print("\nUser ID:", dr[0])
-            print("Paddy Type:", dr[1])
-            print("Quantity:", dr[2])
-            print("Damage Date:", dr[3])
+            logger.debug('User ID: %s', dr[0])
+            logger.debug('Paddy Type: %s', dr[1])
+            logger.debug('Quantity: %s', dr[2])
+            logger.debug('Damage Date: %s', dr[3])
         return damage_records
     except Exception as e:
-        print("Error fetching damage records:", e)
+        logger.error('Error fetching damage records: %s', e)
         return []
 
 
-def record_milling(miller_id, paddy_type, input_qty, output_qty, date, drying_duration=0, status_flag=True):
+def record_milling(miller_id, paddy_type, input_qty, output_qty, date, drying_duration=0, status_flag=True, wait=True):
     """Record milling operation on the blockchain and return the block hash and milling ID.
     
     Args:
@@ -1248,161 +1473,106 @@ def record_milling(miller_id, paddy_type, input_qty, output_qty, date, drying_du
         date: Date timestamp
         drying_duration: Drying duration (default 0)
         status_flag: Status flag - True for completed (1), False for reverted (0) (default True)
+        wait: Block until mined (default True); False returns a Future of the result
     """
-    print("\n--- Recording Milling on Blockchain ---")
-    print(f"Miller ID: {miller_id}")
-    print(f"Paddy Type: {paddy_type}")
-    print(f"Input Qty: {input_qty}")
-    print(f"Output Qty: {output_qty}")
-    print(f"Date: {date}")
-    print(f"Drying Duration: {drying_duration}")
-    print(f"Status: {status_flag}")
+    logger.debug('--- Recording Milling on Blockchain ---')
+    logger.debug('Miller ID: %s', miller_id)
+    logger.debug('Paddy Type: %s', paddy_type)
+    logger.debug('Input Qty: %s', input_qty)
+    logger.debug('Output Qty: %s', output_qty)
+    logger.debug('Date: %s', date)
+    logger.debug('Drying Duration: %s', drying_duration)
+    logger.debug('Status: %s', status_flag)
 
     # Call recordMilling with individual arguments: inputPaddy, outputRice, dateTime, paddyType, dryingDuration, status
     value = 0  # No ETH value sent
 
-    # Test call
     try:
-        operations_contract.functions.recordMilling(
+        gas = estimate_gas(web3_operations, operations_contract.functions.recordMilling(
             input_qty,
             output_qty,
             date,
             paddy_type,
             drying_duration or 0,
             status_flag  # status flag (True = 1 for completed, False = 0 for reverted)
-        ).call({'from': WALLET_ADDRESS, 'value': value})
-        print("Call simulation succeeded (no revert).")
+        ), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = operations_contract.functions.recordMilling(
+    tx_hash = send_transaction(web3_operations, operations_contract.functions.recordMilling(
         input_qty,
         output_qty,
         date,
         paddy_type,
         drying_duration or 0,
         status_flag  # status flag (True = 1 for completed, False = 0 for reverted)
-    ).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_operations.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    ), {
+        'gas': gas,
         'gasPrice': web3_operations.to_wei('20', 'gwei'),
         'value': value,
     })
-
-    signed_tx = web3_operations.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_operations.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_operations.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
-    # Try to decode MillingRecorded event to get milling id
-    milling_id = None
-    try:
-        for log in receipt.logs:
-            try:
-                decoded = operations_contract.events.MillingRecorded().process_log(log)
-                milling_id = decoded['args'].get('millingId')
-                if milling_id is None:
-                    milling_id = decoded['args'].get('milling_id') or decoded['args'].get('id')
-                if milling_id is not None:
-                    print(f"✓ Saved milling id: {milling_id}")
-                    break
-            except Exception:
-                continue
-    except Exception as e:
-        print("Failed to decode MillingRecorded event:", e)
-    return {
-        'block_hash': receipt.blockHash.hex(),
-        'block_number': receipt.blockNumber,
-        'transaction_hash': tx_hash.hex(),
-        'milling_id': int(milling_id) if milling_id is not None else None
-    }
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    future = track_receipt(web3_operations, tx_hash, _operations_result('MillingRecorded', 'millingId', 'milling_id'))
+    if not wait:
+        return future
+    return future.result()
 
 
 def view_all_milling_records():
     """View all milling records."""
     try:
         milling_records = operations_contract.functions.getAllMillingRecords().call()
-        print("\n--- All Milling Records ---")
+        logger.debug('--- All Milling Records ---')
         for mr in milling_records:
-            print("\nMiller ID:", mr[0])
-            print("Paddy Type:", mr[1])
-            print("Input Qty:", mr[2])
-            print("Output Qty:", mr[3])
-            print("Date:", mr[4])
+            logger.debug('Miller ID: %s', mr[0])
+            logger.debug('Paddy Type: %s', mr[1])
+            logger.debug('Input Qty: %s', mr[2])
+            logger.debug('Output Qty: %s', mr[3])
+            logger.debug('Date: %s', mr[4])
         return milling_records
     except Exception as e:
-        print("Error fetching milling records:", e)
+        logger.error('Error fetching milling records: %s', e)
         return []
 
 
-def record_rice_transaction(from_party, to_party, rice_type, quantity, price=0.0, status=True):
+def record_rice_transaction(from_party, to_party, rice_type, quantity, price=0.0, status=True, wait=True):
     """Record a rice transaction on the blockchain using recordRiceTransaction and return the block hash."""
-    print("\n--- Recording Rice Transaction on Blockchain ---")
-    print(f"From: {from_party}")
-    print(f"To: {to_party}")
-    print(f"Rice Type: {rice_type}")
-    print(f"Quantity: {quantity}")
-    print(f"Price: {price:.2f}")
-    print(f"Status: {status}")
+    logger.debug('--- Recording Rice Transaction on Blockchain ---')
+    logger.debug('From: %s', from_party)
+    logger.debug('To: %s', to_party)
+    logger.debug('Rice Type: %s', rice_type)
+    logger.debug('Quantity: %s', quantity)
+    logger.debug('Price: %.2f', price)
+    logger.debug('Status: %s', status)
 
     qty = int(quantity)
     # Convert price to 2 decimal places and multiply by 100 to preserve precision in blockchain
     price_int = int(round(float(price) * 100, 0)) if price else 0
     value = 0  # No ETH value sent
 
-    # Test call
     try:
-        operations_contract.functions.recordRiceTransaction(from_party, to_party, rice_type, qty, price_int, status).call({'from': WALLET_ADDRESS, 'value': value})
-        print("Call simulation succeeded (no revert).")
+        gas = estimate_gas(web3_operations, operations_contract.functions.recordRiceTransaction(from_party, to_party, rice_type, qty, price_int, status), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = operations_contract.functions.recordRiceTransaction(from_party, to_party, rice_type, qty, price_int, status).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_operations.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    tx_hash = send_transaction(web3_operations, operations_contract.functions.recordRiceTransaction(from_party, to_party, rice_type, qty, price_int, status), {
+        'gas': gas,
         'gasPrice': web3_operations.to_wei('20', 'gwei'),
         'value': value,
     })
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    future = track_receipt(web3_operations, tx_hash, _operations_result('RiceTransactionRecorded', 'riceTxId', 'transaction_id'))
+    if not wait:
+        return future
+    return future.result()
 
-    signed_tx = web3_operations.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_operations.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_operations.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
-    
-    # Extract transaction ID from RiceTransactionRecorded event
-    rice_transaction_id = None
-    try:
-        print(f"DEBUG: Number of logs in receipt: {len(receipt.get('logs', []))}")
-        for i, log in enumerate(receipt.get('logs', [])):
-            print(f"DEBUG: Processing log {i}, topics: {log.get('topics', [])}")
-            try:
-                # Try RiceTransactionRecorded event
-                decoded = operations_contract.events.RiceTransactionRecorded().process_log(log)
-                rice_tx_id = decoded['args']['riceTxId']
-                rice_transaction_id = rice_tx_id
-                print(f"✓ Saved rice transaction id: {rice_tx_id}")
-                break
-            except Exception as e:
-                print(f"DEBUG: Log {i} decode failed: {str(e)[:100]}")
-    except Exception as e:
-        print(f"Could not extract rice transaction ID from event: {e}")
-    
-    if rice_transaction_id is None:
-        print("WARNING: No rice transaction ID extracted from event logs")
-    
-    return {
-        'block_hash': receipt.blockHash.hex(),
-        'block_number': receipt.blockNumber,
-        'transaction_hash': tx_hash.hex(),
-        'transaction_id': rice_transaction_id
-    }
+
+def track_rice_transaction(tx_hash):
+    """record_rice_transaction(wait=False)'s Future for a rice transaction sent earlier as tx_hash."""
+    return track_receipt(web3_operations, HexBytes(tx_hash),
+                         _operations_result('RiceTransactionRecorded', 'riceTxId', 'transaction_id'))
 
 
 def get_rice_transaction(rice_tx_id):
@@ -1416,7 +1586,7 @@ def get_rice_transaction(rice_tx_id):
     - timestamp: Transaction timestamp
     - status: Transaction status (True/False)
     """
-    print(f"\n--- Retrieving Rice Transaction ID: {rice_tx_id} ---")
+    logger.debug('--- Retrieving Rice Transaction ID: %s ---', rice_tx_id)
     
     try:
         result = operations_contract.functions.getRiceTransaction(int(rice_tx_id)).call()
@@ -1430,22 +1600,22 @@ def get_rice_transaction(rice_tx_id):
             'status': result[5]
         }
         
-        print(f"Rice Transaction Retrieved:")
-        print(f"  From: {rice_tx_data['from_party']}")
-        print(f"  To: {rice_tx_data['to_party']}")
-        print(f"  Rice Type: {rice_tx_data['rice_type']}")
-        print(f"  Quantity: {rice_tx_data['quantity']}")
-        print(f"  Timestamp: {rice_tx_data['timestamp']}")
-        print(f"  Status: {rice_tx_data['status']}")
+        logger.debug('Rice Transaction Retrieved:')
+        logger.debug('  From: %s', rice_tx_data['from_party'])
+        logger.debug('  To: %s', rice_tx_data['to_party'])
+        logger.debug('  Rice Type: %s', rice_tx_data['rice_type'])
+        logger.debug('  Quantity: %s', rice_tx_data['quantity'])
+        logger.debug('  Timestamp: %s', rice_tx_data['timestamp'])
+        logger.debug('  Status: %s', rice_tx_data['status'])
         
         return rice_tx_data
     
     except Exception as e:
-        print(f"Error retrieving rice transaction: {e}")
+        logger.error('Error retrieving rice transaction: %s', e)
         return None
 
 
-def revert_rice_transaction(from_party, to_party, rice_type, quantity, price=0.0):
+def revert_rice_transaction(from_party, to_party, rice_type, quantity, price=0.0, wait=True):
     """Revert a rice transaction on the blockchain (record with status=False).
     This is equivalent to recording a transaction with status=False to mark it as reversed.
     
@@ -1458,472 +1628,418 @@ def revert_rice_transaction(from_party, to_party, rice_type, quantity, price=0.0
     - transaction_hash: Transaction hash
     - transaction_id: Revert transaction ID on blockchain
     """
-    print("\n--- Reverting Rice Transaction on Blockchain ---")
-    print(f"From: {from_party}")
-    print(f"To: {to_party}")
-    print(f"Rice Type: {rice_type}")
-    print(f"Quantity: {quantity}")
-    print(f"Price: {price:.2f}")
-    print("Status: False (Revert)")
+    logger.debug('--- Reverting Rice Transaction on Blockchain ---')
+    logger.debug('From: %s', from_party)
+    logger.debug('To: %s', to_party)
+    logger.debug('Rice Type: %s', rice_type)
+    logger.debug('Quantity: %s', quantity)
+    logger.debug('Price: %.2f', price)
+    logger.debug('Status: False (Revert)')
 
     qty = int(quantity)
     # Convert price to 2 decimal places and multiply by 100 to preserve precision in blockchain
     price_int = int(round(float(price) * 100, 0)) if price else 0
     value = 0  # No ETH value sent
 
-    # Test call
     try:
-        operations_contract.functions.recordRiceTransaction(from_party, to_party, rice_type, qty, price_int, False).call({'from': WALLET_ADDRESS, 'value': value})
-        print("Call simulation succeeded (no revert).")
+        gas = estimate_gas(web3_operations, operations_contract.functions.recordRiceTransaction(from_party, to_party, rice_type, qty, price_int, False), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = operations_contract.functions.recordRiceTransaction(from_party, to_party, rice_type, qty, price_int, False).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_operations.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    tx_hash = send_transaction(web3_operations, operations_contract.functions.recordRiceTransaction(from_party, to_party, rice_type, qty, price_int, False), {
+        'gas': gas,
         'gasPrice': web3_operations.to_wei('20', 'gwei'),
         'value': value,
     })
+    logger.debug('Revert transaction sent: %s', tx_hash.hex())
+    future = track_receipt(web3_operations, tx_hash, _operations_result('RiceTransactionRecorded', 'riceTxId', 'transaction_id'))
+    if not wait:
+        return future
+    return future.result()
 
-    signed_tx = web3_operations.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_operations.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Revert transaction sent:", tx_hash.hex())
-    receipt = web3_operations.eth.wait_for_transaction_receipt(tx_hash)
-    print("Revert transaction mined! Block number:", receipt.blockNumber)
-    print("Revert transaction mined! Block hash:", receipt.blockHash.hex())
-    
-    # Extract revert transaction ID from RiceTransactionRecorded event
-    revert_rice_transaction_id = None
-    try:
-        print(f"DEBUG: Number of logs in receipt: {len(receipt.get('logs', []))}")
-        for i, log in enumerate(receipt.get('logs', [])):
-            print(f"DEBUG: Processing log {i}, topics: {log.get('topics', [])}")
-            try:
-                # Try RiceTransactionRecorded event
-                decoded = operations_contract.events.RiceTransactionRecorded().process_log(log)
-                revert_tx_id = decoded['args']['riceTxId']
-                revert_rice_transaction_id = revert_tx_id
-                print(f"✓ Saved revert transaction id: {revert_tx_id}")
-                break
-            except Exception as e:
-                print(f"DEBUG: Log {i} decode failed: {str(e)[:100]}")
-    except Exception as e:
-        print(f"Could not extract revert transaction ID from event: {e}")
-    
-    if revert_rice_transaction_id is None:
-        print("WARNING: No revert transaction ID extracted from event logs")
-    
-    return {
-        'block_hash': receipt.blockHash.hex(),
-        'block_number': receipt.blockNumber,
-        'transaction_hash': tx_hash.hex(),
-        'transaction_id': revert_rice_transaction_id
-    }
 
-
-def record_rice_damage(user_id, rice_type, quantity, damage_date, reason, value_eth: float = 0.0):
+def record_rice_damage(user_id, rice_type, quantity, damage_date, reason, value_eth: float = 0.0, wait=True):
     """Record rice damage on the blockchain and return the block hash. Includes `reason`."""
-    print("\n--- Recording Rice Damage on Blockchain ---")
-    print(f"User ID: {user_id}")
-    print(f"Rice Type: {rice_type}")
-    print(f"Quantity: {quantity}")
-    print(f"Damage Date: {damage_date}")
-    print(f"Reason: {reason}")
+    logger.debug('--- Recording Rice Damage on Blockchain ---')
+    logger.debug('User ID: %s', user_id)
+    logger.debug('Rice Type: %s', rice_type)
+    logger.debug('Quantity: %s', quantity)
+    logger.debug('Damage Date: %s', damage_date)
+    logger.debug('Reason: %s', reason)
 
     # Pass arguments separately to match ABI: recordRiceDamage(string,string,uint256,uint256,string)
     value = web3_operations.to_wei(value_eth, 'ether')
 
     try:
-        operations_contract.functions.recordRiceDamage(
+        gas = estimate_gas(web3_operations, operations_contract.functions.recordRiceDamage(
             user_id,
             rice_type,
             int(quantity),
             int(damage_date),
             reason,
-        ).call({'from': WALLET_ADDRESS, 'value': value})
-        print("Call simulation succeeded (no revert).")
+        ), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
-    tx = operations_contract.functions.recordRiceDamage(
+    tx_hash = send_transaction(web3_operations, operations_contract.functions.recordRiceDamage(
         user_id,
         rice_type,
         int(quantity),
         int(damage_date),
         reason,
-    ).build_transaction({
-        'from': WALLET_ADDRESS,
-        'nonce': web3_operations.eth.get_transaction_count(WALLET_ADDRESS),
-        'gas': 2000000,
+    ), {
+        'gas': gas,
         'gasPrice': web3_operations.to_wei('20', 'gwei'),
         'value': value,
     })
+    logger.debug('Transaction sent: %s', tx_hash.hex())
+    future = track_receipt(web3_operations, tx_hash, _operations_result('RiceDamageRecorded', 'riceDamageId', 'transaction_id'))
+    if not wait:
+        return future
+    return future.result()
 
-    signed_tx = web3_operations.eth.account.sign_transaction(tx, PRIVATE_KEY)
-    tx_hash = web3_operations.eth.send_raw_transaction(signed_tx.raw_transaction)
-    print("Transaction sent:", tx_hash.hex())
-    receipt = web3_operations.eth.wait_for_transaction_receipt(tx_hash)
-    print("Transaction mined! Block number:", receipt.blockNumber)
-    print("Transaction mined! Block hash:", receipt.blockHash.hex())
-    
-    # Extract damage ID from RiceDamageRecorded event
-    rice_damage_id = None
-    try:
-        print(f"DEBUG: Number of logs in receipt: {len(receipt.get('logs', []))}")
-        for i, log in enumerate(receipt.get('logs', [])):
-            print(f"DEBUG: Processing log {i}, topics: {log.get('topics', [])}")
-            try:
-                # Try RiceDamageRecorded event
-                decoded = operations_contract.events.RiceDamageRecorded().process_log(log)
-                damage_id = decoded['args']['riceDamageId']
-                rice_damage_id = damage_id
-                print(f"✓ Saved rice damage id: {damage_id}")
-                break
-            except Exception as e:
-                print(f"DEBUG: Log {i} decode failed: {str(e)[:100]}")
-    except Exception as e:
-        print(f"Could not extract rice damage ID from event: {e}")
-    
-    if rice_damage_id is None:
-        print("WARNING: No rice damage ID extracted from event logs")
-    
-    return {
-        'block_hash': receipt.blockHash.hex(),
-        'block_number': receipt.blockNumber,
-        'transaction_hash': tx_hash.hex(),
-        'transaction_id': rice_damage_id
-    }
 
-
-def save_initial_paddy_record(user_id, paddy_type, quantity):
+def save_initial_paddy_record(user_id, paddy_type, quantity, wait=True):
     """Record initial paddy to blockchain and return block info and recordId.
     Returns None if blockchain is unavailable (will still save to database).
     """
     import time
     
-    print("\n--- Recording Initial Paddy on Blockchain ---")
-    print(f"User ID: {user_id}")
-    print(f"Paddy Type: {paddy_type}")
-    print(f"Quantity: {quantity}")
+    logger.debug('--- Recording Initial Paddy on Blockchain ---')
+    logger.debug('User ID: %s', user_id)
+    logger.debug('Paddy Type: %s', paddy_type)
+    logger.debug('Quantity: %s', quantity)
 
     # Check if blockchain is connected
     if not web3_operations.is_connected():
-        print("⚠️  Operations blockchain is not connected on port 8546")
-        print("   Skipping blockchain recording. Record will be saved to database without blockchain data.")
-        print("   To enable blockchain: Start Hardhat node with: npx hardhat node --port 8546")
+        logger.warning('Operations blockchain is not connected on port 8546')
+        logger.debug('   Skipping blockchain recording. Record will be saved to database without blockchain data.')
+        logger.debug('   To enable blockchain: Start Hardhat node with: npx hardhat node --port 8546')
         return None
 
     # Check if contract is deployed
     try:
         contract_code = web3_operations.eth.get_code(operations_contract.address)
         if len(contract_code) == 0:
-            print("⚠️  Operations contract not deployed - skipping blockchain recording")
-            print(f"   Contract address: {operations_contract.address}")
-            print(f"   Please deploy the contract first using deployment scripts")
+            logger.warning('Operations contract not deployed - skipping blockchain recording')
+            logger.debug('   Contract address: %s', operations_contract.address)
+            logger.debug('   Please deploy the contract first using deployment scripts')
             return None
     except Exception as e:
-        print(f"⚠️  Cannot check contract deployment: {e}")
+        logger.warning('Cannot check contract deployment: %s', e)
         return None
 
     value = 0  # No ETH value sent
     current_timestamp = int(time.time())
 
     try:
-        # Test call to get recordId
-        record_id = operations_contract.functions.saveInitialPaddyRecord(
+        gas = estimate_gas(web3_operations, operations_contract.functions.saveInitialPaddyRecord(
             user_id, 
             paddy_type, 
             int(quantity), 
             current_timestamp,
             True
-        ).call({'from': WALLET_ADDRESS, 'value': value})
-        print(f"Call simulation succeeded. Record ID from contract: {record_id}")
+        ), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
     try:
-        tx = operations_contract.functions.saveInitialPaddyRecord(
+        tx_hash = send_transaction(web3_operations, operations_contract.functions.saveInitialPaddyRecord(
             user_id, 
             paddy_type, 
             int(quantity), 
             current_timestamp,
             True
-        ).build_transaction({
-            'from': WALLET_ADDRESS,
-            'nonce': web3_operations.eth.get_transaction_count(WALLET_ADDRESS),
-            'gas': 2000000,
+        ), {
+            'gas': gas,
             'gasPrice': web3_operations.to_wei('20', 'gwei'),
             'value': value,
         })
-
-        signed_tx = web3_operations.eth.account.sign_transaction(tx, PRIVATE_KEY)
-        tx_hash = web3_operations.eth.send_raw_transaction(signed_tx.raw_transaction)
-        print("Transaction sent:", tx_hash.hex())
-        receipt = web3_operations.eth.wait_for_transaction_receipt(tx_hash)
-        print("Transaction mined! Block number:", receipt.blockNumber)
-        print("Transaction mined! Block hash:", receipt.blockHash.hex())
-        
-        return {
-            'block_hash': receipt.blockHash.hex(),
-            'block_number': receipt.blockNumber,
-            'transaction_hash': tx_hash.hex(),
-            'record_id': record_id
-        }
+        logger.debug('Transaction sent: %s', tx_hash.hex())
+        future = track_receipt(web3_operations, tx_hash, _operations_result('InitialPaddyRecorded', 'recordId', 'record_id'))
+        if not wait:
+            return future
+        return future.result()
     except Exception as e:
-        print(f"Failed to record initial paddy on blockchain: {e}")
+        logger.warning('Failed to record initial paddy on blockchain: %s', e)
         return None
 
 
-def revert_initial_paddy_record(user_id, paddy_type, quantity):
+def revert_initial_paddy_record(user_id, paddy_type, quantity, wait=True):
     """Revert initial paddy record on blockchain with status=False.
     Returns None if blockchain is unavailable (will still save to database).
     """
     import time
     
-    print("\n--- Reverting Initial Paddy on Blockchain ---")
-    print(f"User ID: {user_id}")
-    print(f"Paddy Type: {paddy_type}")
-    print(f"Quantity: {quantity}")
-    print("Status: False (Revert)")
+    logger.debug('--- Reverting Initial Paddy on Blockchain ---')
+    logger.debug('User ID: %s', user_id)
+    logger.debug('Paddy Type: %s', paddy_type)
+    logger.debug('Quantity: %s', quantity)
+    logger.debug('Status: False (Revert)')
 
     # Check if blockchain is connected
     if not web3_operations.is_connected():
-        print("⚠️  Operations blockchain is not connected on port 8546")
-        print("   Skipping blockchain recording. Record will be saved to database without blockchain data.")
-        print("   To enable blockchain: Start Hardhat node with: npx hardhat node --port 8546")
+        logger.warning('Operations blockchain is not connected on port 8546')
+        logger.debug('   Skipping blockchain recording. Record will be saved to database without blockchain data.')
+        logger.debug('   To enable blockchain: Start Hardhat node with: npx hardhat node --port 8546')
         return None
 
     # Check if contract is deployed
     try:
         contract_code = web3_operations.eth.get_code(operations_contract.address)
         if len(contract_code) == 0:
-            print("⚠️  Operations contract not deployed - skipping blockchain recording")
-            print(f"   Contract address: {operations_contract.address}")
-            print(f"   Please deploy the contract first using deployment scripts")
+            logger.warning('Operations contract not deployed - skipping blockchain recording')
+            logger.debug('   Contract address: %s', operations_contract.address)
+            logger.debug('   Please deploy the contract first using deployment scripts')
             return None
     except Exception as e:
-        print(f"⚠️  Cannot check contract deployment: {e}")
+        logger.warning('Cannot check contract deployment: %s', e)
         return None
 
     value = 0  # No ETH value sent
     current_timestamp = int(time.time())
 
     try:
-        # Test call to get recordId
-        record_id = operations_contract.functions.saveInitialPaddyRecord(
+        gas = estimate_gas(web3_operations, operations_contract.functions.saveInitialPaddyRecord(
             user_id, 
             paddy_type, 
             int(quantity), 
             current_timestamp,
             False  # Status = False for revert
-        ).call({'from': WALLET_ADDRESS, 'value': value})
-        print(f"Call simulation succeeded. Revert Record ID from contract: {record_id}")
+        ), value)
     except Exception as e:
-        print("Call simulation reverted or failed:", e)
+        logger.warning('Gas estimation reverted or failed: %s', e)
         return None
 
     try:
-        tx = operations_contract.functions.saveInitialPaddyRecord(
+        tx_hash = send_transaction(web3_operations, operations_contract.functions.saveInitialPaddyRecord(
             user_id, 
             paddy_type, 
             int(quantity), 
             current_timestamp,
             False  # Status = False for revert
-        ).build_transaction({
-            'from': WALLET_ADDRESS,
-            'nonce': web3_operations.eth.get_transaction_count(WALLET_ADDRESS),
-            'gas': 2000000,
+        ), {
+            'gas': gas,
             'gasPrice': web3_operations.to_wei('20', 'gwei'),
             'value': value,
         })
-
-        signed_tx = web3_operations.eth.account.sign_transaction(tx, PRIVATE_KEY)
-        tx_hash = web3_operations.eth.send_raw_transaction(signed_tx.raw_transaction)
-        print("Revert transaction sent:", tx_hash.hex())
-        receipt = web3_operations.eth.wait_for_transaction_receipt(tx_hash)
-        print("Revert transaction mined! Block number:", receipt.blockNumber)
-        print("Revert transaction mined! Block hash:", receipt.blockHash.hex())
-        
-        return {
-            'block_hash': receipt.blockHash.hex(),
-            'block_number': receipt.blockNumber,
-            'transaction_hash': tx_hash.hex(),
-            'record_id': record_id
-        }
+        logger.debug('Revert transaction sent: %s', tx_hash.hex())
+        future = track_receipt(web3_operations, tx_hash, _operations_result('InitialPaddyRecorded', 'recordId', 'record_id'))
+        if not wait:
+            return future
+        return future.result()
     except Exception as e:
-        print(f"Failed to revert initial paddy on blockchain: {e}")
+        logger.warning('Failed to revert initial paddy on blockchain: %s', e)
         return None
 
 
-def save_initial_rice_record(user_id, rice_type, quantity):
+def save_initial_rice_record(user_id, rice_type, quantity, wait=True):
     """Record initial rice to blockchain and return block info.
     Returns None if blockchain is unavailable (will still save to database).
     """
     import time
     
-    print("\n--- Recording Initial Rice on Blockchain ---")
-    print(f"User ID: {user_id}")
-    print(f"Rice Type: {rice_type}")
-    print(f"Quantity: {quantity}")
+    logger.debug('--- Recording Initial Rice on Blockchain ---')
+    logger.debug('User ID: %s', user_id)
+    logger.debug('Rice Type: %s', rice_type)
+    logger.debug('Quantity: %s', quantity)
 
     # Check if blockchain is connected
     if not web3_operations.is_connected():
-        print("⚠️  Operations blockchain is not connected on port 8546")
-        print("   Skipping blockchain recording. Record will be saved to database without blockchain data.")
+        logger.warning('Operations blockchain is not connected on port 8546')
+        logger.debug('   Skipping blockchain recording. Record will be saved to database without blockchain data.')
         return None
 
     # Check if contract is deployed
     try:
         contract_code = web3_operations.eth.get_code(operations_contract.address)
         if len(contract_code) == 0:
-            print("⚠️  Operations contract not deployed - skipping blockchain recording")
-            print(f"   Contract address: {operations_contract.address}")
-            print(f"   Please deploy the contract first using deployment scripts")
+            logger.warning('Operations contract not deployed - skipping blockchain recording')
+            logger.debug('   Contract address: %s', operations_contract.address)
+            logger.debug('   Please deploy the contract first using deployment scripts')
             return None
     except Exception as e:
-        print(f"⚠️  Cannot check contract deployment: {e}")
+        logger.warning('Cannot check contract deployment: %s', e)
         return None
 
     value = 0  # No ETH value sent
     current_timestamp = int(time.time())
 
     try:
-        # Test call to get recordId
-        record_id = operations_contract.functions.saveInitialRiceRecord(
+        gas = estimate_gas(web3_operations, operations_contract.functions.saveInitialRiceRecord(
             user_id, 
             rice_type, 
             int(quantity), 
             current_timestamp,
             True
-        ).call({'from': WALLET_ADDRESS, 'value': value})
-        print(f"Call simulation succeeded. Record ID from contract: {record_id}")
+        ), value)
     except Exception as e:
-        print(f"⚠️  Call simulation reverted or failed: {e}")
-        print("   This usually means the contract hasn't been redeployed with the saveInitialRiceRecord function.")
-        print("   Please redeploy the contract on the blockchain.")
+        logger.warning('Gas estimation reverted or failed: %s', e)
+        logger.debug("   This usually means the contract hasn't been redeployed with the saveInitialRiceRecord function.")
+        logger.debug('   Please redeploy the contract on the blockchain.')
         return None
 
     try:
-        tx = operations_contract.functions.saveInitialRiceRecord(
+        tx_hash = send_transaction(web3_operations, operations_contract.functions.saveInitialRiceRecord(
             user_id, 
             rice_type, 
             int(quantity), 
             current_timestamp,
             True
-        ).build_transaction({
-            'from': WALLET_ADDRESS,
-            'nonce': web3_operations.eth.get_transaction_count(WALLET_ADDRESS),
-            'gas': 2000000,
+        ), {
+            'gas': gas,
             'gasPrice': web3_operations.to_wei('20', 'gwei'),
             'value': value,
         })
-
-        signed_tx = web3_operations.eth.account.sign_transaction(tx, PRIVATE_KEY)
-        tx_hash = web3_operations.eth.send_raw_transaction(signed_tx.raw_transaction)
-        print("Transaction sent:", tx_hash.hex())
-        receipt = web3_operations.eth.wait_for_transaction_receipt(tx_hash)
-        print("Transaction mined! Block number:", receipt.blockNumber)
-        print("Transaction mined! Block hash:", receipt.blockHash.hex())
-        
-        return {
-            'block_id': receipt.blockNumber,
-            'block_hash': receipt.blockHash.hex(),
-            'block_number': receipt.blockNumber,
-            'transaction_hash': tx_hash.hex(),
-            'record_id': record_id
-        }
+        logger.debug('Transaction sent: %s', tx_hash.hex())
+        future = track_receipt(web3_operations, tx_hash, lambda receipt: dict(_operations_result('InitialRiceRecorded', 'recordId', 'record_id')(receipt), block_id=receipt.blockNumber))
+        if not wait:
+            return future
+        return future.result()
     except Exception as e:
-        print(f"⚠️  Failed to record initial rice on blockchain: {e}")
-        print("   The record will still be saved to the database without blockchain fields.")
+        logger.warning('Failed to record initial rice on blockchain: %s', e)
+        logger.debug('   The record will still be saved to the database without blockchain fields.')
         return None
 
 
-def revert_initial_rice_record(user_id, rice_type, quantity):
+def revert_initial_rice_record(user_id, rice_type, quantity, wait=True):
     """Revert initial rice record on blockchain with status=False.
     Returns None if blockchain is unavailable (will still save to database).
     """
     import time
     
-    print("\n--- Reverting Initial Rice on Blockchain ---")
-    print(f"User ID: {user_id}")
-    print(f"Rice Type: {rice_type}")
-    print(f"Quantity: {quantity}")
-    print("Status: False (Revert)")
+    logger.debug('--- Reverting Initial Rice on Blockchain ---')
+    logger.debug('User ID: %s', user_id)
+    logger.debug('Rice Type: %s', rice_type)
+    logger.debug('Quantity: %s', quantity)
+    logger.debug('Status: False (Revert)')
 
     # Check if blockchain is connected
     if not web3_operations.is_connected():
-        print("⚠️  Operations blockchain is not connected on port 8546")
-        print("   Skipping blockchain recording. Record will be saved to database without blockchain data.")
+        logger.warning('Operations blockchain is not connected on port 8546')
+        logger.debug('   Skipping blockchain recording. Record will be saved to database without blockchain data.')
         return None
 
     # Check if contract is deployed
     try:
         contract_code = web3_operations.eth.get_code(operations_contract.address)
         if len(contract_code) == 0:
-            print("⚠️  Operations contract not deployed - skipping blockchain recording")
-            print(f"   Contract address: {operations_contract.address}")
-            print(f"   Please deploy the contract first using deployment scripts")
+            logger.warning('Operations contract not deployed - skipping blockchain recording')
+            logger.debug('   Contract address: %s', operations_contract.address)
+            logger.debug('   Please deploy the contract first using deployment scripts')
             return None
     except Exception as e:
-        print(f"⚠️  Cannot check contract deployment: {e}")
+        logger.warning('Cannot check contract deployment: %s', e)
         return None
 
     value = 0  # No ETH value sent
     current_timestamp = int(time.time())
 
     try:
-        # Test call to get recordId
-        record_id = operations_contract.functions.saveInitialRiceRecord(
+        gas = estimate_gas(web3_operations, operations_contract.functions.saveInitialRiceRecord(
             user_id, 
             rice_type, 
             int(quantity), 
             current_timestamp,
             False  # Status = False for revert
-        ).call({'from': WALLET_ADDRESS, 'value': value})
-        print(f"Call simulation succeeded. Revert Record ID from contract: {record_id}")
+        ), value)
     except Exception as e:
-        print(f"⚠️  Call simulation reverted or failed: {e}")
-        print("   This usually means the contract hasn't been redeployed with the saveInitialRiceRecord function.")
-        print("   Please redeploy the contract on the blockchain.")
+        logger.warning('Gas estimation reverted or failed: %s', e)
+        logger.debug("   This usually means the contract hasn't been redeployed with the saveInitialRiceRecord function.")
+        logger.debug('   Please redeploy the contract on the blockchain.')
         return None
 
     try:
-        tx = operations_contract.functions.saveInitialRiceRecord(
+        tx_hash = send_transaction(web3_operations, operations_contract.functions.saveInitialRiceRecord(
             user_id, 
             rice_type, 
             int(quantity), 
             current_timestamp,
             False  # Status = False for revert
-        ).build_transaction({
-            'from': WALLET_ADDRESS,
-            'nonce': web3_operations.eth.get_transaction_count(WALLET_ADDRESS),
-            'gas': 2000000,
+        ), {
+            'gas': gas,
             'gasPrice': web3_operations.to_wei('20', 'gwei'),
             'value': value,
         })
-
-        signed_tx = web3_operations.eth.account.sign_transaction(tx, PRIVATE_KEY)
-        tx_hash = web3_operations.eth.send_raw_transaction(signed_tx.raw_transaction)
-        print("Revert transaction sent:", tx_hash.hex())
-        receipt = web3_operations.eth.wait_for_transaction_receipt(tx_hash)
-        print("Revert transaction mined! Block number:", receipt.blockNumber)
-        print("Revert transaction mined! Block hash:", receipt.blockHash.hex())
-        
-        return {
-            'block_hash': receipt.blockHash.hex(),
-            'block_number': receipt.blockNumber,
-            'transaction_hash': tx_hash.hex(),
-            'record_id': record_id
-        }
+        logger.debug('Revert transaction sent: %s', tx_hash.hex())
+        future = track_receipt(web3_operations, tx_hash, _operations_result('InitialRiceRecorded', 'recordId', 'record_id'))
+        if not wait:
+            return future
+        return future.result()
     except Exception as e:
-        print(f"Failed to revert initial rice on blockchain: {e}")
+        logger.warning('Failed to revert initial rice on blockchain: %s', e)
         return None
 
 
+# ========================================
+# BATCH RECORDING
+# ========================================
+
+# kind -> (batch contract function, per-record event, event id argument, result key)
+BATCH_SPECS = {
+    'transaction': ('recordTransactionsBatch', 'TransactionRecorded', 'txId', 'transaction_id'),
+    'rice_transaction': ('recordRiceTransactionsBatch', 'RiceTransactionRecorded', 'riceTxId', 'transaction_id'),
+}
+
+
+def transaction_args(from_party, to_party, product_type, quantity, price=0.0, status=True):
+    """recordTransaction/recordRiceTransaction arguments for one record, price in cents."""
+    price_int = int(round(float(price) * 100, 0)) if price else 0
+    return (from_party, to_party, product_type, int(quantity), price_int, bool(status))
+
+
+def _batch_results(event_name, id_arg, id_key):
+    """on_receipt callback for a batch: one result dict per record event, in emit (= row) order."""
+    def on_receipt(receipt):
+        if receipt.get('status') == 0:
+            forget_reverted_estimate(operations_contract, receipt.transactionHash)
+            raise TransactionReverted(f"Batch transaction {receipt.transactionHash.hex()} reverted on-chain")
+        event = getattr(operations_contract.events, event_name)()
+        results = []
+        for log in receipt.get('logs', []):
+            try:
+                record_id = event.process_log(log)['args'][id_arg]
+            except Exception:
+                continue
+            results.append({
+                'block_hash': receipt.blockHash.hex(),
+                'block_number': receipt.blockNumber,
+                'transaction_hash': receipt.transactionHash.hex(),
+                id_key: int(record_id),
+            })
+        return results
+    return on_receipt
+
+
+def record_batch(kind, rows):
+    """Send `rows` (transaction_args() tuples) as one Operations batch transaction.
+
+    Returns a Future, with the hash as its tx_hash attribute, of one result dict
+    per row in row order, each the same dict the single-record writer returns.
+    Raises if gas estimation reverts (e.g. a contract deployed without the batch
+    functions) or the node rejects the transaction.
+    """
+    fn_name, event_name, id_arg, id_key = BATCH_SPECS[kind]
+    # rows of arguments -> one array per contract parameter
+    columns = [list(column) for column in zip(*rows)]
+    contract_function = getattr(operations_contract.functions, fn_name)(*columns)
+    tx_hash = send_transaction(web3_operations, contract_function, {
+        'gas': estimate_gas(web3_operations, contract_function),
+        'gasPrice': web3_operations.to_wei('20', 'gwei'),
+        'value': 0,
+    })
+    logger.debug('%s sent (%s records): %s', fn_name, len(rows), tx_hash.hex())
+    return track_receipt(web3_operations, tx_hash, _batch_results(event_name, id_arg, id_key))
+
+
+def track_batch(kind, tx_hash):
+    """record_batch()'s Future for a batch sent earlier as tx_hash."""
+    _, event_name, id_arg, id_key = BATCH_SPECS[kind]
+    return track_receipt(web3_operations, HexBytes(tx_hash), _batch_results(event_name, id_arg, id_key))
+
 
 # ========================================
 # UTILITY FUNCTIONS
@@ -1932,15 +2048,19 @@ def revert_initial_rice_record(user_id, rice_type, quantity):
 def check_connection():
     """Check if web3 is connected to the blockchain."""
     if web3.is_connected():
-        print("✓ Connected to blockchain")
-        print("Network ID:", web3_operations.eth.chain_id)
-        print("Latest block:", web3_operations.eth.block_number)
+        logger.debug('Connected to blockchain')
+        logger.debug('Network ID: %s', web3_operations.eth.chain_id)
+        logger.debug('Latest block: %s', web3_operations.eth.block_number)
         return True
     else:
-        print("✗ Not connected to blockchain")
+        logger.error('Not connected to blockchain')
         return False
 
 
+# time every public call for /metrics (per function, and per request as "chain")
+metrics.instrument_chain(globals(), __name__)
+
+
 if __name__ == "__main__":
     print("=" * 50)
     print("Rice Supply Chain Blockchain Interface")
@@ -0,0 +1,135 @@
+"""Role-scoped page bootstrap for GET /api/dashboard?role=...
+
+Each page used to fire one fetch() per widget on load, every one a separate
+HTTP round trip with its own pooled connection. WIDGETS lists, per role, the GET
+requests that page makes while it starts. build() runs their view functions
+in-process and returns all of their bodies in one payload, keyed by widget name,
+so the data is exactly what the individual endpoints return. The payload also
+carries each widget's URL, and the X-Next-Cursor of widgets that are keyset
+paged; static/dashboard.js (used by index.html, miller.html and pmb.html)
+answers the page's own requests for those URLs from it.
+
+The views run inside db.shared_connection(), so a dashboard uses one database
+connection however many widgets it has. With DASHBOARD_WORKERS > 1 the widgets
+are split across that many threads, each with its own connection, so
+independent queries run concurrently.
+
+"{user}" in widget params is the logged-in user's id (session), or the `user`
+query parameter when there is no session.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from flask import request
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# threads (= connections) per dashboard; 1 keeps it on a single connection
+DASHBOARD_WORKERS = int(os.environ.get('DASHBOARD_WORKERS', 1))
+
+# role -> [(widget name, path, query params)]; the requests the page (templates/) makes
+# on load, with the same params. Data a tab loads when opened stays its own request.
+WIDGETS = {
+    'admin': [
+        ('stats', '/api/stats', {}),
+        ('paddy_types', '/api/paddy_types', {}),
+        ('stock_history', '/api/stock_history', {}),
+        ('farmers', '/api/users', {'user_type': 'FARMER'}),
+    ],
+    'miller': [
+        ('me', '/api/me', {}),
+        ('paddy_types', '/api/paddy_types', {}),
+        ('farmers', '/api/users/by_type', {'type': 'Farmer'}),
+        ('transactions', '/api/transactions', {'to': '{user}'}),
+        ('milling', '/api/milling', {'miller_id': '{user}'}),
+        ('paddy_damages', '/api/damages', {'user_id': '{user}', 'kind': 'paddy'}),
+    ],
+    'pmb': [
+        ('me', '/api/me', {}),
+        ('paddy_types', '/api/paddy_types', {}),
+        ('farmers', '/api/users/by_type', {'type': 'Farmer'}),
+        ('transactions', '/api/transactions', {'to': '{user}'}),
+        ('paddy_damages', '/api/damages', {'user_id': '{user}', 'kind': 'paddy'}),
+    ],
+    'collecter': [
+        ('me', '/api/me', {}),
+        ('paddy_types', '/api/paddy_types', {}),
+        ('users', '/api/users', {}),
+        ('transactions', '/api/transactions', {'to': '{user}'}),
+        ('paddy_stock', '/api/stock_by_type', {'kind': 'paddy', 'user_id': '{user}'}),
+        ('paddy_damages', '/api/damages', {'user_id': '{user}', 'kind': 'paddy'}),
+    ],
+}
+
+# widgets that need "{user}" are left out when there is no user
+_USER = '{user}'
+
+
+def _params(params, user_id):
+    return {k: (user_id if v == _USER else v) for k, v in params.items()}
+
+
+def _needs_user(params):
+    return any(v == _USER for v in params.values())
+
+
+def _call(app, path, params, headers):
+    """(status, JSON body, X-Next-Cursor) of a GET view, dispatched in-process."""
+    with app.test_request_context(path, method='GET', query_string=params, headers=headers):
+        try:
+            rv = app.dispatch_request()
+        except Exception as e:
+            rv = app.handle_user_exception(e)
+        response = app.make_response(rv)
+    return response.status_code, response.get_json(silent=True), response.headers.get('X-Next-Cursor')
+
+
+def _run(app, widgets, headers):
+    results = {}
+    with db.shared_connection():
+        for name, path, params in widgets:
+            try:
+                results[name] = _call(app, path, params, headers)
+            except Exception as e:
+                logger.warning('Dashboard widget %s failed: %s', name, e)
+                results[name] = (500, {'error': str(e)}, None)
+    return results
+
+
+def _run_in_thread(app, widgets, headers):
+    with app.app_context():
+        return _run(app, widgets, headers)
+
+
+def build(app, role, user_id=None):
+    """Payload for a role's dashboard; KeyError for an unknown role."""
+    widgets = [(name, path, _params(params, user_id)) for name, path, params in WIDGETS[role]
+               if user_id or not _needs_user(params)]
+    # widgets read the session (e.g. /api/me) from the caller's cookie
+    headers = {'Cookie': request.headers['Cookie']} if 'Cookie' in request.headers else {}
+
+    workers = max(1, min(DASHBOARD_WORKERS, len(widgets)))
+    if workers == 1:
+        results = _run(app, widgets, headers)
+    else:
+        groups = [widgets[i::workers] for i in range(workers)]
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for part in pool.map(lambda group: _run_in_thread(app, group, headers), groups):
+                results.update(part)
+
+    payload = {'role': role, 'user_id': user_id, 'widgets': {}, 'errors': {}, 'urls': {}, 'cursors': {}}
+    for name, path, params in widgets:
+        payload['urls'][name] = f'{path}?{urlencode(params)}' if params else path
+        status, body, next_cursor = results[name]
+        if status < 400:
+            payload['widgets'][name] = body
+            if next_cursor:
+                payload['cursors'][name] = next_cursor
+        else:
+            payload['errors'][name] = {'status': status, 'error': (body or {}).get('error') if isinstance(body, dict) else None}
+    return payload
@@ -0,0 +1,97 @@
+"""Date-window filters for the history endpoints.
+
+Endpoints used to filter with DATE(col) >= %s / DATE(col) <= %s. Wrapping the
+column in a function hides it from its index, so every such query scanned the
+whole table. parse() turns a request's from/to parameters into a half-open
+window [start, end) once, and predicate() filters on the raw column
+(col >= start AND col < end), which MySQL serves with an index range scan.
+
+Bounds are inclusive calendar days (YYYY-MM-DD) or ISO datetimes:
+  - a day covers that whole day, so to=2024-05-31 ends at 2024-06-01 00:00;
+  - a datetime is an exact instant, and the window ends just after it;
+  - with tz=<IANA zone> (or a datetime that has an offset), the bounds are read
+    in that zone and converted to HISTORY_TIMEZONE, the zone the DATETIME
+    columns are stored in. Naive datetimes and tz-less days are taken as stored.
+
+DATE columns (and the per-day rollups) have no time of day; predicate(...,
+is_date=True) filters them on the calendar days as given.
+"""
+import datetime
+import os
+from collections import namedtuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# zone of the naive values in DATETIME columns; empty means the server's local time
+HISTORY_TIMEZONE = os.environ.get('HISTORY_TIMEZONE', '')
+
+_ONE_DAY = datetime.timedelta(days=1)
+_RESOLUTION = datetime.timedelta(microseconds=1)
+
+# start/end: naive datetimes in HISTORY_TIMEZONE, end exclusive; first_day/last_day:
+# the calendar days as requested, both inclusive. Any of them may be None.
+DateWindow = namedtuple('DateWindow', 'start end first_day last_day')
+
+EMPTY = DateWindow(None, None, None, None)
+
+
+def _storage_zone():
+    return ZoneInfo(HISTORY_TIMEZONE) if HISTORY_TIMEZONE else None
+
+
+def _to_storage(value, zone):
+    """Naive datetime in HISTORY_TIMEZONE for `value` (naive values are read in `zone`, if given)."""
+    if value.tzinfo is None:
+        if zone is None:
+            return value
+        value = value.replace(tzinfo=zone)
+    # astimezone(None) converts to the server's local time
+    return value.astimezone(_storage_zone()).replace(tzinfo=None)
+
+
+def _bound(text, zone, is_end):
+    """(datetime in storage time, calendar day) for one bound; ValueError if malformed."""
+    if len(text) == 10:
+        day = datetime.date.fromisoformat(text)
+        start_of_day = datetime.datetime.combine(day + _ONE_DAY if is_end else day, datetime.time())
+        return _to_storage(start_of_day, zone), day
+    value = datetime.datetime.fromisoformat(text.replace('Z', '+00:00'))
+    day = value.date()
+    return _to_storage(value + _RESOLUTION if is_end else value, zone), day
+
+
+def parse(args, from_key='date_from', to_key='date_to', tz_key='tz'):
+    """DateWindow from the request args `from_key`/`to_key` (and `tz_key`); ValueError if malformed."""
+    from_text = (args.get(from_key) or '').strip()
+    to_text = (args.get(to_key) or '').strip()
+    tz_name = (args.get(tz_key) or '').strip()
+    if not from_text and not to_text:
+        return EMPTY
+    try:
+        zone = ZoneInfo(tz_name) if tz_name else None
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f'{tz_key} must be an IANA time zone name, e.g. Asia/Colombo')
+    try:
+        start, first_day = _bound(from_text, zone, False) if from_text else (None, None)
+        end, last_day = _bound(to_text, zone, True) if to_text else (None, None)
+    except ValueError:
+        raise ValueError(f'{from_key} and {to_key} must be YYYY-MM-DD or ISO datetimes')
+    if start is not None and end is not None and start >= end:
+        raise ValueError(f'{from_key} must not be after {to_key}')
+    return DateWindow(start, end, first_day, last_day)
+
+
+def predicate(column, window, is_date=False):
+    """(SQL condition, params) restricting `column` to `window`; ('1=1', []) for no window."""
+    if is_date:
+        lower = window.first_day
+        upper = window.last_day + _ONE_DAY if window.last_day else None
+    else:
+        lower, upper = window.start, window.end
+    conditions, params = [], []
+    if lower is not None:
+        conditions.append(f'{column} >= %s')
+        params.append(lower)
+    if upper is not None:
+        conditions.append(f'{column} < %s')
+        params.append(upper)
+    return (' AND '.join(conditions) or '1=1'), params
@@ -0,0 +1,343 @@
+"""MySQL connection handling for the Flask app.
+
+get_connection() hands out connections from a process-wide pool instead of
+opening a new TCP connection (handshake + auth) for every request. Calling
+close() on a pooled connection returns it to the pool, so existing route code
+keeps working unchanged. Any connection a request forgets to close (e.g. an
+early `return`) is reclaimed when the Flask app context tears down. Cursors of
+pooled connections are timed for /metrics (see metrics.py).
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import mysql.connector
+from dotenv import load_dotenv
+from flask import g, has_app_context
+
+import metrics
+
+load_dotenv()
+
+# MySQL configuration - change via environment variables or edit below
+MYSQL_HOST = os.environ.get('MYSQL_HOST', '127.0.0.1')
+MYSQL_PORT = int(os.environ.get('MYSQL_PORT', 3306))
+MYSQL_USER = os.environ.get('MYSQL_USER', 'root')
+MYSQL_PASSWORD = os.environ.get('MYSQL_PASSWORD', '')
+MYSQL_DATABASE = os.environ.get('MYSQL_DATABASE', 'rice_supply')
+
+# Pool configuration
+# POOL_SIZE connections are kept open; up to POOL_MAX_OVERFLOW extra connections
+# may be opened under load and are closed again when returned.
+POOL_SIZE = int(os.environ.get('MYSQL_POOL_SIZE', 10))
+POOL_MAX_OVERFLOW = int(os.environ.get('MYSQL_POOL_MAX_OVERFLOW', 10))
+# seconds to wait for a free connection before giving up
+POOL_TIMEOUT = float(os.environ.get('MYSQL_POOL_TIMEOUT', 30))
+# connections idle longer than this (seconds) are replaced instead of reused
+POOL_RECYCLE = float(os.environ.get('MYSQL_POOL_RECYCLE', 1800))
+# ping connections on checkout when they have been idle longer than this (seconds)
+POOL_PRE_PING_AFTER = float(os.environ.get('MYSQL_POOL_PRE_PING_AFTER', 5))
+
+
+def _connect(db=None):
+    cfg = {
+        'host': MYSQL_HOST,
+        'user': MYSQL_USER,
+        'password': MYSQL_PASSWORD,
+        'port': MYSQL_PORT,
+        'autocommit': True,
+    }
+    if db:
+        cfg['database'] = db
+    return mysql.connector.connect(**cfg)
+
+
+class PoolTimeout(mysql.connector.Error):
+    """Raised when no connection becomes available within POOL_TIMEOUT."""
+
+
+class PooledConnection:
+    """Proxy around a mysql.connector connection; close() returns it to the pool."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._returned = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        # statement counts and time go to the per-request metrics
+        return metrics.TimedCursor(self._raw.cursor(*args, **kwargs))
+
+    @property
+    def returned(self):
+        return self._returned
+
+    def close(self):
+        if self._returned:
+            return
+        self._returned = True
+        self._pool._release(self._raw)
+
+    def discard(self):
+        """Close the connection instead of returning it, e.g. part-way through an unbuffered result."""
+        if self._returned:
+            return
+        self._returned = True
+        self._pool._discard(self._raw)
+
+    # allow `with get_connection(...) as conn:`
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SharedConnection:
+    """Connection handed out inside shared_connection(); close() only resets it for the next caller."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        try:
+            if self._conn.unread_result:
+                self._conn.consume_results()
+            if self._conn.in_transaction:
+                self._conn.rollback()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """Thread-safe pool of MySQL connections for one database."""
+
+    def __init__(self, db, size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW,
+                 timeout=POOL_TIMEOUT, recycle=POOL_RECYCLE, pre_ping_after=POOL_PRE_PING_AFTER):
+        self.db = db
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping_after = pre_ping_after
+        self._idle = deque()  # (raw_connection, returned_at)
+        self._created_at = {}  # id(raw) -> created_at
+        self._open = 0  # connections currently open (idle + in use)
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'recycled': 0,
+            'ping_failures': 0,
+            'discarded': 0,
+        }
+
+    def _new_raw(self):
+        raw = _connect(self.db)
+        self._created_at[id(raw)] = time.monotonic()
+        return raw
+
+    def _close_raw(self, raw):
+        self._created_at.pop(id(raw), None)
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _healthy(self, raw, returned_at):
+        """Return False if an idle connection should be replaced."""
+        now = time.monotonic()
+        created = self._created_at.get(id(raw), now)
+        if self.recycle and now - created > self.recycle:
+            with self._cond:
+                self._stats['recycled'] += 1
+            return False
+        if now - returned_at > self.pre_ping_after:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                with self._cond:
+                    self._stats['ping_failures'] += 1
+                return False
+        return True
+
+    def acquire(self):
+        start = time.monotonic()
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, returned_at = self._idle.pop()
+                    break
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    raw = None
+                    break
+                waited = True
+                remaining = self.timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(msg=f'Timed out after {self.timeout}s waiting for a MySQL connection')
+                self._cond.wait(remaining)
+            self._stats['checkouts'] += 1
+            if waited:
+                elapsed = time.monotonic() - start
+                self._stats['waits'] += 1
+                self._stats['wait_time_total'] += elapsed
+                self._stats['wait_time_max'] = max(self._stats['wait_time_max'], elapsed)
+
+        # health check / connect outside the lock so other threads are not blocked on I/O
+        if raw is not None and not self._healthy(raw, returned_at):
+            self._close_raw(raw)
+            raw = None
+        if raw is None:
+            try:
+                raw = self._new_raw()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+        return PooledConnection(self, raw)
+
+    def _release(self, raw):
+        keep = True
+        try:
+            # drop anything the caller left behind so the next user starts clean
+            if raw.unread_result:
+                raw.consume_results()
+            if raw.in_transaction:
+                raw.rollback()
+            if not raw.autocommit:
+                raw.autocommit = True
+        except Exception:
+            keep = False
+
+        with self._cond:
+            if keep and len(self._idle) < self.size:
+                self._idle.append((raw, time.monotonic()))
+                self._cond.notify()
+                return
+        self._discard(raw)
+
+    def _discard(self, raw):
+        with self._cond:
+            self._open -= 1
+            self._stats['discarded'] += 1
+            self._cond.notify()
+        self._close_raw(raw)
+
+    def stats(self):
+        with self._cond:
+            out = dict(self._stats)
+            out.update({
+                'database': self.db,
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+            })
+        out['wait_time_total'] = round(out['wait_time_total'], 6)
+        out['wait_time_max'] = round(out['wait_time_max'], 6)
+        return out
+
+    def dispose(self):
+        """Close all idle connections (e.g. after a fork)."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for raw, _ in idle:
+            self._close_raw(raw)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db=MYSQL_DATABASE):
+    pool = _pools.get(db)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(db)
+            if pool is None:
+                pool = ConnectionPool(db)
+                _pools[db] = pool
+    return pool
+
+
+def get_connection(db=None):
+    """Return a connection to `db`.
+
+    Connections to a database come from the pool and are tracked on the current
+    app context; without a database (only used to CREATE DATABASE in migrations) a
+    plain, unpooled connection is returned. Inside shared_connection() every call
+    gets the same connection.
+    """
+    if not db:
+        return _connect()
+    if has_app_context() and db in g.get('_shared_conns', ()):
+        return SharedConnection(g._shared_conns[db])
+    conn = get_pool(db).acquire()
+    if has_app_context():
+        if '_db_conns' not in g:
+            g._db_conns = []
+        g._db_conns.append(conn)
+    return conn
+
+
+@contextmanager
+def shared_connection(db=MYSQL_DATABASE):
+    """Make get_connection(db) return one pooled connection for the rest of this app context's block.
+
+    Used to run several view functions (e.g. the widgets of /api/dashboard) on
+    a single connection without changing them.
+    """
+    if '_shared_conns' not in g:
+        g._shared_conns = {}
+    if db in g._shared_conns:
+        yield g._shared_conns[db]
+        return
+    conn = get_pool(db).acquire()
+    g._shared_conns[db] = conn
+    try:
+        yield conn
+    finally:
+        g._shared_conns.pop(db, None)
+        conn.close()
+
+
+def release_request_connections(exc=None):
+    """Return every connection checked out during this app context to its pool."""
+    conns = g.pop('_db_conns', None)
+    if not conns:
+        return
+    for conn in conns:
+        if not conn.returned:
+            conn.close()
+
+
+def pool_stats():
+    return {db: pool.stats() for db, pool in list(_pools.items())}
+
+
+def init_app(app):
+    app.teardown_appcontext(release_request_connections)
@@ -0,0 +1,143 @@
+"""Streaming history exports (GET /api/export/...?format=ndjson|csv).
+
+The listing endpoints fetchall() their rows, turn each into a dict and jsonify
+the whole list, so a multi-season history holds every row in the worker several
+times over. An export runs the same query on an unbuffered cursor instead and
+streams it: rows are read from the server EXPORT_FETCH_SIZE at a time, written
+as NDJSON lines or CSV rows, and sent before the next batch is read. Memory
+stays flat whatever the row count.
+
+The query is executed before the response starts, so a bad filter or a database
+error is still an ordinary JSON error. The connection is taken from the pool
+directly rather than through get_connection(): the app context (and with it
+get_connection()'s cleanup) ends when the view returns, before the body is
+sent. It is released by the response's call_on_close callback, which the WSGI
+server runs however the response ends, including HEAD requests and clients that
+leave before the first chunk, when the body is never iterated. A completed
+download returns it to the pool. Otherwise it is closed instead, since draining
+the rest of the result would read the whole history for nobody.
+"""
+import csv
+import datetime
+import decimal
+import io
+import json
+import logging
+import os
+
+import mysql.connector
+from flask import Response, jsonify, stream_with_context
+
+from db import MYSQL_DATABASE, get_pool
+
+logger = logging.getLogger(__name__)
+
+# rows read from the server per batch (and per chunk sent)
+EXPORT_FETCH_SIZE = int(os.environ.get('EXPORT_FETCH_SIZE', 1000))
+# seconds the server waits on a slow client before aborting the result
+EXPORT_NET_WRITE_TIMEOUT = int(os.environ.get('EXPORT_NET_WRITE_TIMEOUT', 600))
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def _value(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, datetime.timedelta):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', 'replace')
+    return value
+
+
+def _ndjson(columns, batches):
+    for rows in batches:
+        yield ''.join(
+            json.dumps({col: _value(v) for col, v in zip(columns, row)}, default=str) + '\n' for row in rows)
+
+
+def _csv(columns, batches):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows([_value(v) for v in row] for row in rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def response(name, build, fmt='ndjson'):
+    """Stream the rows of the query `build(cur)` returns as (sql, params).
+
+    `name` becomes the download's file name. Returns a Flask response, or a
+    (json, status) error when the format is unknown, `build` raises ValueError
+    or the query fails.
+    """
+    fmt = (fmt or 'ndjson').lower()
+    if fmt not in FORMATS:
+        return jsonify({'error': f'format must be one of {", ".join(FORMATS)}'}), 400
+    try:
+        conn = get_pool(MYSQL_DATABASE).acquire()
+    except mysql.connector.Error as err:
+        return jsonify({'error': str(err)}), 500
+    try:
+        cur = conn.cursor()
+        cur.execute('SET SESSION net_write_timeout = %s', (EXPORT_NET_WRITE_TIMEOUT,))
+        cur.close()
+        cur = conn.cursor(buffered=False)
+        sql, params = build(cur)
+        cur.execute(sql, params)
+    except ValueError as err:
+        # a bad filter, found before anything was sent
+        conn.close()
+        return jsonify({'error': str(err)}), 400
+    except mysql.connector.Error as err:
+        conn.discard()
+        return jsonify({'error': str(err)}), 500
+    columns = list(cur.column_names)
+
+    def batches():
+        while True:
+            rows = cur.fetchmany(EXPORT_FETCH_SIZE)
+            if not rows:
+                return
+            yield rows
+
+    finished = []
+
+    def generate():
+        try:
+            yield from (_csv if fmt == 'csv' else _ndjson)(columns, batches())
+            finished.append(True)
+        except mysql.connector.Error as err:
+            # the status line is gone; the truncated body is all the client will see
+            logger.error('Export %s failed mid-stream: %s', name, err)
+
+    def release():
+        if conn.returned:
+            return
+        if not finished:
+            conn.discard()
+            return
+        try:
+            cur.execute('SET SESSION net_write_timeout = DEFAULT')
+            cur.close()
+            conn.close()
+        except mysql.connector.Error:
+            conn.discard()
+
+    stamp = datetime.date.today().strftime('%Y%m%d')
+    resp = Response(stream_with_context(generate()), content_type=FORMATS[fmt])
+    resp.call_on_close(release)
+    resp.headers['Content-Disposition'] = f'attachment; filename="{name}-{stamp}.{fmt}"'
+    # let a proxy pass chunks through instead of buffering the whole download
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
@@ -0,0 +1,159 @@
+"""Paddy sent per (sender, day, paddy_type, destination role), kept current by triggers.
+
+/api/farmer_lookup used to load every transaction a farmer ever sent and add
+them up in Python, filtering with DATE(`datetime`) >= %s, which no index can
+serve. `farmer_contribution` holds those sums per day instead, so a lookup is a
+primary-key range read whose size depends on the number of days and types in
+the window, not on the number of transactions.
+
+Triggers on `transaction` apply each row change (insert, update, delete) inside
+the statement that made it, so the revert paths (status set to 0 on the
+original, the reversing row inserted with status 0) are covered without
+touching the call sites. A row counts its quantity, negated when status is 0,
+exactly as the lookup always did. Rows without a paddy type are left out, as
+the lookup skipped them. Triggers on `users` move a recipient's rows when
+their role changes.
+
+Every sender is kept, farmer or not; lookups are by sender id. The destination
+role is the recipient's canonical users.role (see roles.py), '' when the
+recipient does not exist. Rows without a `datetime` are kept under UNDATED and
+only count when no date window is given.
+"""
+import datetime
+
+CREATE_TABLE = '''
+CREATE TABLE IF NOT EXISTS `farmer_contribution` (
+    farmer_id VARCHAR(255) NOT NULL,
+    day DATE NOT NULL,
+    paddy_type VARCHAR(100) NOT NULL,
+    role VARCHAR(50) NOT NULL,
+    quantity DECIMAL(20,3) NOT NULL DEFAULT 0,
+    tx_count INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (farmer_id, day, paddy_type, role)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+'''
+
+# day of transactions without a datetime; below any real date window
+UNDATED = datetime.date(1000, 1, 1)
+
+_UPSERT = '''ON DUPLICATE KEY UPDATE quantity = `farmer_contribution`.quantity + VALUES(quantity),
+                            tx_count = `farmer_contribution`.tx_count + VALUES(tx_count)'''
+
+
+def _signed(row):
+    return f'IF({row}.status <=> 0, -COALESCE({row}.quantity, 0), COALESCE({row}.quantity, 0))'
+
+
+def _day(row):
+    return f"COALESCE(DATE({row}.`datetime`), '{UNDATED.isoformat()}')"
+
+
+def _apply(row, sign):
+    """SQL adding (sign=1) or removing (sign=-1) one transaction row ('NEW'/'OLD') to its group."""
+    return f'''
+    INSERT INTO `farmer_contribution` (farmer_id, day, paddy_type, role, quantity, tx_count)
+    SELECT COALESCE({row}.`from`, ''), {_day(row)}, {row}.`type`, COALESCE(u.role, ''), {sign} * {_signed(row)}, {sign}
+    FROM (SELECT 1) AS x LEFT JOIN users u ON u.id = {row}.`to`
+    WHERE {row}.`type` IS NOT NULL AND {row}.`type` <> ''
+    {_UPSERT}'''
+
+
+def _move_recipient(user_id, role, sign):
+    """SQL adding (sign=1) or removing (sign=-1) everything sent to a user under `role`."""
+    return f'''
+    INSERT INTO `farmer_contribution` (farmer_id, day, paddy_type, role, quantity, tx_count)
+    SELECT COALESCE(t.`from`, ''), {_day('t')}, t.`type`, {role}, {sign} * SUM({_signed('t')}), {sign} * COUNT(*)
+    FROM `transaction` t WHERE t.`to` = {user_id} AND t.`type` IS NOT NULL AND t.`type` <> ''
+    GROUP BY 1, 2, 3
+    {_UPSERT}'''
+
+
+# (name, CREATE TRIGGER statement)
+TRIGGERS = [
+    ('farmer_contribution_after_insert', f'''
+    CREATE TRIGGER `farmer_contribution_after_insert` AFTER INSERT ON `transaction` FOR EACH ROW
+    {_apply('NEW', 1)}
+    '''),
+    ('farmer_contribution_after_update', f'''
+    CREATE TRIGGER `farmer_contribution_after_update` AFTER UPDATE ON `transaction` FOR EACH ROW
+    BEGIN
+        IF NOT (OLD.`from` <=> NEW.`from` AND OLD.`to` <=> NEW.`to` AND OLD.`type` <=> NEW.`type`
+                AND OLD.quantity <=> NEW.quantity AND OLD.status <=> NEW.status
+                AND OLD.`datetime` <=> NEW.`datetime`) THEN
+            {_apply('OLD', -1)};
+            {_apply('NEW', 1)};
+        END IF;
+    END
+    '''),
+    ('farmer_contribution_after_delete', f'''
+    CREATE TRIGGER `farmer_contribution_after_delete` AFTER DELETE ON `transaction` FOR EACH ROW
+    {_apply('OLD', -1)}
+    '''),
+    ('farmer_contribution_user_after_insert', f'''
+    CREATE TRIGGER `farmer_contribution_user_after_insert` AFTER INSERT ON `users` FOR EACH ROW
+    BEGIN
+        {_move_recipient('NEW.id', "''", -1)};
+        {_move_recipient('NEW.id', 'NEW.role', 1)};
+    END
+    '''),
+    ('farmer_contribution_user_after_update', f'''
+    CREATE TRIGGER `farmer_contribution_user_after_update` AFTER UPDATE ON `users` FOR EACH ROW
+    BEGIN
+        IF NOT (OLD.id <=> NEW.id AND OLD.role <=> NEW.role) THEN
+            {_move_recipient('OLD.id', 'OLD.role', -1)};
+            {_move_recipient('OLD.id', "''", 1)};
+            {_move_recipient('NEW.id', "''", -1)};
+            {_move_recipient('NEW.id', 'NEW.role', 1)};
+        END IF;
+    END
+    '''),
+    ('farmer_contribution_user_after_delete', f'''
+    CREATE TRIGGER `farmer_contribution_user_after_delete` AFTER DELETE ON `users` FOR EACH ROW
+    BEGIN
+        {_move_recipient('OLD.id', 'OLD.role', -1)};
+        {_move_recipient('OLD.id', "''", 1)};
+    END
+    '''),
+]
+
+
+def install(cur):
+    """Create the table and (re)create its triggers."""
+    cur.execute(CREATE_TABLE)
+    for name, ddl in TRIGGERS:
+        cur.execute(f'DROP TRIGGER IF EXISTS `{name}`')
+        cur.execute(ddl)
+
+
+def rebuild(cur):
+    """Recompute every group from `transaction` (run inside a transaction)."""
+    cur.execute('DELETE FROM `farmer_contribution`')
+    cur.execute(f'''
+        INSERT INTO `farmer_contribution` (farmer_id, day, paddy_type, role, quantity, tx_count)
+        SELECT COALESCE(t.`from`, ''), {_day('t')}, t.`type`, COALESCE(u.role, ''), SUM({_signed('t')}), COUNT(*)
+        FROM `transaction` t LEFT JOIN users u ON u.id = t.`to`
+        WHERE t.`type` IS NOT NULL AND t.`type` <> ''
+        GROUP BY 1, 2, 3, 4
+    ''')
+
+
+def totals(cur, farmer_id, day_from=None, day_to=None):
+    """[(paddy_type, role, quantity, tx_count)] sent by `farmer_id` on days in [day_from, day_to].
+
+    Either bound may be None; with no bounds undated transactions are included.
+    """
+    where = ['farmer_id = %s']
+    params = [farmer_id]
+    if day_from or day_to:
+        where.append('day >= %s')
+        params.append(max(day_from or UNDATED, UNDATED + datetime.timedelta(days=1)))
+    if day_to:
+        where.append('day <= %s')
+        params.append(day_to)
+    cur.execute(
+        f'SELECT paddy_type, role, SUM(quantity), SUM(tx_count) FROM `farmer_contribution` '
+        f'WHERE {" AND ".join(where)} GROUP BY paddy_type, role ORDER BY paddy_type, role',
+        params
+    )
+    return cur.fetchall()
@@ -0,0 +1,87 @@
+"""User ID allocation from a per-prefix sequence table.
+
+User ids are a three-letter prefix for the user type plus a number (FAR12,
+COL3, ...). They used to be found by reading every id of the type and taking
+max + 1 in Python: a full scan per registration, and two concurrent
+registrations could get the same id.
+
+`user_id_sequence` holds the last number handed out per prefix. reserve()
+advances it with a single INSERT ... ON DUPLICATE KEY UPDATE that sets
+LAST_INSERT_ID(), so the row lock is held only for that statement and the new
+value comes back in the same round trip. A range of any size is reserved the
+same way. Numbers of failed registrations are skipped, never reused.
+"""
+from db import MYSQL_DATABASE, get_connection
+
+PREFIXES = {
+    'Farmer': 'FAR',
+    'Collecter': 'COL',
+    'Miller': 'MIL',
+    'Wholesaler': 'WHO',
+    'Retailer': 'RET',
+    'Beer': 'BER',
+    'Animal Food': 'ANI',
+    'Exporter': 'EXP',
+}
+
+CREATE_TABLE = '''
+CREATE TABLE IF NOT EXISTS `user_id_sequence` (
+    prefix VARCHAR(8) NOT NULL PRIMARY KEY,
+    last_value BIGINT UNSIGNED NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+'''
+
+
+def prefix_for(user_type):
+    """Id prefix of a user type; unknown types use their first three letters."""
+    return PREFIXES.get(user_type) or (user_type or 'USR')[:3].upper()
+
+
+def install(cur):
+    """Create the sequence table and seed it from the ids already in `users`."""
+    cur.execute(CREATE_TABLE)
+    cur.executemany(
+        'INSERT IGNORE INTO `user_id_sequence` (prefix, last_value) VALUES (%s, 0)',
+        [(prefix,) for prefix in PREFIXES.values()]
+    )
+    cur.execute('''
+        INSERT INTO `user_id_sequence` (prefix, last_value)
+        SELECT UPPER(LEFT(id, 3)), MAX(CAST(SUBSTRING(id, 4) AS UNSIGNED))
+        FROM users WHERE id REGEXP '^[A-Za-z]{3}[0-9]+$'
+        GROUP BY UPPER(LEFT(id, 3))
+        ON DUPLICATE KEY UPDATE last_value = GREATEST(`user_id_sequence`.last_value, VALUES(last_value))
+    ''')
+
+
+def reserve(prefix, count=1, cur=None):
+    """Reserve `count` numbers for `prefix`; returns the first. Uses `cur` (and its transaction) if given."""
+    own = cur is None
+    if own:
+        conn = get_connection(MYSQL_DATABASE)
+        cur = conn.cursor()
+    try:
+        cur.execute(
+            'INSERT INTO `user_id_sequence` (prefix, last_value) VALUES (%s, LAST_INSERT_ID(%s)) '
+            'ON DUPLICATE KEY UPDATE last_value = LAST_INSERT_ID(last_value + %s)',
+            (prefix, count, count)
+        )
+        return cur.lastrowid - count + 1
+    finally:
+        if own:
+            cur.close()
+            conn.close()
+
+
+def next_id(user_type, cur=None):
+    """Allocate the next id for a user type, e.g. 'FAR7'."""
+    prefix = prefix_for(user_type)
+    return f'{prefix}{reserve(prefix, 1, cur)}'
+
+
+def reserve_ids(user_type, count, cur=None):
+    """Allocate `count` consecutive ids for a user type in one round trip."""
+    if count <= 0:
+        return []
+    prefix = prefix_for(user_type)
+    first = reserve(prefix, count, cur)
+    return [f'{prefix}{n}' for n in range(first, first + count)]
@@ -0,0 +1,588 @@
+"""Incremental indexer that mirrors Operations and UserAccounts events into MySQL.
+
+Each contract ("source") is read in block-range chunks with one eth_getLogs call
+per chunk. Decoded events are upserted into the chain_* mirror tables and the
+last indexed block is checkpointed in the same MySQL transaction, so a run picks
+up where the previous one stopped instead of scanning from block 0. Blocks
+closer to the head than the source's confirmation depth are left for a later
+run. If the hash of the checkpointed block no longer matches the chain (a
+reorg), the indexer walks back to the newest remembered block whose hash still
+matches, deletes mirror rows above it and indexes again from there.
+
+Every field is taken from the event itself, so indexing costs one eth_getLogs
+per chunk and works on an ordinary (pruned) RPC node. The one exception is the
+parties of a transaction: they are indexed strings, so a log only carries their
+keccak hashes. Those are matched against the hashes of the ids in `users`,
+computed locally. A party that is not a user is kept as its hash, unless
+INDEXER_READ_PARTIES=1, which reads it from the contract. That costs one
+batched eth_call per chunk, made at the latest block, since a recorded
+transaction never changes.
+
+Explorer and audit queries can then read the chain_* tables instead of calling
+getAll*() or scanning events from block 0 on the RPC node.
+
+The background worker is opt-in: set INDEXER_ENABLED=1 in exactly one process
+(every process that enables it polls both RPC nodes). A source without a
+checkpoint is only indexed once INDEXER_START_BLOCK_<SOURCE> names the block to
+start from, normally the contract's deployment block.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+import mysql.connector
+from hexbytes import HexBytes
+from web3 import Web3
+
+from db import MYSQL_DATABASE, get_connection
+
+logger = logging.getLogger(__name__)
+
+# seconds between indexing rounds once the indexer has caught up
+INDEXER_POLL_INTERVAL = float(os.environ.get('INDEXER_POLL_INTERVAL', 5))
+# blocks requested per eth_getLogs call
+INDEXER_CHUNK_SIZE = int(os.environ.get('INDEXER_CHUNK_SIZE', 2000))
+# blocks kept behind the head before their events are indexed. Both contracts are on
+# Sepolia in the shipped config; set the Operations depth to 0 only when OPERATIONS_RPC_URL
+# is a local Hardhat node, which mines only when a transaction arrives
+INDEXER_CONFIRMATIONS = int(os.environ.get('INDEXER_CONFIRMATIONS', 6))
+INDEXER_OPERATIONS_CONFIRMATIONS = int(os.environ.get('INDEXER_OPERATIONS_CONFIRMATIONS', INDEXER_CONFIRMATIONS))
+# block hashes remembered per source for reorg detection
+INDEXER_REORG_WINDOW = int(os.environ.get('INDEXER_REORG_WINDOW', 128))
+# read transaction parties that are not in `users` from the contract instead of keeping their hash
+INDEXER_READ_PARTIES = os.environ.get('INDEXER_READ_PARTIES', '0').lower() not in ('0', 'false', 'no', '')
+# run the background worker in this process; enable it in one process only
+INDEXER_ENABLED = os.environ.get('INDEXER_ENABLED', '0').lower() not in ('0', 'false', 'no', '')
+
+_BLOCK_COLUMNS = '''
+    block_number BIGINT NOT NULL,
+    block_hash VARCHAR(66) NOT NULL,
+    transaction_hash VARCHAR(66) NOT NULL,
+    log_index INT NOT NULL,
+'''
+
+CREATE_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS `chain_index_checkpoint` (
+        source VARCHAR(32) NOT NULL PRIMARY KEY,
+        last_block BIGINT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS `chain_index_block` (
+        source VARCHAR(32) NOT NULL,
+        block_number BIGINT NOT NULL,
+        block_hash VARCHAR(66) NOT NULL,
+        PRIMARY KEY (source, block_number)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS `chain_transaction` (
+        kind VARCHAR(8) NOT NULL,
+        chain_id BIGINT NOT NULL,
+        from_party VARCHAR(255),
+        to_party VARCHAR(255),
+        product_type VARCHAR(128),
+        quantity BIGINT,
+        price BIGINT,
+        chain_timestamp BIGINT,
+        status TINYINT,
+    ''' + _BLOCK_COLUMNS + '''
+        PRIMARY KEY (kind, chain_id),
+        INDEX (from_party, chain_timestamp),
+        INDEX (to_party, chain_timestamp),
+        INDEX (block_number)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS `chain_milling` (
+        chain_id BIGINT NOT NULL PRIMARY KEY,
+        input_paddy BIGINT,
+        output_rice BIGINT,
+        date_time BIGINT,
+        paddy_type VARCHAR(128),
+        drying_duration BIGINT,
+        status TINYINT,
+    ''' + _BLOCK_COLUMNS + '''
+        INDEX (paddy_type, date_time),
+        INDEX (block_number)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS `chain_damage` (
+        kind VARCHAR(8) NOT NULL,
+        chain_id BIGINT NOT NULL,
+        user_id VARCHAR(255),
+        item_type VARCHAR(128),
+        quantity BIGINT,
+        damage_date BIGINT,
+        reason TEXT,
+    ''' + _BLOCK_COLUMNS + '''
+        PRIMARY KEY (kind, chain_id),
+        INDEX (user_id, damage_date),
+        INDEX (block_number)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS `chain_initial_record` (
+        kind VARCHAR(8) NOT NULL,
+        chain_id BIGINT NOT NULL,
+        user_id VARCHAR(255),
+        item_type VARCHAR(128),
+        quantity BIGINT,
+        record_date BIGINT,
+        status TINYINT,
+        first_block BIGINT NOT NULL,
+    ''' + _BLOCK_COLUMNS + '''
+        PRIMARY KEY (kind, chain_id),
+        INDEX (user_id, record_date),
+        INDEX (block_number)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS `chain_user` (
+        user_id VARCHAR(255) NOT NULL PRIMARY KEY,
+        user_type VARCHAR(50),
+        name VARCHAR(255),
+        district VARCHAR(128),
+        details TEXT,
+        first_block BIGINT NOT NULL,
+    ''' + _BLOCK_COLUMNS + '''
+        INDEX (user_type, district),
+        INDEX (block_number)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''',
+]
+
+# mirror tables per source; rows above a reorg point are deleted from these
+MIRROR_TABLES = {
+    'operations': ('chain_transaction', 'chain_milling', 'chain_damage', 'chain_initial_record'),
+    'accounts': ('chain_user',),
+}
+# tables whose rows are overwritten by *Updated events; a reorg has to re-read from
+# the row's first event to rebuild them
+_UPDATED_TABLES = ('chain_initial_record', 'chain_user')
+
+
+# ---- event -> mirror row -------------------------------------------------
+# Each builder gets (args, log, contract) and returns (table, row dict).
+
+def _chain_fields(log):
+    return {
+        'block_number': log['blockNumber'],
+        'block_hash': log['blockHash'].to_0x_hex(),
+        'transaction_hash': log['transactionHash'].to_0x_hex(),
+        'log_index': log['logIndex'],
+    }
+
+
+def _transaction_row(kind, id_arg, type_arg):
+    def build(args, log, contract):
+        # fromParty/toParty are indexed strings, so the log only carries their hashes;
+        # _resolve_parties() turns them back into ids
+        return 'chain_transaction', dict(_chain_fields(log), **{
+            'kind': kind,
+            'chain_id': int(args[id_arg]),
+            'from_party': HexBytes(args['fromParty']).to_0x_hex(),
+            'to_party': HexBytes(args['toParty']).to_0x_hex(),
+            'product_type': args[type_arg],
+            'quantity': args['quantity'],
+            'price': args['price'],
+            'chain_timestamp': args['timestamp'],
+            'status': int(args['status']),
+        })
+    return build
+
+
+def _milling_row(args, log, contract):
+    return 'chain_milling', dict(_chain_fields(log), **{
+        'chain_id': int(args['millingId']),
+        'input_paddy': args['inputPaddy'],
+        'output_rice': args['outputRice'],
+        'date_time': args['dateTime'],
+        'paddy_type': args['paddyType'],
+        'drying_duration': args['dryingDuration'],
+        'status': int(args['status']),
+    })
+
+
+def _damage_row(kind, id_arg, type_arg):
+    def build(args, log, contract):
+        return 'chain_damage', dict(_chain_fields(log), **{
+            'kind': kind,
+            'chain_id': int(args[id_arg]),
+            'user_id': args['userId'],
+            'item_type': args[type_arg],
+            'quantity': args['quantity'],
+            'damage_date': args['damageDate'],
+            'reason': args['reason'],
+        })
+    return build
+
+
+def _initial_record_row(kind, type_arg):
+    def build(args, log, contract):
+        return 'chain_initial_record', dict(_chain_fields(log), **{
+            'kind': kind,
+            'chain_id': int(args['recordId']),
+            'user_id': args['userId'],
+            'item_type': args[type_arg],
+            'quantity': args['quantity'],
+            'record_date': args['date'],
+            'status': int(args['status']),
+            'first_block': log['blockNumber'],
+        })
+    return build
+
+
+def _user_row(user_type):
+    def build(args, log, contract):
+        details = dict(args)
+        return 'chain_user', dict(_chain_fields(log), **{
+            'user_id': details.pop('id'),
+            'user_type': user_type,
+            'name': details.get('fullName') or details.get('companyName') or details.get('name'),
+            'district': details.get('district'),
+            'details': json.dumps(details),
+            'first_block': log['blockNumber'],
+        })
+    return build
+
+
+OPERATIONS_EVENTS = {
+    'TransactionRecorded': _transaction_row('paddy', 'txId', 'productType'),
+    'RiceTransactionRecorded': _transaction_row('rice', 'riceTxId', 'riceType'),
+    'MillingRecorded': _milling_row,
+    'DamageRecorded': _damage_row('paddy', 'damageId', 'paddyType'),
+    'RiceDamageRecorded': _damage_row('rice', 'riceDamageId', 'riceType'),
+    'InitialPaddyRecorded': _initial_record_row('paddy', 'paddyType'),
+    'InitialPaddyUpdated': _initial_record_row('paddy', 'paddyType'),
+    'InitialRiceRecorded': _initial_record_row('rice', 'riceType'),
+    'InitialRiceUpdated': _initial_record_row('rice', 'riceType'),
+}
+
+# chain_transaction kind -> Operations getter returning (fromParty, toParty, ...)
+_TRANSACTION_GETTERS = {'paddy': 'getTransaction', 'rice': 'getRiceTransaction'}
+
+_party_ids = {}  # keccak hash of a user id -> user id
+_party_misses = set()  # hashes not found by the last load, so they do not reload it again
+_party_ids_lock = threading.Lock()
+
+
+def _load_party_ids():
+    conn = get_connection(MYSQL_DATABASE)
+    cur = conn.cursor()
+    try:
+        cur.execute('SELECT id FROM users')
+        return {Web3.keccak(text=row[0]).to_0x_hex(): row[0] for row in cur.fetchall() if row[0]}
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _resolve_parties(source, rows):
+    """Replace the party hashes of chain_transaction rows with user ids (see the module docstring)."""
+    global _party_ids, _party_misses
+    transactions = [row for table, row in rows if table == 'chain_transaction']
+    hashes = {row[c] for row in transactions for c in ('from_party', 'to_party')}
+    with _party_ids_lock:
+        if not hashes <= _party_ids.keys() | _party_misses:
+            # users registered since the last load
+            _party_ids = _load_party_ids()
+            _party_misses = set()
+        _party_misses |= hashes - _party_ids.keys()
+        known = _party_ids
+    read = {}
+    if INDEXER_READ_PARTIES and not hashes <= known.keys():
+        unknown = [row for row in transactions if not {row['from_party'], row['to_party']} <= known.keys()]
+        with source.web3.batch_requests() as batch:
+            for row in unknown:
+                batch.add(getattr(source.contract.functions, _TRANSACTION_GETTERS[row['kind']])(row['chain_id']))
+            results = batch.execute()
+        for row, stored in zip(unknown, results):
+            read[row['from_party']], read[row['to_party']] = stored[0], stored[1]
+    for row in transactions:
+        for column in ('from_party', 'to_party'):
+            row[column] = known.get(row[column]) or read.get(row[column]) or row[column]
+
+
+# UserAccounts event prefix -> users.user_type
+_USER_TYPES = {
+    'Farmer': 'Farmer',
+    'Collector': 'Collecter',
+    'Miller': 'Miller',
+    'Wholesaler': 'Wholesaler',
+    'Retailer': 'Retailer',
+    'Brewer': 'Beer',
+    'AnimalFood': 'Animal Food',
+    'Exporter': 'Exporter',
+}
+ACCOUNTS_EVENTS = {}
+for _prefix, _user_type in _USER_TYPES.items():
+    ACCOUNTS_EVENTS[_prefix + 'Registered'] = _user_row(_user_type)
+    ACCOUNTS_EVENTS[_prefix + 'Updated'] = _user_row(_user_type)
+
+
+# ---- sources ---------------------------------------------------------------
+
+class Source:
+    """One contract on one chain, with the events the indexer mirrors from it."""
+
+    def __init__(self, name, web3_instance, contract, confirmations, builders):
+        self.name = name
+        self.web3 = web3_instance
+        self.contract = contract
+        self.confirmations = confirmations
+        # first block to index when there is no checkpoint yet; None until configured
+        start_block = os.environ.get(f'INDEXER_START_BLOCK_{name.upper()}', '').strip()
+        self.start_block = int(start_block) if start_block else None
+        # topic0 -> (event object, row builder)
+        self.events = {}
+        for item in contract.abi:
+            if item.get('type') != 'event' or item['name'] not in builders:
+                continue
+            signature = '{}({})'.format(item['name'], ','.join(i['type'] for i in item['inputs']))
+            topic = Web3.keccak(text=signature).to_0x_hex()
+            self.events[topic] = (getattr(contract.events, item['name'])(), builders[item['name']])
+
+    def block_hash(self, number):
+        return self.web3.eth.get_block(number)['hash'].to_0x_hex()
+
+    def fetch(self, from_block, to_block):
+        """Mirror rows for every handled event in [from_block, to_block], in log order."""
+        logs = self.web3.eth.get_logs({
+            'address': self.contract.address,
+            'fromBlock': from_block,
+            'toBlock': to_block,
+            'topics': [list(self.events)],
+        })
+        rows = []
+        for log in sorted(logs, key=lambda l: (l['blockNumber'], l['logIndex'])):
+            if log.get('removed'):
+                continue
+            event, build = self.events[log['topics'][0].to_0x_hex()]
+            args = event.process_log(log)['args']
+            rows.append(build(args, log, self.contract))
+        _resolve_parties(self, rows)
+        return logs, rows
+
+
+_sources = None
+
+
+def get_sources():
+    global _sources
+    if _sources is None:
+        import blockchain
+        _sources = [
+            Source('operations', blockchain.web3_operations, blockchain.operations_contract,
+                   INDEXER_OPERATIONS_CONFIRMATIONS, OPERATIONS_EVENTS),
+            Source('accounts', blockchain.web3_accounts, blockchain.user_accounts_contract,
+                   INDEXER_CONFIRMATIONS, ACCOUNTS_EVENTS),
+        ]
+    return _sources
+
+
+# ---- MySQL side ------------------------------------------------------------
+
+def create_tables(cur):
+    for ddl in CREATE_TABLES:
+        cur.execute(ddl)
+
+
+def _upsert(cur, table, rows):
+    columns = list(rows[0])
+    keep_first = ('first_block',)
+    updates = ', '.join(f'`{c}` = VALUES(`{c}`)' for c in columns if c not in keep_first)
+    cur.executemany(
+        'INSERT INTO `{}` ({}) VALUES ({}) ON DUPLICATE KEY UPDATE {}'.format(
+            table, ', '.join(f'`{c}`' for c in columns), ', '.join(['%s'] * len(columns)), updates),
+        [tuple(row[c] for c in columns) for row in rows]
+    )
+
+
+def _checkpoint(cur, source):
+    cur.execute('SELECT last_block FROM `chain_index_checkpoint` WHERE source = %s', (source.name,))
+    row = cur.fetchone()
+    if row:
+        return row[0]
+    return source.start_block - 1 if source.start_block is not None else None
+
+
+def _save_chunk(source, rows, block_hashes, last_block):
+    conn = get_connection(MYSQL_DATABASE)
+    cur = conn.cursor()
+    try:
+        conn.start_transaction()
+        by_table = {}
+        for table, row in rows:
+            by_table.setdefault(table, []).append(row)
+        for table, table_rows in by_table.items():
+            _upsert(cur, table, table_rows)
+        cur.executemany(
+            'INSERT INTO `chain_index_block` (source, block_number, block_hash) VALUES (%s, %s, %s) '
+            'ON DUPLICATE KEY UPDATE block_hash = VALUES(block_hash)',
+            [(source.name, number, block_hash) for number, block_hash in sorted(block_hashes.items())]
+        )
+        cur.execute(
+            'DELETE FROM `chain_index_block` WHERE source = %s AND block_number < %s',
+            (source.name, last_block - INDEXER_REORG_WINDOW)
+        )
+        cur.execute(
+            'INSERT INTO `chain_index_checkpoint` (source, last_block) VALUES (%s, %s) '
+            'ON DUPLICATE KEY UPDATE last_block = VALUES(last_block)',
+            (source.name, last_block)
+        )
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _handle_reorg(source, last_block):
+    """Return the block to resume after (last_block unless the chain changed under us)."""
+    conn = get_connection(MYSQL_DATABASE)
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            'SELECT block_number, block_hash FROM `chain_index_block` '
+            'WHERE source = %s ORDER BY block_number DESC',
+            (source.name,)
+        )
+        remembered = cur.fetchall()
+        if not remembered or source.block_hash(remembered[0][0]) == remembered[0][1]:
+            return last_block
+
+        ancestor = remembered[-1][0] - 1
+        for number, block_hash in remembered[1:]:
+            if source.block_hash(number) == block_hash:
+                ancestor = number
+                break
+        logger.warning('Indexer: reorg on %s detected, rewinding to block %s', source.name, ancestor)
+
+        conn.start_transaction()
+        resume = ancestor
+        for table in MIRROR_TABLES[source.name]:
+            if table in _UPDATED_TABLES:
+                # rows last changed by an orphaned *Updated event are rebuilt from their first event
+                cur.execute(f'SELECT MIN(first_block) FROM `{table}` WHERE block_number > %s', (ancestor,))
+                first = cur.fetchone()[0]
+                if first is not None:
+                    resume = min(resume, first - 1)
+            cur.execute(f'DELETE FROM `{table}` WHERE block_number > %s', (ancestor,))
+        cur.execute(
+            'DELETE FROM `chain_index_block` WHERE source = %s AND block_number > %s',
+            (source.name, ancestor)
+        )
+        cur.execute('UPDATE `chain_index_checkpoint` SET last_block = %s WHERE source = %s', (resume, source.name))
+        conn.commit()
+        return resume
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+def index_source(source, max_chunks=None):
+    """Index confirmed blocks of one source. Returns the number of events mirrored."""
+    conn = get_connection(MYSQL_DATABASE)
+    cur = conn.cursor()
+    try:
+        last_block = _checkpoint(cur, source)
+    finally:
+        cur.close()
+        conn.close()
+    if last_block is None:
+        logger.warning('Indexer: %s skipped; set INDEXER_START_BLOCK_%s to its deployment block',
+                       source.name, source.name.upper())
+        return 0
+
+    last_block = _handle_reorg(source, last_block)
+    safe_head = source.web3.eth.block_number - source.confirmations
+    indexed = 0
+    chunks = 0
+    while last_block < safe_head and (max_chunks is None or chunks < max_chunks):
+        from_block = last_block + 1
+        to_block = min(from_block + INDEXER_CHUNK_SIZE - 1, safe_head)
+        logs, rows = source.fetch(from_block, to_block)
+        block_hashes = {log['blockNumber']: log['blockHash'].to_0x_hex() for log in logs}
+        block_hashes[to_block] = source.block_hash(to_block)
+        _save_chunk(source, rows, block_hashes, to_block)
+        if rows:
+            logger.debug('Indexer: %s blocks %s-%s: %s events', source.name, from_block, to_block, len(rows))
+        indexed += len(rows)
+        chunks += 1
+        last_block = to_block
+    return indexed
+
+
+def index_all():
+    total = 0
+    for source in get_sources():
+        try:
+            total += index_source(source)
+        except mysql.connector.Error:
+            raise
+        except Exception as e:
+            # an unreachable RPC node for one chain should not stop the other
+            logger.warning('Indexer: %s failed: %s', source.name, e)
+    return total
+
+
+def status():
+    """Checkpoint per source, for the index status endpoint."""
+    conn = get_connection(MYSQL_DATABASE)
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute('SELECT source, last_block, updated_at FROM `chain_index_checkpoint` ORDER BY source')
+        return cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _run():
+    while True:
+        try:
+            index_all()
+        except mysql.connector.Error as e:
+            logger.error('Indexer database error: %s', e)
+        except Exception as e:
+            logger.error('Indexer error: %s', e)
+        time.sleep(INDEXER_POLL_INTERVAL)
+
+
+def ensure_worker():
+    """Start the background indexer thread once per process (only with INDEXER_ENABLED=1)."""
+    global _worker
+    if not INDEXER_ENABLED:
+        return
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='chain-indexer', daemon=True)
+            _worker.start()
+
+
+if __name__ == '__main__':
+    # one-off catch-up, e.g. `python indexer.py` after restoring a database
+    print('Indexed', index_all(), 'events')
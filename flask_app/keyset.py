@@ -0,0 +1,65 @@
+"""Keyset (cursor) pagination over rows ordered by (datetime DESC, id DESC, kind DESC).
+
+A page is fetched by asking every source table for the rows that come after the
+cursor in that order, LIMIT n each, and merging them with UNION ALL ... LIMIT n,
+so the cost of a page depends on its size and not on how deep it is. NULL
+datetimes sort last, as they do in MySQL's DESC order.
+
+The cursor handed to clients is the (datetime, id, kind) of the last row of the
+page, as URL-safe base64 JSON.
+"""
+import base64
+import datetime
+import json
+
+
+def encode_cursor(dt, row_id, kind):
+    raw = json.dumps([dt.isoformat() if dt else None, int(row_id), kind], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """(datetime or None, id, kind) from a cursor token; ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        dt, row_id, kind = json.loads(raw)
+        return (datetime.datetime.fromisoformat(dt) if dt else None), int(row_id), str(kind)
+    except Exception:
+        raise ValueError('invalid cursor')
+
+
+def after(cursor, alias, kind):
+    """WHERE fragment and params selecting rows of `kind` in `alias` that come after `cursor`."""
+    if cursor is None:
+        return '1=1', []
+    dt, row_id, cursor_kind = cursor
+    # within the same (datetime, id) a lower kind comes later
+    id_op = '<=' if kind < cursor_kind else '<'
+    if dt is None:
+        return f'{alias}.`datetime` IS NULL AND {alias}.id {id_op} %s', [row_id]
+    return (
+        f'({alias}.`datetime` < %s OR {alias}.`datetime` IS NULL '
+        f'OR ({alias}.`datetime` = %s AND {alias}.id {id_op} %s))',
+        [dt, dt, row_id]
+    )
+
+
+def page(cur, branches, cursor, limit):
+    """[(kind, id, datetime)] of the next page; `cur` must be a tuple (non-dictionary) cursor.
+
+    branches are (kind, table, alias, where, params); each is limited on its own and
+    the union is ordered and limited again.
+    """
+    selects, params = [], []
+    for kind, table, alias, where, branch_params in branches:
+        cond, cond_params = after(cursor, alias, kind)
+        selects.append(
+            f"(SELECT '{kind}' AS kind, {alias}.id, {alias}.`datetime` FROM `{table}` {alias} "
+            f"WHERE {where} AND {cond} ORDER BY {alias}.`datetime` DESC, {alias}.id DESC LIMIT %s)"
+        )
+        params.extend(list(branch_params) + cond_params + [limit])
+    cur.execute(
+        ' UNION ALL '.join(selects) + ' ORDER BY `datetime` DESC, id DESC, kind DESC LIMIT %s',
+        params + [limit]
+    )
+    return [(r[0], r[1], r[2]) for r in cur.fetchall()]
@@ -0,0 +1,82 @@
+"""Logging setup for the app and its background workers.
+
+Modules log through `logging.getLogger(__name__)` with %-style arguments, so a
+message below the configured level costs one level check: no string is built
+and nothing is written. Records that pass are put on an in-memory queue by
+the calling thread and formatted and written by a single listener thread.
+Request handlers never wait on stdout while they hold database locks.
+
+Environment:
+  LOG_LEVEL   root level (default INFO)
+  LOG_LEVELS  per-module overrides, e.g. "blockchain=DEBUG,indexer=WARNING"
+  LOG_FORMAT  "text" (default) or "json" (one object per line)
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_LEVELS = os.environ.get('LOG_LEVELS', '')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s [%(threadName)s] %(message)s'
+
+_listener = None
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # the stock prepare() formats the message in the calling thread; leave
+        # that to the listener (the queue is in-process, so the record can go as is)
+        return record
+
+
+def parse_levels(spec):
+    """{'blockchain': 'DEBUG', ...} from "blockchain=DEBUG,indexer=WARNING"."""
+    levels = {}
+    for part in spec.split(','):
+        name, sep, level = part.partition('=')
+        if sep and name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure():
+    """Route all logging through the queue listener; safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JSONFormatter() if LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT))
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.handlers[:] = [_QueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL)
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
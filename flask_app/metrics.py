@@ -0,0 +1,296 @@
+"""Per-route latency, SQL and blockchain timing, exposed on /metrics.
+
+For every request this records the wall time, the number of SQL statements and
+the time spent in them, the time spent in blockchain.py calls and the time
+spent serialising JSON, and adds them to in-process histograms labelled by
+route (the URL rule, not the raw path, so ids do not explode the label set).
+
+- SQL: db.PooledConnection hands out cursors wrapped by TimedCursor, which
+  times execute/executemany/fetch* and reports here.
+- Chain: blockchain.py wraps its public functions with instrument_chain();
+  nested calls (add_farmer -> send_transaction) count once per request.
+- JSON: the app's JSON provider is replaced by one that times dumps().
+
+Work outside a request (outbox, indexer and snapshot workers) is recorded under
+route "background". Set METRICS_SERVER_TIMING=1 to add a Server-Timing header
+(db, chain, serialize, total) to every response.
+
+Histograms are kept per process; with several worker processes each one serves
+its own /metrics.
+"""
+import functools
+import os
+import threading
+import time
+
+from flask import g, has_app_context, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+CHAIN_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 15, 30, 60, 120, 300)
+
+BACKGROUND = 'background'
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Named histograms and counters keyed by label tuples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # name -> (help, label names, buckets, {labels: Histogram})
+        self._counters = {}  # name -> (help, label names, {labels: value})
+
+    def histogram(self, name, help_text, label_names, buckets):
+        self._histograms[name] = (help_text, label_names, buckets, {})
+
+    def counter(self, name, help_text, label_names):
+        self._counters[name] = (help_text, label_names, {})
+
+    def observe(self, name, labels, value):
+        _, _, buckets, series = self._histograms[name]
+        with self._lock:
+            hist = series.get(labels)
+            if hist is None:
+                hist = series[labels] = Histogram(buckets)
+            hist.observe(value)
+
+    def inc(self, name, labels, value=1):
+        series = self._counters[name][2]
+        with self._lock:
+            series[labels] = series.get(labels, 0) + value
+
+    def render(self):
+        """Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, (help_text, label_names, series) in self._counters.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for labels, value in sorted(series.items()):
+                    lines.append(f'{name}{_labels(label_names, labels)} {_num(value)}')
+            for name, (help_text, label_names, buckets, series) in self._histograms.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for labels, hist in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(list(buckets) + ['+Inf'], hist.counts):
+                        cumulative += count
+                        le = bound if bound == '+Inf' else _num(bound)
+                        lines.append(f'{name}_bucket{_labels(label_names + ("le",), labels + (le,))} {cumulative}')
+                    lines.append(f'{name}_sum{_labels(label_names, labels)} {_num(hist.sum)}')
+                    lines.append(f'{name}_count{_labels(label_names, labels)} {hist.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _num(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return '{' + ','.join(f'{n}="{v}"' for n, v in zip(names, escaped)) + '}'
+
+
+registry = Registry()
+registry.counter('http_requests_total', 'Requests handled, by route, method and status.', ('route', 'method', 'status'))
+registry.histogram('http_request_duration_seconds', 'Request wall time by route.', ('route', 'method'), LATENCY_BUCKETS)
+registry.histogram('http_request_db_queries', 'SQL statements per request by route.', ('route',), QUERY_COUNT_BUCKETS)
+registry.histogram('http_request_db_seconds', 'Time in SQL per request by route.', ('route',), LATENCY_BUCKETS)
+registry.histogram('http_request_chain_seconds', 'Time in blockchain calls per request by route.', ('route',),
+                   CHAIN_BUCKETS)
+registry.counter('db_queries_total', 'SQL statements run, by route ("background" for workers).', ('route',))
+registry.counter('db_seconds_total', 'Time in SQL, by route ("background" for workers).', ('route',))
+registry.histogram('chain_call_seconds', 'Duration of blockchain.py calls by function.', ('function',), CHAIN_BUCKETS)
+
+
+class _Timings:
+    __slots__ = ('request', 'started', 'db_queries', 'db_seconds', 'chain_seconds', 'serialize_seconds')
+
+    def __init__(self, req):
+        self.request = req
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.chain_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+
+def _current():
+    """Timings of the request being handled, or None outside a request."""
+    if has_app_context():
+        return g.get('_timings')
+    return None
+
+
+def _route():
+    if has_request_context() and request.url_rule is not None:
+        return request.url_rule.rule
+    return BACKGROUND if not has_request_context() else 'unmatched'
+
+
+def record_sql(seconds, statements=1):
+    timings = _current()
+    if timings is not None:
+        timings.db_queries += statements
+        timings.db_seconds += seconds
+    route = _route()
+    registry.inc('db_queries_total', (route,), statements)
+    registry.inc('db_seconds_total', (route,), seconds)
+
+
+class TimedCursor:
+    """Cursor proxy that reports statement counts and time to record_sql()."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cursor.close()
+
+    def _timed(self, statements, method, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            record_sql(time.perf_counter() - started, statements)
+
+    def execute(self, *args, **kwargs):
+        return self._timed(1, self._cursor.execute, *args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self._timed(1, self._cursor.executemany, *args, **kwargs)
+
+    # unbuffered cursors read rows from the server here
+    def fetchone(self):
+        return self._timed(0, self._cursor.fetchone)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._timed(0, self._cursor.fetchmany, *args, **kwargs)
+
+    def fetchall(self):
+        return self._timed(0, self._cursor.fetchall)
+
+
+_chain_depth = threading.local()
+
+
+def instrument_chain(namespace, module_name):
+    """Wrap the public functions defined in `module_name` (found in `namespace`) with chain timing."""
+    for name, fn in list(namespace.items()):
+        if name.startswith('_') or not callable(fn) or isinstance(fn, type):
+            continue
+        if getattr(fn, '__module__', None) != module_name or not hasattr(fn, '__code__'):
+            continue
+        namespace[name] = _chain_timer(fn)
+
+
+def _chain_timer(fn):
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        depth = getattr(_chain_depth, 'value', 0)
+        _chain_depth.value = depth + 1
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            _chain_depth.value = depth
+            registry.observe('chain_call_seconds', (name,), elapsed)
+            timings = _current()
+            if depth == 0 and timings is not None:
+                timings.chain_seconds += elapsed
+    return wrapper
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Default JSON provider that adds dumps() time to the request's serialize time."""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            timings = _current()
+            if timings is not None:
+                timings.serialize_seconds += time.perf_counter() - started
+
+
+def _before_request():
+    g._timings = _Timings(request._get_current_object())
+
+
+def _after_request(response):
+    timings = g.pop('_timings', None)
+    if timings is None:
+        return response
+    total = time.perf_counter() - timings.started
+    route = _route()
+    registry.inc('http_requests_total', (route, request.method, str(response.status_code)))
+    registry.observe('http_request_duration_seconds', (route, request.method), total)
+    registry.observe('http_request_db_queries', (route,), timings.db_queries)
+    registry.observe('http_request_db_seconds', (route,), timings.db_seconds)
+    registry.observe('http_request_chain_seconds', (route,), timings.chain_seconds)
+    if SERVER_TIMING:
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={timings.db_seconds * 1000:.1f};desc="{timings.db_queries} queries"',
+            f'chain;dur={timings.chain_seconds * 1000:.1f}',
+            f'serialize;dur={timings.serialize_seconds * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+    return response
+
+
+def _teardown_request(exc=None):
+    # after_request does not run when a view raised; count those as 500s.
+    # Requests dispatched in-process (dashboard widgets) share g and are skipped.
+    timings = g.get('_timings')
+    if timings is not None and timings.request is request._get_current_object():
+        g.pop('_timings')
+        route = _route()
+        registry.inc('http_requests_total', (route, request.method, '500'))
+        registry.observe('http_request_duration_seconds', (route, request.method), time.perf_counter() - timings.started)
+
+
+def render():
+    return registry.render()
+
+
+def init_app(app):
+    app.json = TimedJSONProvider(app)
+    app.before_request_funcs.setdefault(None, []).insert(0, _before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
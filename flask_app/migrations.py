@@ -0,0 +1,447 @@
+"""Versioned schema migrations.
+
+init_db used to re-run every CREATE TABLE and about 40 tolerant ALTER TABLE
+statements on each startup. Each schema change is now a numbered step in
+MIGRATIONS; the versions already applied are recorded in `schema_migrations`,
+so startup reads MAX(version) once and runs only the steps after it.
+
+Version 1 is the schema init_db built before this module existed. Its legacy
+ALTERs ignore "already exists" / "doesn't exist" errors, so a database created
+by an older init_db upgrades through it the same way an empty one does.
+
+A step is recorded only after it succeeds; a failed step stops the run and is
+retried on the next startup. MySQL commits DDL implicitly, so steps must be safe
+to re-run after a partial failure (IF NOT EXISTS, tolerated duplicates).
+"""
+import logging
+
+import mysql.connector
+from mysql.connector import errorcode
+
+import farmer_contribution
+import id_sequence
+import indexer
+import outbox
+import resource_version
+import response_cache
+import roles
+import stock_rollup
+import stock_snapshots
+import user_directory
+from db import MYSQL_DATABASE, get_connection
+
+logger = logging.getLogger(__name__)
+
+CREATE_TABLE = '''
+CREATE TABLE IF NOT EXISTS `schema_migrations` (
+    version INT NOT NULL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+'''
+
+
+def _tolerant(cur, statements):
+    """Run legacy ALTERs that fail when the change is already in place."""
+    for sql in statements:
+        try:
+            cur.execute(sql)
+        except mysql.connector.Error:
+            pass  # Column already exists / doesn't exist
+
+
+def _add_index(cur, table, name, columns):
+    try:
+        cur.execute(f'ALTER TABLE `{table}` ADD INDEX `{name}` ({columns})')
+    except mysql.connector.Error as e:
+        if e.errno != errorcode.ER_DUP_KEYNAME:
+            raise
+
+
+def _baseline(cur):
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id varchar(255) PRIMARY KEY,
+            user_type VARCHAR(50) NOT NULL,
+            nic VARCHAR(64),
+            full_name VARCHAR(255),
+            company_register_number VARCHAR(128),
+            company_name VARCHAR(255),
+            address TEXT,
+            district VARCHAR(128),
+            contact_number VARCHAR(64),
+            password VARCHAR(255),
+            total_area_of_paddy_land VARCHAR(64),
+            block_hash VARCHAR(255),
+            block_number INT,
+            transaction_hash VARCHAR(255),
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''')
+    _tolerant(cur, [
+        "ALTER TABLE `users` ADD COLUMN block_number INT AFTER block_hash",
+        "ALTER TABLE `users` ADD COLUMN transaction_hash VARCHAR(255) AFTER block_number",
+    ])
+
+    # transfers/purchases of paddy
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS `transaction` (
+            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            `from` VARCHAR(255),
+            `to` VARCHAR(255),
+            `type` VARCHAR(100),
+            quantity DECIMAL(14,3),
+            `datetime` DATETIME,
+            block_hash VARCHAR(255),
+            block_number INT,
+            transaction_hash VARCHAR(255),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''')
+    _tolerant(cur, [
+        "ALTER TABLE `transaction` ADD COLUMN block_number INT AFTER block_hash",
+        "ALTER TABLE `transaction` ADD COLUMN transaction_hash VARCHAR(255) AFTER block_number",
+        "ALTER TABLE `transaction` ADD COLUMN status TINYINT(1) DEFAULT 1 AFTER `quantity`",
+        "ALTER TABLE `transaction` ADD COLUMN price DECIMAL(14,3) AFTER `quantity`",
+        "ALTER TABLE `transaction` DROP COLUMN is_reverted",
+        "ALTER TABLE `transaction` ADD COLUMN chain_tx_id INT AFTER transaction_hash",
+    ])
+
+    # per-user paddy stock levels
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS `stock` (
+            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            user_id varchar(255),
+            `type` VARCHAR(128),
+            amount DECIMAL(20,3) DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX (user_id),
+            INDEX (`type`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''')
+
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS `paddy_type` (
+            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(255),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''')
+
+    # damaged paddy
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS `damage` (
+            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            user_id VARCHAR(255),
+            paddy_type VARCHAR(128),
+            quantity DECIMAL(14,3),
+            reason TEXT,
+            damage_date DATETIME,
+            block_hash VARCHAR(255),
+            block_number INT,
+            transaction_hash VARCHAR(255),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX (user_id),
+            INDEX (paddy_type)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''')
+    _tolerant(cur, [
+        "ALTER TABLE `damage` ADD COLUMN block_number INT AFTER block_hash",
+        "ALTER TABLE `damage` ADD COLUMN transaction_hash VARCHAR(255) AFTER block_number",
+        "ALTER TABLE `damage` ADD COLUMN reverted INT DEFAULT 0 AFTER transaction_hash",
+    ])
+
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS `milling` (
+            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            miller_id VARCHAR(255),
+            paddy_type VARCHAR(128),
+            input_paddy DECIMAL(14,3),
+            output_rice DECIMAL(14,3),
+            milling_date DATE,
+            drying_duration INT,
+            status BOOLEAN DEFAULT FALSE,
+            block_hash VARCHAR(255),
+            block_number INT,
+            transaction_hash VARCHAR(255),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX (miller_id),
+            INDEX (paddy_type)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''')
+    _tolerant(cur, [
+        "ALTER TABLE `milling` ADD COLUMN block_number INT AFTER block_hash",
+        "ALTER TABLE `milling` ADD COLUMN transaction_hash VARCHAR(255) AFTER block_number",
+        "ALTER TABLE `milling` ADD COLUMN drying_duration INT AFTER milling_date",
+        "ALTER TABLE `milling` ADD COLUMN status BOOLEAN DEFAULT FALSE AFTER drying_duration",
+    ])
+
+    # rice produced by milling
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS `rice_stock` (
+            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            miller_id VARCHAR(255),
+            paddy_type VARCHAR(128),
+            quantity DECIMAL(14,3),
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX (miller_id),
+            INDEX (paddy_type)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''')
+
+    # rice transfers (Miller -> Wholesaler/Retailer/etc)
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS `rice_transaction` (
+            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            `from` VARCHAR(255),
+            `to` VARCHAR(255),
+            rice_type VARCHAR(100),
+            quantity DECIMAL(14,3),
+            `datetime` DATETIME,
+            block_hash VARCHAR(255),
+            block_number INT,
+            transaction_hash VARCHAR(255),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX (`from`),
+            INDEX (`to`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''')
+    _tolerant(cur, [
+        "ALTER TABLE `rice_transaction` ADD COLUMN block_number INT AFTER block_hash",
+        "ALTER TABLE `rice_transaction` ADD COLUMN transaction_hash VARCHAR(255) AFTER block_number",
+        "ALTER TABLE `rice_transaction` ADD COLUMN price DECIMAL(14,3) AFTER `quantity`",
+        "ALTER TABLE `rice_transaction` ADD COLUMN reverted TINYINT(1) DEFAULT 0 AFTER `price`",
+        "ALTER TABLE `rice_transaction` DROP COLUMN is_reverted",
+        "ALTER TABLE `rice_transaction` ADD COLUMN chain_tx_id INT AFTER transaction_hash",
+    ])
+
+    # damaged rice (Wholesaler/Retailer/etc)
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS `rice_damage` (
+            id INT NOT NULL PRIMARY KEY,
+            user_id VARCHAR(255),
+            rice_type VARCHAR(128),
+            quantity DECIMAL(14,3),
+            reason TEXT,
+            damage_date DATETIME,
+            block_hash VARCHAR(255),
+            block_number INT,
+            transaction_hash VARCHAR(255),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX (user_id),
+            INDEX (rice_type)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''')
+    _tolerant(cur, [
+        "ALTER TABLE `rice_damage` ADD COLUMN block_number INT AFTER block_hash",
+        "ALTER TABLE `rice_damage` ADD COLUMN transaction_hash VARCHAR(255) AFTER block_number",
+        "ALTER TABLE `rice_damage` ADD COLUMN reverted INT DEFAULT 0 AFTER transaction_hash",
+        "ALTER TABLE `rice_damage` DROP COLUMN rice_damage_id",
+    ])
+
+    # initial paddy amounts
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS `initial_paddy` (
+            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            user_id VARCHAR(255),
+            paddy_type VARCHAR(128),
+            quantity DECIMAL(14,3),
+            reverted TINYINT DEFAULT 0,
+            block_number INT,
+            transaction_id VARCHAR(255),
+            block_hash VARCHAR(255),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX (user_id),
+            INDEX (paddy_type)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''')
+    _tolerant(cur, [
+        # status was renamed to reverted, initial_paddy to quantity
+        "ALTER TABLE `initial_paddy` CHANGE COLUMN status reverted TINYINT DEFAULT 0",
+        "ALTER TABLE `initial_paddy` ADD COLUMN paddy_type VARCHAR(128) AFTER user_id",
+        "ALTER TABLE `initial_paddy` CHANGE COLUMN initial_paddy quantity DECIMAL(14,3)",
+        "ALTER TABLE `initial_paddy` ADD COLUMN reverted TINYINT DEFAULT 0 AFTER quantity",
+        "ALTER TABLE `initial_paddy` DROP COLUMN `original_reverted`",
+        "ALTER TABLE `initial_paddy` ADD COLUMN block_number INT AFTER reverted",
+        "ALTER TABLE `initial_paddy` ADD COLUMN transaction_id VARCHAR(255) AFTER block_number",
+        "ALTER TABLE `initial_paddy` ADD COLUMN block_hash VARCHAR(255) AFTER transaction_id",
+    ])
+
+    # rice amounts
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS `rice` (
+            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            user_id VARCHAR(255),
+            rice_type VARCHAR(128),
+            quantity DECIMAL(14,3),
+            status TINYINT DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            block_id INT,
+            block_hash VARCHAR(255),
+            block_number INT,
+            transaction_hash VARCHAR(255),
+            INDEX (user_id),
+            INDEX (rice_type),
+            INDEX (status)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''')
+    _tolerant(cur, [
+        "ALTER TABLE rice ADD COLUMN status TINYINT DEFAULT 1",
+        "ALTER TABLE `rice` ADD COLUMN block_id INT AFTER updated_at",
+        "ALTER TABLE `rice` ADD COLUMN block_hash VARCHAR(255) AFTER block_id",
+        "ALTER TABLE `rice` ADD COLUMN block_number INT AFTER block_hash",
+        "ALTER TABLE `rice` ADD COLUMN transaction_hash VARCHAR(255) AFTER block_number",
+    ])
+
+
+def _chain_outbox(cur):
+    cur.execute(outbox.CREATE_OUTBOX_TABLE)
+
+
+def _stock_rollup(cur):
+    stock_rollup.install(cur)
+    cur.execute('START TRANSACTION')
+    stock_rollup.rebuild(cur)
+    cur.execute('COMMIT')
+
+
+def _stock_daily_backfill(cur):
+    # runs on its own connection; an already filled table has nothing to backfill
+    cur.execute('SELECT 1 FROM `stock_daily` LIMIT 1')
+    if cur.fetchone() is None:
+        logger.info('Backfilled stock history for %s days', stock_snapshots.backfill())
+
+
+def _history_indexes(cur):
+    # range scans for per-party history, newest first; id rides along as the PK suffix
+    for table in ('transaction', 'rice_transaction'):
+        _add_index(cur, table, 'from_datetime', '`from`, `datetime`')
+        _add_index(cur, table, 'to_datetime', '`to`, `datetime`')
+        _add_index(cur, table, 'datetime_id', '`datetime`')
+    _add_index(cur, 'milling', 'miller_date', 'miller_id, milling_date')
+    _add_index(cur, 'milling', 'milling_date', 'milling_date')
+    _add_index(cur, 'damage', 'user_date', 'user_id, damage_date')
+    _add_index(cur, 'damage', 'damage_date', 'damage_date')
+    _add_index(cur, 'rice_damage', 'user_date', 'user_id, damage_date')
+    _add_index(cur, 'initial_paddy', 'user_created', 'user_id, created_at')
+
+
+def _user_name_search(cur):
+    # substring-style name search (miller filter on /api/milling) without a table scan
+    try:
+        cur.execute('ALTER TABLE `users` ADD FULLTEXT INDEX full_name_ngram (full_name) WITH PARSER ngram')
+    except mysql.connector.Error as e:
+        if e.errno != errorcode.ER_DUP_KEYNAME:
+            raise
+
+
+def _bulk_user_import(cur):
+    # user registrations go through the outbox, and their target ids are user ids like 'FAR12'
+    cur.execute('ALTER TABLE `chain_outbox` MODIFY target_id VARCHAR(255) NOT NULL')
+    _add_index(cur, 'users', 'nic', 'nic')
+
+
+def _farmer_contribution(cur):
+    farmer_contribution.install(cur)
+    cur.execute('START TRANSACTION')
+    farmer_contribution.rebuild(cur)
+    cur.execute('COMMIT')
+
+
+def _outbox_sent_hash(cur):
+    # hash of the submitted chain transaction, so a retry tracks it instead of sending again
+    cur.execute('ALTER TABLE `chain_outbox` ADD COLUMN sent_tx_hash VARCHAR(255) NULL AFTER attempts')
+
+
+def _outbox_batch_index(cur):
+    # position of the row in a batch transaction, so a re-track picks its own record's event
+    cur.execute('ALTER TABLE `chain_outbox` ADD COLUMN sent_batch_index INT NULL AFTER sent_tx_hash')
+
+
+def _stock_key_indexes(cur):
+    # the bulk endpoint locks stock rows by (user, type); with only single-column
+    # indexes InnoDB scans and locks every row of the user, in index order
+    _add_index(cur, 'stock', 'user_type', 'user_id, `type`')
+    _add_index(cur, 'rice_stock', 'miller_paddy', 'miller_id, paddy_type')
+
+
+# (version, name, step); append only, never renumber or edit an applied step
+MIGRATIONS = [
+    (1, 'baseline schema', _baseline),
+    (2, 'chain_outbox', _chain_outbox),
+    (3, 'chain index tables', indexer.create_tables),
+    (4, 'users.role', roles.install),
+    (5, 'stock_rollup', _stock_rollup),
+    (6, 'stock_daily', stock_snapshots.create_table),
+    (7, 'stock_daily backfill', _stock_daily_backfill),
+    (8, 'history indexes', _history_indexes),
+    (9, 'users full_name search index', _user_name_search),
+    (10, 'user directory version', user_directory.install),
+    (11, 'user id sequences', id_sequence.install),
+    (12, 'bulk user import', _bulk_user_import),
+    (13, 'response cache tags', response_cache.install),
+    (14, 'resource version stamps', resource_version.install),
+    (15, 'farmer_contribution', _farmer_contribution),
+    (16, 'chain_outbox sent_tx_hash', _outbox_sent_hash),
+    (17, 'resource version change log', resource_version.install),
+    (18, 'chain_outbox sent_batch_index', _outbox_batch_index),
+    (19, 'user directory bump on cached columns only', user_directory.install),
+    (20, 'stock (user, type) indexes', _stock_key_indexes),
+]
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def _connect():
+    try:
+        return get_connection(MYSQL_DATABASE)
+    except mysql.connector.Error as e:
+        if e.errno != errorcode.ER_BAD_DB_ERROR:
+            raise
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(f"CREATE DATABASE IF NOT EXISTS `{MYSQL_DATABASE}` DEFAULT CHARACTER SET 'utf8mb4' COLLATE 'utf8mb4_unicode_ci';")
+    cur.close()
+    conn.close()
+    return get_connection(MYSQL_DATABASE)
+
+
+def current_version(cur):
+    try:
+        cur.execute('SELECT COALESCE(MAX(version), 0) FROM `schema_migrations`')
+        return cur.fetchone()[0]
+    except mysql.connector.Error as e:
+        if e.errno != errorcode.ER_NO_SUCH_TABLE:
+            raise
+    cur.execute(CREATE_TABLE)
+    return 0
+
+
+def migrate():
+    """Apply pending migrations. Returns (version before, version after)."""
+    conn = _connect()
+    cur = conn.cursor(buffered=True)
+    try:
+        start = version = current_version(cur)
+        for number, name, step in MIGRATIONS:
+            if number <= version:
+                continue
+            logger.info('Applying migration %s: %s', number, name)
+            step(cur)
+            cur.execute('INSERT INTO `schema_migrations` (version, name) VALUES (%s, %s)', (number, name))
+            version = number
+        return start, version
+    finally:
+        cur.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    # `python migrations.py` applies pending migrations without starting the app
+    before, after = migrate()
+    print(f'Schema at version {after}' + (f' (was {before})' if after != before else ''))
@@ -0,0 +1,450 @@
+"""Blockchain outbox for writes that must also be recorded on-chain.
+
+Request handlers insert a `chain_outbox` row in the same MySQL transaction as
+the stock change (see enqueue()) and return immediately. A background worker
+submits pending rows to the Operations contract and back-fills block_hash,
+block_number, transaction_hash and the on-chain id on the target row, so no
+stock row lock is held while waiting for a block.
+
+The hash of each submission is saved on its row (sent_tx_hash) before waiting
+for the receipt. A row that already has one is never submitted again: a timed
+out receipt, a failed write-back or a worker that died mid-wait only leads to
+that hash being tracked again, since a second submission could record the same
+transfer on-chain twice. The exception is a receipt with status 0: a reverted
+transaction recorded nothing, so the hash is cleared and the row is sent again
+on its next attempt, with a fresh gas estimate.
+
+Fresh rows of a kind the Operations contract records in bulk (transactions and
+rice transactions) go out as one *Batch call per kind and round instead of one
+transaction each. Every row of the batch saves the same hash plus its position
+(sent_batch_index), and the receipt's record events are handed out to the rows
+in that order. When a batch cannot be sent at all, its rows are sent one by one.
+The worker waits OUTBOX_BATCH_DELAY after a wake-up before claiming, so a burst
+of enqueued rows is sent together: a round goes out when OUTBOX_BATCH_SIZE rows
+are due or once the delay has passed.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import mysql.connector
+
+from db import MYSQL_DATABASE, get_connection
+
+logger = logging.getLogger(__name__)
+
+# seconds the worker sleeps when there is nothing to do (enqueue() wakes it early)
+OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 2))
+# give up on a row after this many failed submissions
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 5))
+# a row stuck in 'processing' this long (worker died mid-submit) is retried
+OUTBOX_STALE_SECONDS = int(os.environ.get('OUTBOX_STALE_SECONDS', 600))
+# rows submitted per round; all of them are sent before waiting for any receipt
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 20))
+# seconds to let rows accumulate after a wake-up before claiming a round
+OUTBOX_BATCH_DELAY = float(os.environ.get('OUTBOX_BATCH_DELAY', 0.5))
+# send fresh rows of a batchable kind as one *Batch contract call ('0' sends each row alone)
+OUTBOX_CHAIN_BATCH = os.environ.get('OUTBOX_CHAIN_BATCH', '1') == '1'
+
+STATUS_PENDING = 'pending'
+STATUS_PROCESSING = 'processing'
+STATUS_CONFIRMED = 'confirmed'
+STATUS_FAILED = 'failed'
+
+CREATE_OUTBOX_TABLE = '''
+CREATE TABLE IF NOT EXISTS `chain_outbox` (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(64) NOT NULL,
+    target_table VARCHAR(64) NOT NULL,
+    target_id INT NOT NULL,
+    payload TEXT NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    block_hash VARCHAR(255),
+    block_number INT,
+    transaction_hash VARCHAR(255),
+    chain_tx_id INT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX (status, next_attempt_at),
+    INDEX (target_table, target_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+'''
+
+
+# submit functions send the chain transaction and return a Future of the receipt result
+def _submit_transaction(p):
+    from blockchain import record_transaction
+    return record_transaction(p['from'], p['to'], p['type'], int(float(p['quantity'])),
+                              p.get('price') or 0.0, 0.0, bool(p.get('status', 1)), wait=False)
+
+
+def _submit_rice_transaction(p):
+    from blockchain import record_rice_transaction
+    return record_rice_transaction(p['from'], p['to'], p['type'], int(float(p['quantity'])),
+                                   p.get('price') or 0.0, bool(p.get('status', 1)), wait=False)
+
+
+def _submit_user_registration(p):
+    from blockchain import register_user
+    return register_user(p['user_type'], p['id'], p, wait=False)
+
+
+# track functions return the same Future for a hash submitted earlier
+def _track_transaction(tx_hash):
+    from blockchain import track_transaction
+    return track_transaction(tx_hash)
+
+
+def _track_rice_transaction(tx_hash):
+    from blockchain import track_rice_transaction
+    return track_rice_transaction(tx_hash)
+
+
+def _track_user_registration(tx_hash):
+    from blockchain import track_user_registration
+    return track_user_registration(tx_hash)
+
+
+# kind -> (submit function, table whose row gets the chain receipt fields, track function)
+HANDLERS = {
+    'transaction': (_submit_transaction, 'transaction', _track_transaction),
+    'rice_transaction': (_submit_rice_transaction, 'rice_transaction', _track_rice_transaction),
+    'user_registration': (_submit_user_registration, 'users', _track_user_registration),
+}
+
+# kind -> contract arguments of one payload, for kinds blockchain.record_batch() takes
+def _transaction_args(p):
+    from blockchain import transaction_args
+    return transaction_args(p['from'], p['to'], p['type'], int(float(p['quantity'])),
+                            p.get('price') or 0.0, p.get('status', 1))
+
+
+BATCH_ARGS = {
+    'transaction': _transaction_args,
+    'rice_transaction': _transaction_args,
+}
+
+# receipt columns written back to the target row; users has no chain_tx_id
+TARGET_COLUMNS = {
+    'users': ('block_hash', 'block_number', 'transaction_hash'),
+}
+DEFAULT_TARGET_COLUMNS = ('block_hash', 'block_number', 'transaction_hash', 'chain_tx_id')
+
+_wake = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def enqueue(cur, kind, target_id, payload):
+    """Insert an outbox row using the caller's cursor (and therefore its transaction).
+
+    Call notify() after the caller commits so the worker picks it up right away.
+    """
+    target_table = HANDLERS[kind][1]
+    cur.execute(
+        'INSERT INTO `chain_outbox` (kind, target_table, target_id, payload) VALUES (%s, %s, %s, %s)',
+        (kind, target_table, target_id, json.dumps(payload, default=str))
+    )
+    return cur.lastrowid
+
+
+def enqueue_many(cur, kind, items):
+    """enqueue() for many (target_id, payload) pairs with one executemany; returns the first outbox id.
+
+    The rows go in as one multi-row INSERT, so their ids are consecutive from there.
+    """
+    target_table = HANDLERS[kind][1]
+    cur.executemany(
+        'INSERT INTO `chain_outbox` (kind, target_table, target_id, payload) VALUES (%s, %s, %s, %s)',
+        [(kind, target_table, target_id, json.dumps(payload, default=str)) for target_id, payload in items]
+    )
+    return cur.lastrowid
+
+
+def notify():
+    ensure_worker()
+    _wake.set()
+
+
+def get_status(outbox_id):
+    conn = get_connection(MYSQL_DATABASE)
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute(
+            'SELECT id, kind, target_table, target_id, status, attempts, last_error, sent_tx_hash, sent_batch_index, '
+            'block_hash, block_number, transaction_hash, chain_tx_id, created_at, updated_at '
+            'FROM `chain_outbox` WHERE id = %s',
+            (outbox_id,)
+        )
+        return cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _claim(limit):
+    """Lock up to `limit` of the oldest due rows, mark them processing and return them."""
+    conn = get_connection(MYSQL_DATABASE)
+    cur = conn.cursor(dictionary=True)
+    try:
+        conn.start_transaction()
+        # SKIP LOCKED lets several app processes run a worker without stepping on each other
+        cur.execute(
+            'SELECT id, kind, target_table, target_id, payload, attempts, sent_tx_hash, sent_batch_index '
+            'FROM `chain_outbox` '
+            'WHERE status = %s AND next_attempt_at <= NOW() '
+            'ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED',
+            (STATUS_PENDING, limit)
+        )
+        rows = cur.fetchall()
+        if rows:
+            ids = [row['id'] for row in rows]
+            cur.execute(
+                'UPDATE `chain_outbox` SET status = %s, attempts = attempts + 1 WHERE id IN ({})'.format(
+                    ', '.join(['%s'] * len(ids))),
+                [STATUS_PROCESSING] + ids
+            )
+            for row in rows:
+                row['attempts'] += 1
+        conn.commit()
+        return rows
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _requeue_stale():
+    conn = get_connection(MYSQL_DATABASE)
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            'UPDATE `chain_outbox` SET status = %s '
+            'WHERE status = %s AND updated_at < NOW() - INTERVAL %s SECOND',
+            (STATUS_PENDING, STATUS_PROCESSING, OUTBOX_STALE_SECONDS)
+        )
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _mark_sent(rows):
+    conn = get_connection(MYSQL_DATABASE)
+    cur = conn.cursor()
+    try:
+        cur.executemany(
+            'UPDATE `chain_outbox` SET sent_tx_hash = %s, sent_batch_index = %s WHERE id = %s',
+            [(row['sent_tx_hash'], row.get('sent_batch_index'), row['id']) for row in rows]
+        )
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _mark_confirmed(row, result):
+    conn = get_connection(MYSQL_DATABASE)
+    cur = conn.cursor()
+    try:
+        conn.start_transaction()
+        chain_fields = (result.get('block_hash'), result.get('block_number'),
+                        result.get('transaction_hash'), result.get('transaction_id'))
+        # target_table only ever comes from HANDLERS, never from user input
+        columns = TARGET_COLUMNS.get(row['target_table'], DEFAULT_TARGET_COLUMNS)
+        cur.execute(
+            f'UPDATE `{row["target_table"]}` SET {", ".join(f"{c} = %s" for c in columns)} WHERE id = %s',
+            chain_fields[:len(columns)] + (row['target_id'],)
+        )
+        cur.execute(
+            'UPDATE `chain_outbox` SET status = %s, last_error = NULL, block_hash = %s, '
+            'block_number = %s, transaction_hash = %s, chain_tx_id = %s WHERE id = %s',
+            (STATUS_CONFIRMED,) + chain_fields + (row['id'],)
+        )
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _mark_failed(row, error):
+    final = row['attempts'] >= OUTBOX_MAX_ATTEMPTS
+    # exponential backoff: 5s, 10s, 20s ... capped at 5 minutes
+    delay = min(5 * 2 ** (row['attempts'] - 1), 300)
+    conn = get_connection(MYSQL_DATABASE)
+    cur = conn.cursor()
+    try:
+        # the sent hash is written again in case _mark_sent() could not save it
+        cur.execute(
+            'UPDATE `chain_outbox` SET status = %s, last_error = %s, sent_tx_hash = %s, sent_batch_index = %s, '
+            'next_attempt_at = NOW() + INTERVAL %s SECOND WHERE id = %s',
+            (STATUS_FAILED if final else STATUS_PENDING, str(error)[:2000], row.get('sent_tx_hash'),
+             row.get('sent_batch_index'), delay, row['id'])
+        )
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _fail(row, error):
+    logger.warning('Outbox: %s #%s failed (attempt %s): %s', row['kind'], row['target_id'], row['attempts'], error)
+    try:
+        _mark_failed(row, error)
+    except Exception as e:
+        # left in processing; _requeue_stale() hands it back later
+        logger.error('Outbox: could not record failure of #%s: %s', row['id'], e)
+
+
+def _pick(batch_future, index):
+    """Future of record `index` of a batch Future's results."""
+    future = Future()
+
+    def resolve(done):
+        try:
+            results = done.result()
+            if index >= len(results):
+                raise RuntimeError(f'batch emitted {len(results)} record events, row is #{index}')
+            future.set_result(results[index])
+        except Exception as e:
+            future.set_exception(e)
+
+    batch_future.add_done_callback(resolve)
+    return future
+
+
+def _save_hashes(rows):
+    try:
+        _mark_sent(rows)
+    except Exception as e:
+        # still waited on; _mark_failed() saves the hash if the wait fails
+        logger.error('Outbox: could not save the hash of %s: %s', ', '.join(f"#{row['id']}" for row in rows), e)
+
+
+def _send_batch(kind, rows):
+    """[(row, future)] for `rows` sent as one batch transaction, or None if it could not be sent."""
+    from blockchain import record_batch
+    try:
+        args = [BATCH_ARGS[kind](json.loads(row['payload'])) for row in rows]
+        batch_future = record_batch(kind, args)
+    except Exception as e:
+        logger.warning('Outbox: %s batch of %s rows not sent, sending them one by one: %s', kind, len(rows), e)
+        return None
+    for index, row in enumerate(rows):
+        row['sent_tx_hash'] = batch_future.tx_hash.hex()
+        row['sent_batch_index'] = index
+    _save_hashes(rows)
+    return [(row, _pick(batch_future, index)) for index, row in enumerate(rows)]
+
+
+def _track(row, batches):
+    """Future for a row sent in an earlier round; rows of one batch share its tracker entry."""
+    _, _, track = HANDLERS[row['kind']]
+    if row.get('sent_batch_index') is None:
+        return track(row['sent_tx_hash'])
+    if row['sent_tx_hash'] not in batches:
+        from blockchain import track_batch
+        batches[row['sent_tx_hash']] = track_batch(row['kind'], row['sent_tx_hash'])
+    return _pick(batches[row['sent_tx_hash']], row['sent_batch_index'])
+
+
+def _submit(row):
+    submit, _, _ = HANDLERS[row['kind']]
+    future = submit(json.loads(row['payload']))
+    if not future:
+        raise RuntimeError('blockchain call simulation failed')
+    row['sent_tx_hash'] = future.tx_hash.hex()
+    row['sent_batch_index'] = None
+    _save_hashes([row])
+    return future
+
+
+def process_batch(limit=OUTBOX_BATCH_SIZE):
+    """Submit up to `limit` due outbox rows. Returns the number of rows claimed.
+
+    Every row is sent before waiting on any receipt, so a round usually lands in
+    one or two blocks, and fresh rows of a batchable kind share one transaction.
+    Rows sent in an earlier round have their saved hash tracked instead of being
+    sent again.
+    """
+    rows = _claim(limit)
+    in_flight = []
+    fresh = {}  # kind -> rows never sent
+    batches = {}  # batch hash -> Future of its results
+    for row in rows:
+        if not row.get('sent_tx_hash'):
+            fresh.setdefault(row['kind'], []).append(row)
+            continue
+        try:
+            in_flight.append((row, _track(row, batches)))
+        except Exception as e:
+            _fail(row, e)
+
+    for kind, kind_rows in fresh.items():
+        if OUTBOX_CHAIN_BATCH and kind in BATCH_ARGS and len(kind_rows) > 1:
+            sent = _send_batch(kind, kind_rows)
+            if sent:
+                in_flight.extend(sent)
+                continue
+        for row in kind_rows:
+            try:
+                in_flight.append((row, _submit(row)))
+            except Exception as e:
+                _fail(row, e)
+
+    for row, future in in_flight:
+        try:
+            result = future.result()
+            _mark_confirmed(row, result)
+        except Exception as e:
+            from blockchain import TransactionReverted
+            if isinstance(e, TransactionReverted):
+                row['sent_tx_hash'] = row['sent_batch_index'] = None
+            _fail(row, e)
+            continue
+        logger.debug('Outbox: %s #%s confirmed in block %s', row['kind'], row['target_id'], result.get('block_number'))
+    return len(rows)
+
+
+def _run():
+    last_recovery = 0
+    while True:
+        try:
+            if time.monotonic() - last_recovery > OUTBOX_STALE_SECONDS / 2:
+                _requeue_stale()
+                last_recovery = time.monotonic()
+            while process_batch():
+                pass
+        except mysql.connector.Error as e:
+            logger.error('Outbox worker database error: %s', e)
+        except Exception as e:
+            logger.error('Outbox worker error: %s', e)
+        if _wake.wait(OUTBOX_POLL_INTERVAL) and OUTBOX_BATCH_DELAY > 0:
+            # let the rest of a burst arrive so it goes out in the same round
+            time.sleep(OUTBOX_BATCH_DELAY)
+        _wake.clear()
+
+
+def ensure_worker():
+    """Start the background worker thread once per process."""
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='chain-outbox', daemon=True)
+            _worker.start()
@@ -0,0 +1,245 @@
+"""Version stamps for conditional GETs (ETag / Last-Modified) on listings.
+
+Dashboards poll /api/transactions, /api/stock_user_detail, /api/rice_stock and
+/api/damages, and most polls return exactly what the previous one did. Each
+tracked table has a stamp, and so does each user in it ('<table>:<user_id>').
+
+Triggers on the tracked tables only INSERT into `resource_change`, one row per
+affected stamp, so all write paths are covered (transactions, reverts, milling,
+damages, initial stock, outbox and indexer confirmations) without touching each
+call site, a rolled-back write leaves no change behind, and no shared row is
+locked inside the writer's transaction. A background worker folds committed
+change rows into the counters in `resource_version` in its own transaction.
+A stamp's version is its counter plus its change rows not yet folded, read in
+one statement, so it moves as soon as a write commits and folding never moves it.
+
+@conditional(tables, user_args) computes a listing's ETag from the stamps it
+depends on: the per-user stamps when the request filters on one of
+`user_args`, the table stamps otherwise. A matching If-None-Match (or, without
+one, an If-Modified-Since no older than the newest stamp) is answered 304 after
+one primary-key read, without running the listing query.
+"""
+import functools
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import mysql.connector
+from flask import current_app, make_response, request
+
+import metrics
+from db import MYSQL_DATABASE, get_connection
+
+logger = logging.getLogger(__name__)
+
+CONDITIONAL_GET_ENABLED = os.environ.get('CONDITIONAL_GET_ENABLED', '1').lower() not in ('0', 'false', 'no', '')
+# seconds between folds of the change log into the counters
+FOLD_INTERVAL = float(os.environ.get('RESOURCE_VERSION_FOLD_INTERVAL', 2))
+# change rows folded per transaction
+FOLD_BATCH_SIZE = int(os.environ.get('RESOURCE_VERSION_FOLD_BATCH_SIZE', 5000))
+
+CREATE_TABLE = '''
+CREATE TABLE IF NOT EXISTS `resource_version` (
+    resource VARCHAR(191) NOT NULL PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+'''
+
+CREATE_CHANGE_TABLE = '''
+CREATE TABLE IF NOT EXISTS `resource_change` (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    resource VARCHAR(191) NOT NULL,
+    changed_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    INDEX (resource)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+'''
+
+# table -> user columns whose values get a per-user stamp
+TRACKED = {
+    'transaction': ('`from`', '`to`'),
+    'rice_transaction': ('`from`', '`to`'),
+    'stock': ('user_id',),
+    'rice_stock': ('miller_id',),
+    'damage': ('user_id',),
+    'rice_damage': ('user_id',),
+    # names and districts shown by the listings; no per-user stamp needed
+    'users': (),
+}
+
+
+def _record(table, rows):
+    """SQL logging a change of the table stamp and of the per-user stamps of `rows` ('NEW'/'OLD')."""
+    values = [f"('{table}')"]
+    for row in rows:
+        for col in TRACKED[table]:
+            values.append(f"(CONCAT('{table}:', COALESCE({row}.{col}, '')))")
+    # insert only: concurrent writers never wait on each other's stamps
+    return f'INSERT INTO `resource_change` (resource) VALUES {", ".join(values)}'
+
+
+# (name, CREATE TRIGGER statement)
+TRIGGERS = [
+    (f'resource_version_{table}_after_{event.lower()}',
+     f'CREATE TRIGGER `resource_version_{table}_after_{event.lower()}` AFTER {event} ON `{table}` '
+     f'FOR EACH ROW {_record(table, rows)}')
+    for table in TRACKED
+    for event, rows in (('INSERT', ('NEW',)), ('UPDATE', ('OLD', 'NEW')), ('DELETE', ('OLD',)))
+]
+
+metrics.registry.counter('conditional_get_total', 'Conditional GETs by endpoint and result.', ('endpoint', 'result'))
+
+
+def install(cur):
+    """Create the stamp and change tables and the triggers that log changes."""
+    cur.execute(CREATE_TABLE)
+    cur.execute(CREATE_CHANGE_TABLE)
+    for name, ddl in TRIGGERS:
+        cur.execute(f'DROP TRIGGER IF EXISTS `{name}`')
+        cur.execute(ddl)
+
+
+def current(resources):
+    """({resource: version}, newest update as a unix time or None) for `resources`."""
+    placeholders = ', '.join(['%s'] * len(resources))
+    conn = get_connection(MYSQL_DATABASE)
+    cur = conn.cursor()
+    try:
+        # one statement, one snapshot: a fold moves rows from the second part to the first
+        cur.execute(
+            f'SELECT resource, version, UNIX_TIMESTAMP(updated_at) FROM `resource_version` '
+            f'WHERE resource IN ({placeholders}) '
+            f'UNION ALL '
+            f'SELECT resource, COUNT(*), UNIX_TIMESTAMP(MAX(changed_at)) FROM `resource_change` '
+            f'WHERE resource IN ({placeholders}) GROUP BY resource',
+            list(resources) * 2)
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+    versions = {resource: 0 for resource in resources}
+    last_modified = None
+    for resource, version, updated_at in rows:
+        versions[resource] += int(version)
+        if updated_at is not None:
+            last_modified = max(last_modified or 0, float(updated_at))
+    return versions, last_modified
+
+
+def fold(limit=FOLD_BATCH_SIZE):
+    """Move up to `limit` committed change rows into the counters. Returns the number folded."""
+    conn = get_connection(MYSQL_DATABASE)
+    cur = conn.cursor()
+    try:
+        # READ COMMITTED takes no gap locks, so writers' trigger inserts never wait on a fold
+        conn.start_transaction(isolation_level='READ COMMITTED')
+        # rows of writers that have not committed are locked, and so skipped until they do;
+        # SKIP LOCKED also keeps two processes' workers from folding the same rows
+        cur.execute('SELECT id, resource, changed_at FROM `resource_change` ORDER BY id LIMIT %s '
+                    'FOR UPDATE SKIP LOCKED', (limit,))
+        rows = cur.fetchall()
+        if rows:
+            counts = {}
+            for _, resource, changed_at in rows:
+                count, latest = counts.get(resource, (0, changed_at))
+                counts[resource] = (count + 1, max(latest, changed_at))
+            # sorted, so concurrent folds lock counters in the same order
+            cur.executemany(
+                'INSERT INTO `resource_version` (resource, version, updated_at) VALUES (%s, %s, %s) '
+                'ON DUPLICATE KEY UPDATE version = version + VALUES(version), '
+                'updated_at = GREATEST(updated_at, VALUES(updated_at))',
+                [(resource, count, latest) for resource, (count, latest) in sorted(counts.items())])
+            ids = [row[0] for row in rows]
+            cur.execute(f'DELETE FROM `resource_change` WHERE id IN ({", ".join(["%s"] * len(ids))})', ids)
+        conn.commit()
+        return len(rows)
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _run():
+    while True:
+        try:
+            while fold() >= FOLD_BATCH_SIZE:
+                pass
+        except mysql.connector.Error as e:
+            logger.error('Resource version fold database error: %s', e)
+        except Exception as e:
+            logger.error('Resource version fold error: %s', e)
+        time.sleep(FOLD_INTERVAL)
+
+
+def ensure_worker():
+    """Start the background fold thread once per process."""
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='resource-version-fold', daemon=True)
+            _worker.start()
+
+
+def resources_for(tables, user_args):
+    """Stamps a request depends on: per user when it filters on one of `user_args`."""
+    user_id = next((request.args[arg].strip() for arg in user_args if (request.args.get(arg) or '').strip()), None)
+    return sorted(f'{table}:{user_id}' if user_id and TRACKED[table] else table for table in tables)
+
+
+def etag_for(versions):
+    """ETag of the current request's endpoint and query args under `versions`."""
+    args = sorted((k, v) for k, v in request.args.items(multi=True))
+    raw = f'{request.endpoint}?{args}|{sorted(versions.items())}'
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:24]
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    return since is not None and last_modified is not None and int(last_modified) <= since.timestamp()
+
+
+def conditional(tables, user_args=()):
+    """Answer a GET listing with 304 when the stamps of `tables` have not moved since the client's copy."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not CONDITIONAL_GET_ENABLED or request.method != 'GET':
+                return view(*args, **kwargs)
+            try:
+                # read before the listing: a write landing in between gives an old tag for
+                # newer data, which only costs the client one extra full response
+                versions, last_modified = current(resources_for(tables, user_args))
+            except mysql.connector.Error:
+                return view(*args, **kwargs)
+            etag = etag_for(versions)
+            if _not_modified(etag, last_modified):
+                metrics.registry.inc('conditional_get_total', (request.endpoint, 'not_modified'))
+                response = current_app.response_class(status=304)
+            else:
+                metrics.registry.inc('conditional_get_total', (request.endpoint, 'modified'))
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = int(last_modified)
+            # clients may keep the copy but must revalidate before using it
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,270 @@
+"""Response cache for read-mostly GET endpoints, with tag-based invalidation.
+
+@cached(ttl, tags) stores a view's 200 responses under its endpoint (or an
+explicit key shared by several endpoints) plus its normalised query args, in a
+per-process LRU of RESPONSE_CACHE_MAX_ENTRIES entries.
+
+Invalidation is by tag ('users', 'stock', 'paddy_types'). Each tag has a version
+in `cache_tag_version`, and every entry remembers the versions it was built
+under. An entry whose tags have moved on is a miss. @invalidates(*tags) on a
+write endpoint bumps its tags after a successful response. A trigger bumps
+'paddy_types', which the app never writes. Processes re-read the versions at
+most every RESPONSE_CACHE_CHECK_INTERVAL seconds (one small query), so other
+workers see a bump within that interval. The worker that made the change
+sees it at once.
+
+RESPONSE_CACHE_BACKEND=mysql also keeps entries in `response_cache`, so a worker
+can serve what another one built; the local LRU is still tried first.
+Hits and misses are counted on /metrics as response_cache_requests_total.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import mysql.connector
+from flask import current_app, make_response, request
+
+import metrics
+from db import MYSQL_DATABASE, get_connection
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', '1').lower() not in ('0', 'false', 'no', '')
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 512))
+# seconds between re-reads of the tag versions
+RESPONSE_CACHE_CHECK_INTERVAL = float(os.environ.get('RESPONSE_CACHE_CHECK_INTERVAL', 2))
+# '' (per process only) or 'mysql' (also shared through the response_cache table)
+RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', '').lower()
+
+CREATE_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS `cache_tag_version` (
+        tag VARCHAR(128) NOT NULL PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS `response_cache` (
+        cache_key VARCHAR(255) NOT NULL PRIMARY KEY,
+        tag_versions VARCHAR(255) NOT NULL,
+        content_type VARCHAR(100) NOT NULL,
+        body MEDIUMBLOB NOT NULL,
+        expires_at DATETIME NOT NULL,
+        INDEX (expires_at)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    ''',
+]
+
+_BUMP_SQL = ('INSERT INTO `cache_tag_version` (tag, version) VALUES (%s, 1) '
+             'ON DUPLICATE KEY UPDATE version = version + 1')
+
+# (name, CREATE TRIGGER statement): paddy types are only edited outside the app
+TRIGGERS = [
+    (f'cache_paddy_type_after_{event.lower()}',
+     f"CREATE TRIGGER `cache_paddy_type_after_{event.lower()}` AFTER {event} ON `paddy_type` FOR EACH ROW "
+     f"INSERT INTO `cache_tag_version` (tag, version) VALUES ('paddy_types', 1) "
+     f"ON DUPLICATE KEY UPDATE version = version + 1")
+    for event in ('INSERT', 'UPDATE', 'DELETE')
+]
+
+metrics.registry.counter('response_cache_requests_total', 'Response cache lookups by key and result.',
+                         ('key', 'result'))
+metrics.registry.counter('response_cache_evictions_total', 'Entries dropped by the LRU size bound.', ())
+
+
+def install(cur):
+    for ddl in CREATE_TABLES:
+        cur.execute(ddl)
+    for name, ddl in TRIGGERS:
+        cur.execute(f'DROP TRIGGER IF EXISTS `{name}`')
+        cur.execute(ddl)
+
+
+class ResponseCache:
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, check_interval=RESPONSE_CACHE_CHECK_INTERVAL,
+                 backend=RESPONSE_CACHE_BACKEND):
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, tag versions, content_type, body)
+        self._versions = {}
+        self._checked_at = 0.0
+
+    # --- tag versions ---------------------------------------------------
+
+    def _refresh_versions(self):
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        try:
+            conn = get_connection(MYSQL_DATABASE)
+            cur = conn.cursor()
+            try:
+                cur.execute('SELECT tag, version FROM `cache_tag_version`')
+                versions = dict(cur.fetchall())
+            finally:
+                cur.close()
+                conn.close()
+        except mysql.connector.Error as e:
+            # without the versions nothing can be trusted; serve uncached until they are back
+            logger.warning('Response cache version check failed: %s', e)
+            with self._lock:
+                self._entries.clear()
+            return
+        with self._lock:
+            self._versions = versions
+            self._checked_at = time.monotonic()
+
+    def tag_versions(self, tags):
+        self._refresh_versions()
+        return tuple(self._versions.get(tag, 0) for tag in tags)
+
+    def invalidate(self, *tags):
+        """Bump `tags` for every process; entries built under the old versions become misses."""
+        try:
+            conn = get_connection(MYSQL_DATABASE)
+            cur = conn.cursor()
+            try:
+                for tag in tags:
+                    cur.execute(_BUMP_SQL, (tag,))
+            finally:
+                cur.close()
+                conn.close()
+        except mysql.connector.Error as e:
+            # other processes keep their entries until the TTL; at least this one drops its own
+            logger.warning('Response cache invalidation of %s failed: %s', tags, e)
+            with self._lock:
+                self._entries.clear()
+        with self._lock:
+            self._checked_at = 0.0  # re-read the versions on the next lookup
+
+    # --- entries --------------------------------------------------------
+
+    def get(self, key, versions):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now and entry[1] == versions:
+                    self._entries.move_to_end(key)
+                    return entry[2], entry[3], 'hit'
+                del self._entries[key]
+        if self.backend == 'mysql':
+            entry = self._shared_get(key, versions)
+            if entry is not None:
+                self._put_local(key, entry)
+                return entry[2], entry[3], 'shared_hit'
+        return None
+
+    def set(self, key, versions, ttl, content_type, body):
+        entry = (time.time() + ttl, versions, content_type, body)
+        self._put_local(key, entry)
+        if self.backend == 'mysql':
+            self._shared_set(key, entry)
+
+    def _put_local(self, key, entry):
+        evicted = 0
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            metrics.registry.inc('response_cache_evictions_total', (), evicted)
+
+    def _shared_get(self, key, versions):
+        try:
+            conn = get_connection(MYSQL_DATABASE)
+            cur = conn.cursor()
+            try:
+                cur.execute(
+                    'SELECT UNIX_TIMESTAMP(expires_at), tag_versions, content_type, body FROM `response_cache` '
+                    'WHERE cache_key = %s AND expires_at > NOW()', (key,))
+                row = cur.fetchone()
+            finally:
+                cur.close()
+                conn.close()
+        except mysql.connector.Error as e:
+            logger.warning('Shared response cache read failed: %s', e)
+            return None
+        if row is None or row[1] != json.dumps(versions):
+            return None
+        return float(row[0]), versions, row[2], bytes(row[3])
+
+    def _shared_set(self, key, entry):
+        try:
+            conn = get_connection(MYSQL_DATABASE)
+            cur = conn.cursor()
+            try:
+                cur.execute(
+                    'REPLACE INTO `response_cache` (cache_key, tag_versions, content_type, body, expires_at) '
+                    'VALUES (%s, %s, %s, %s, FROM_UNIXTIME(%s))',
+                    (key, json.dumps(entry[1]), entry[2], entry[3], int(entry[0])))
+            finally:
+                cur.close()
+                conn.close()
+        except mysql.connector.Error as e:
+            logger.warning('Shared response cache write failed: %s', e)
+
+
+cache = ResponseCache()
+invalidate = cache.invalidate
+
+
+def _normalized_args():
+    """Query args as a stable string: sorted, stripped, empty values dropped."""
+    items = sorted((k, v.strip()) for k, v in request.args.items(multi=True) if v.strip())
+    return '&'.join(f'{k}={v}' for k, v in items)
+
+
+def cached(ttl, tags=(), key=None):
+    """Cache a GET view's 200 responses for `ttl` seconds, invalidated by `tags`.
+
+    key names the entry instead of the endpoint, for endpoints that return the same data.
+    """
+    tags = tuple(tags)
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not RESPONSE_CACHE_ENABLED or request.method != 'GET':
+                return view(*args, **kwargs)
+            name = key or request.endpoint
+            cache_key = f'{name}?{_normalized_args()}'
+            if kwargs:
+                cache_key += '|' + '&'.join(f'{k}={v}' for k, v in sorted(kwargs.items()))
+            # versions read before building, so a bump during the build is not stored as current
+            versions = cache.tag_versions(tags)
+            hit = cache.get(cache_key, versions)
+            if hit is not None:
+                content_type, body, result = hit
+                metrics.registry.inc('response_cache_requests_total', (name, result))
+                response = current_app.response_class(body, content_type=content_type)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+            metrics.registry.inc('response_cache_requests_total', (name, 'miss'))
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                cache.set(cache_key, versions, ttl, response.content_type, response.get_data())
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def invalidates(*tags):
+    """Bump `tags` after a non-GET request to this view succeeds (status < 400)."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            response = make_response(view(*args, **kwargs))
+            if request.method != 'GET' and response.status_code < 400:
+                invalidate(*tags)
+            return response
+        return wrapper
+    return decorator
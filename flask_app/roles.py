@@ -0,0 +1,88 @@
+"""Canonical user roles.
+
+users.user_type is whatever the registration form sent ('Collecter', 'Animal Food',
+'PMB', ...), so endpoints used to filter with LOWER(user_type) LIKE '%miller%' or
+Python substring checks, none of which can use an index.
+
+users.role is an ENUM holding the canonical role. BEFORE INSERT/UPDATE triggers
+derive it from user_type, so every write path keeps it current without touching
+the call sites, and the (role, district, id) index serves role filters, role +
+district filters and role counts. Queries filter on `role = %s` with a value from
+canonical(), which resolves any spelling in-process without a database round trip.
+"""
+import mysql.connector
+
+ROLES = ('farmer', 'collecter', 'miller', 'wholesaler', 'retailer', 'beer', 'animal_food', 'exporter', 'pmb', 'other')
+
+# (substring of the lower-cased user_type, role); first match wins, in the order
+# the endpoints used to test them
+_MATCHES = [
+    ('farmer', 'farmer'),
+    ('collect', 'collecter'),
+    ('miller', 'miller'),
+    ('wholesaler', 'wholesaler'),
+    ('retailer', 'retailer'),
+    ('exporter', 'exporter'),
+    ('beer', 'beer'),
+    ('brewer', 'beer'),
+    ('animal', 'animal_food'),
+    ('pmb', 'pmb'),
+]
+
+# every spelling seen so far -> role, seeded with the role names themselves
+_by_name = {role: role for role in ROLES}
+
+
+def canonical(name):
+    """Role for a user_type or request parameter ('Collector', 'MILLER', ...), or None."""
+    key = (name or '').strip().lower()
+    if not key:
+        return None
+    if key not in _by_name:
+        _by_name[key] = next((role for sub, role in _MATCHES if sub in key), None)
+    return _by_name[key]
+
+
+def _case_sql(column):
+    """SQL CASE expression mapping a user_type column to its role."""
+    whens = ' '.join(f"WHEN LOWER({column}) LIKE '%{sub}%' THEN '{role}'" for sub, role in _MATCHES)
+    return f"CASE {whens} ELSE 'other' END"
+
+
+_ENUM = ', '.join(f"'{role}'" for role in ROLES)
+
+# (name, CREATE TRIGGER statement)
+TRIGGERS = [
+    ('users_role_before_insert', f'''
+    CREATE TRIGGER `users_role_before_insert` BEFORE INSERT ON `users` FOR EACH ROW
+    SET NEW.role = {_case_sql('NEW.user_type')}
+    '''),
+    ('users_role_before_update', f'''
+    CREATE TRIGGER `users_role_before_update` BEFORE UPDATE ON `users` FOR EACH ROW
+    SET NEW.role = {_case_sql('NEW.user_type')}
+    '''),
+]
+
+
+def load(cur):
+    """Remember the role of every user_type already stored, so lookups never disagree with the table."""
+    cur.execute('SELECT DISTINCT LOWER(TRIM(user_type)), role FROM users')
+    for user_type, role in cur.fetchall():
+        if user_type:
+            _by_name[user_type] = role
+
+
+def install(cur):
+    """Add users.role and its index, (re)create the triggers and fill in existing rows."""
+    try:
+        cur.execute(f"ALTER TABLE `users` ADD COLUMN role ENUM({_ENUM}) NOT NULL DEFAULT 'other' AFTER user_type")
+    except mysql.connector.Error:
+        pass  # Column already exists
+    try:
+        cur.execute('ALTER TABLE `users` ADD INDEX role_district_id (role, district, id)')
+    except mysql.connector.Error:
+        pass  # Index already exists
+    for name, ddl in TRIGGERS:
+        cur.execute(f'DROP TRIGGER IF EXISTS `{name}`')
+        cur.execute(ddl)
+    cur.execute(f'UPDATE users SET role = {_case_sql("user_type")} WHERE role <> {_case_sql("user_type")}')
@@ -0,0 +1,66 @@
+// Page start-up data from GET /api/dashboard (see dashboard.py).
+//
+// startDashboard(role) requests, in one round trip, every widget the page
+// loads while it starts. dashboardFetch(url) works like fetch(): for a GET of
+// one of those widgets' URLs within DASHBOARD_FRESH_MS of the payload arriving
+// it answers from the payload, so the page's loaders keep their code and only
+// their first call is served locally, with the X-Next-Cursor of a paged widget
+// (see paging.js). Later reloads (after a save, a filter
+// change or a tab switch), other URLs and everything after a failed bootstrap
+// go to the network as before.
+(function () {
+  const DASHBOARD_FRESH_MS = 5000;
+  let bootstrap = null; // Promise of {normalized url: {body, cursor}}
+  let arrivedAt = 0;
+
+  function normalize(url) {
+    const u = new URL(url, window.location.origin);
+    const params = Array.from(u.searchParams.entries()).sort((a, b) =>
+      a[0] === b[0] ? (a[1] < b[1] ? -1 : 1) : a[0] < b[0] ? -1 : 1
+    );
+    return u.pathname + "?" + new URLSearchParams(params).toString();
+  }
+
+  window.startDashboard = function (role) {
+    bootstrap = fetch("/api/dashboard?role=" + encodeURIComponent(role))
+      .then((res) => (res.ok ? res.json() : null))
+      .then((payload) => {
+        const bodies = {};
+        if (payload && payload.urls) {
+          Object.keys(payload.widgets || {}).forEach((name) => {
+            if (payload.urls[name]) {
+              bodies[normalize(payload.urls[name])] = {
+                body: payload.widgets[name],
+                cursor: (payload.cursors || {})[name],
+              };
+            }
+          });
+        }
+        arrivedAt = Date.now();
+        return bodies;
+      })
+      .catch((e) => {
+        console.error("Could not load dashboard bootstrap", e);
+        return {};
+      });
+  };
+
+  window.dashboardFetch = async function (url, options) {
+    const method = ((options && options.method) || "GET").toUpperCase();
+    if (bootstrap && method === "GET") {
+      const bodies = await bootstrap;
+      const key = normalize(url);
+      if (key in bodies && Date.now() - arrivedAt < DASHBOARD_FRESH_MS) {
+        const headers = { "Content-Type": "application/json" };
+        if (bodies[key].cursor) {
+          headers["X-Next-Cursor"] = bodies[key].cursor;
+        }
+        return new Response(JSON.stringify(bodies[key].body), {
+          status: 200,
+          headers: headers,
+        });
+      }
+    }
+    return fetch(url, options);
+  };
+})();
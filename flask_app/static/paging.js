@@ -0,0 +1,35 @@
+// Keyset-paged GET endpoints (/api/transactions, /api/farmer_lookup, see keyset.py).
+//
+// Those endpoints return one page per request and set X-Next-Cursor when there
+// may be more. fetchAllPages(url) works like fetch() for a loader that needs
+// every row: it follows X-Next-Cursor, requesting url&cursor=... until the last
+// page, and answers with one response whose JSON body is all the pages' arrays
+// joined. Each request stays bounded on the server. A failed page is returned
+// as it is. `fetcher` (default fetch) makes the first request, so a dashboard
+// page can pass dashboardFetch and have its first page served from the bootstrap.
+(function () {
+  function withCursor(url, cursor) {
+    return url + (url.includes("?") ? "&" : "?") + "cursor=" + encodeURIComponent(cursor);
+  }
+
+  window.fetchAllPages = async function (url, fetcher) {
+    const first = await (fetcher || fetch)(url);
+    let cursor = first.ok ? first.headers.get("X-Next-Cursor") : null;
+    if (!cursor) {
+      return first;
+    }
+    const rows = await first.json();
+    while (cursor) {
+      const res = await fetch(withCursor(url, cursor));
+      if (!res.ok) {
+        return res;
+      }
+      rows.push(...(await res.json()));
+      cursor = res.headers.get("X-Next-Cursor");
+    }
+    return new Response(JSON.stringify(rows), {
+      status: 200,
+      headers: { "Content-Type": "application/json" },
+    });
+  };
+})();
@@ -0,0 +1,140 @@
+"""Paddy stock totals per (role, district, paddy_type), kept current by triggers.
+
+The dashboard endpoints used to SUM the whole `stock` table joined to `users` and
+GROUP BY LOWER(user_type) on every load. `stock_rollup` holds those sums instead.
+
+Triggers on `stock` apply each row change (insert, update, delete) to the rollup
+inside the statement that made it, so every stock write path (transactions,
+milling, damages, initial paddy, their reverts and user creation) stays covered
+without touching each call site, and a rolled-back transaction rolls the rollup
+back with it. Triggers on `users` move a user's stock when their role or
+district changes. Stock rows whose user does not exist are kept under role ''.
+
+role is the canonical users.role (see roles.py) and a NULL district or type is stored as ''.
+stock_rows counts the stock rows in a group, so readers can skip groups that a
+JOIN would not have produced (stock_rows = 0).
+"""
+
+CREATE_TABLE = '''
+CREATE TABLE IF NOT EXISTS `stock_rollup` (
+    role VARCHAR(50) NOT NULL,
+    district VARCHAR(128) NOT NULL,
+    paddy_type VARCHAR(128) NOT NULL,
+    amount DECIMAL(20,3) NOT NULL DEFAULT 0,
+    stock_rows INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (role, district, paddy_type),
+    INDEX (paddy_type)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+'''
+
+
+def _apply(user_id, paddy_type, amount, rows):
+    """SQL adding `amount`/`rows` for one stock row to its group (user looked up by id)."""
+    return f'''
+    INSERT INTO `stock_rollup` (role, district, paddy_type, amount, stock_rows)
+    SELECT COALESCE(u.role, ''), COALESCE(u.district, ''), COALESCE({paddy_type}, ''), COALESCE({amount}, 0), {rows}
+    FROM (SELECT 1) AS x LEFT JOIN users u ON u.id = {user_id}
+    ON DUPLICATE KEY UPDATE amount = `stock_rollup`.amount + VALUES(amount),
+                            stock_rows = `stock_rollup`.stock_rows + VALUES(stock_rows)'''
+
+
+def _move_user(user_id, role, district, sign):
+    """SQL adding (sign=1) or removing (sign=-1) all of a user's stock to/from a role/district."""
+    return f'''
+    INSERT INTO `stock_rollup` (role, district, paddy_type, amount, stock_rows)
+    SELECT {role}, {district}, COALESCE(s.`type`, ''), {sign} * COALESCE(SUM(s.amount), 0), {sign} * COUNT(*)
+    FROM `stock` s WHERE s.user_id = {user_id}
+    GROUP BY COALESCE(s.`type`, '')
+    ON DUPLICATE KEY UPDATE amount = `stock_rollup`.amount + VALUES(amount),
+                            stock_rows = `stock_rollup`.stock_rows + VALUES(stock_rows)'''
+
+
+_OLD_ROLE = 'OLD.role'
+_NEW_ROLE = 'NEW.role'
+
+# (name, CREATE TRIGGER statement)
+TRIGGERS = [
+    ('stock_rollup_after_insert', f'''
+    CREATE TRIGGER `stock_rollup_after_insert` AFTER INSERT ON `stock` FOR EACH ROW
+    {_apply('NEW.user_id', 'NEW.`type`', 'NEW.amount', 1)}
+    '''),
+    ('stock_rollup_after_update', f'''
+    CREATE TRIGGER `stock_rollup_after_update` AFTER UPDATE ON `stock` FOR EACH ROW
+    BEGIN
+        {_apply('OLD.user_id', 'OLD.`type`', '-OLD.amount', -1)};
+        {_apply('NEW.user_id', 'NEW.`type`', 'NEW.amount', 1)};
+    END
+    '''),
+    ('stock_rollup_after_delete', f'''
+    CREATE TRIGGER `stock_rollup_after_delete` AFTER DELETE ON `stock` FOR EACH ROW
+    {_apply('OLD.user_id', 'OLD.`type`', '-OLD.amount', -1)}
+    '''),
+    ('stock_rollup_user_after_insert', f'''
+    CREATE TRIGGER `stock_rollup_user_after_insert` AFTER INSERT ON `users` FOR EACH ROW
+    BEGIN
+        {_move_user('NEW.id', "''", "''", -1)};
+        {_move_user('NEW.id', _NEW_ROLE, "COALESCE(NEW.district, '')", 1)};
+    END
+    '''),
+    ('stock_rollup_user_after_update', f'''
+    CREATE TRIGGER `stock_rollup_user_after_update` AFTER UPDATE ON `users` FOR EACH ROW
+    BEGIN
+        IF NOT (OLD.id <=> NEW.id AND OLD.role <=> NEW.role AND OLD.district <=> NEW.district) THEN
+            {_move_user('OLD.id', _OLD_ROLE, "COALESCE(OLD.district, '')", -1)};
+            {_move_user('OLD.id', "''", "''", 1)};
+            {_move_user('NEW.id', "''", "''", -1)};
+            {_move_user('NEW.id', _NEW_ROLE, "COALESCE(NEW.district, '')", 1)};
+        END IF;
+    END
+    '''),
+    ('stock_rollup_user_after_delete', f'''
+    CREATE TRIGGER `stock_rollup_user_after_delete` AFTER DELETE ON `users` FOR EACH ROW
+    BEGIN
+        {_move_user('OLD.id', _OLD_ROLE, "COALESCE(OLD.district, '')", -1)};
+        {_move_user('OLD.id', "''", "''", 1)};
+    END
+    '''),
+]
+
+
+def install(cur):
+    """Create the rollup table and (re)create its triggers."""
+    cur.execute(CREATE_TABLE)
+    for name, ddl in TRIGGERS:
+        cur.execute(f'DROP TRIGGER IF EXISTS `{name}`')
+        cur.execute(ddl)
+
+
+def rebuild(cur):
+    """Recompute every group from `stock` (run inside a transaction)."""
+    cur.execute('DELETE FROM `stock_rollup`')
+    cur.execute('''
+        INSERT INTO `stock_rollup` (role, district, paddy_type, amount, stock_rows)
+        SELECT COALESCE(u.role, ''), COALESCE(u.district, ''), COALESCE(s.`type`, ''),
+               COALESCE(SUM(s.amount), 0), COUNT(*)
+        FROM `stock` s LEFT JOIN users u ON u.id = s.user_id
+        GROUP BY 1, 2, 3
+    ''')
+
+
+def totals(cur, group_by, paddy_type=None, users_only=True):
+    """SUM(amount) per `group_by` columns (subset of role, district, paddy_type).
+
+    Returns a list of tuples (*group values, amount). users_only leaves out stock
+    rows without a matching user, like the old JOIN users did.
+    """
+    columns = ', '.join(group_by)
+    where = ['stock_rows > 0']
+    params = []
+    if users_only:
+        where.append("role <> ''")
+    if paddy_type:
+        where.append('paddy_type = %s')
+        params.append(paddy_type)
+    cur.execute(
+        f'SELECT {columns}, SUM(amount) FROM `stock_rollup` WHERE {" AND ".join(where)} '
+        f'GROUP BY {columns} ORDER BY {columns}',
+        params
+    )
+    return cur.fetchall()
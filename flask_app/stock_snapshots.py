@@ -0,0 +1,261 @@
+"""Daily closing paddy balances per (role, paddy_type) for /api/stock_history.
+
+`stock_daily` holds one row per day, role and paddy type. Every snapshot day
+carries the full set of groups, so a day without a row simply has the closing
+balance of the previous snapshot day. The PRIMARY KEY (day, role, paddy_type)
+and the (paddy_type, day, role, closing_amount) index both cover the history
+query, so reading a range never touches the base tables.
+
+A background worker copies the current totals from `stock_rollup` into today's
+row every SNAPSHOT_INTERVAL seconds and once more just before midnight. backfill()
+reconstructs the days before the first snapshot by replaying the transaction,
+milling, damage and initial_paddy tables backwards from it.
+"""
+import datetime
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+import mysql.connector
+
+from db import MYSQL_DATABASE, get_connection
+
+logger = logging.getLogger(__name__)
+
+# seconds between snapshots of today's balances
+SNAPSHOT_INTERVAL = float(os.environ.get('STOCK_SNAPSHOT_INTERVAL', 900))
+# longest range /api/stock_history will serve, in days
+MAX_HISTORY_DAYS = int(os.environ.get('STOCK_HISTORY_MAX_DAYS', 3660))
+
+CREATE_TABLE = '''
+CREATE TABLE IF NOT EXISTS `stock_daily` (
+    day DATE NOT NULL,
+    role VARCHAR(50) NOT NULL,
+    paddy_type VARCHAR(128) NOT NULL,
+    closing_amount DECIMAL(20,3) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, role, paddy_type),
+    INDEX paddy_day (paddy_type, day, role, closing_amount)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+'''
+
+_UPSERT = (
+    'INSERT INTO `stock_daily` (day, role, paddy_type, closing_amount) VALUES (%s, %s, %s, %s) '
+    'ON DUPLICATE KEY UPDATE closing_amount = VALUES(closing_amount)'
+)
+
+
+def create_table(cur):
+    cur.execute(CREATE_TABLE)
+
+
+def snapshot(day=None):
+    """Write the current rollup totals as the closing balances of `day` (default today)."""
+    day = day or datetime.date.today()
+    conn = get_connection(MYSQL_DATABASE)
+    cur = conn.cursor()
+    try:
+        conn.start_transaction()
+        # every group is written, including empty ones, so the day is complete on its own
+        cur.execute(
+            "INSERT INTO `stock_daily` (day, role, paddy_type, closing_amount) "
+            "SELECT %s, role, paddy_type, SUM(amount) FROM `stock_rollup` WHERE role <> '' "
+            "GROUP BY role, paddy_type "
+            "ON DUPLICATE KEY UPDATE closing_amount = VALUES(closing_amount)",
+            (day,)
+        )
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _pair_reversals(rows, key):
+    """Split rows flagged as reverted into (originals, reversals).
+
+    A revert flips the original row's flag and inserts a reversal row with the
+    same flag, so flagged rows with the same key come in pairs; in time order the
+    first of each pair is the original.
+    """
+    originals, reversals = [], []
+    seen = defaultdict(int)
+    for row in sorted(rows, key=lambda r: (r['created_at'], r['id'])):
+        k = key(row)
+        (originals if seen[k] % 2 == 0 else reversals).append(row)
+        seen[k] += 1
+    return originals, reversals
+
+
+def _daily_deltas(cur):
+    """Net paddy stock change per (day, role, paddy_type), replayed from the history tables."""
+    cur.execute("SELECT id, role FROM users")
+    roles = {str(r['id']): r['role'] for r in cur.fetchall()}
+    deltas = defaultdict(float)
+
+    def move(when, user_id, paddy_type, amount):
+        role = roles.get(str(user_id))
+        if role and when:
+            day = when.date() if isinstance(when, datetime.datetime) else when
+            deltas[(day, role, paddy_type or '')] += float(amount or 0)
+
+    # transaction: recipient gains, a non-farmer sender loses; a revert (status 0) does the opposite
+    cur.execute('SELECT id, `from`, `to`, `type`, quantity, status, created_at FROM `transaction`')
+    rows = cur.fetchall()
+    flagged = [r for r in rows if r['status'] == 0]
+    originals, reversals = _pair_reversals(flagged, lambda r: (r['from'], r['to'], r['type'], r['quantity']))
+    for r, sign in [(r, 1) for r in rows if r['status'] != 0] + [(r, 1) for r in originals] + [(r, -1) for r in reversals]:
+        move(r['created_at'], r['to'], r['type'], sign * r['quantity'])
+        if roles.get(str(r['from'])) != 'farmer':
+            move(r['created_at'], r['from'], r['type'], -sign * r['quantity'])
+
+    # milling consumes the miller's paddy; a revert (status 0 pair) gives it back
+    cur.execute('SELECT id, miller_id, paddy_type, input_paddy, output_rice, milling_date, status, created_at FROM `milling`')
+    rows = cur.fetchall()
+    flagged = [r for r in rows if not r['status']]
+    originals, reversals = _pair_reversals(
+        flagged, lambda r: (r['miller_id'], r['paddy_type'], r['input_paddy'], r['output_rice'], r['milling_date']))
+    for r, sign in [(r, 1) for r in rows if r['status']] + [(r, 1) for r in originals] + [(r, -1) for r in reversals]:
+        move(r['created_at'], r['miller_id'], r['paddy_type'], -sign * r['input_paddy'])
+
+    # damage deducts stock; reversal rows carry reason 'revert' and restore it
+    cur.execute('SELECT user_id, paddy_type, quantity, reason, created_at FROM `damage`')
+    for r in cur.fetchall():
+        sign = -1 if r['reason'] == 'revert' else 1
+        move(r['created_at'], r['user_id'], r['paddy_type'], -sign * r['quantity'])
+
+    # initial paddy adds stock; a revert (reverted = 1 pair) deducts it again
+    cur.execute('SELECT id, user_id, paddy_type, quantity, reverted, created_at FROM `initial_paddy`')
+    rows = cur.fetchall()
+    flagged = [r for r in rows if r['reverted']]
+    originals, reversals = _pair_reversals(flagged, lambda r: (r['user_id'], r['paddy_type'], r['quantity']))
+    for r, sign in [(r, 1) for r in rows if not r['reverted']] + [(r, 1) for r in originals] + [(r, -1) for r in reversals]:
+        move(r['created_at'], r['user_id'], r['paddy_type'], sign * r['quantity'])
+
+    return deltas
+
+
+def backfill():
+    """Fill the days before the first snapshot. Returns the number of days written.
+
+    Starts from the earliest snapshot's balances (taking one for today if the
+    table is empty) and walks back one day at a time, undoing that day's replayed
+    movements, so the reconstructed history always ends exactly at a real
+    snapshot. Stock edits that left no history row (e.g. PUT on a transaction)
+    are only reflected from the first snapshot on.
+    """
+    conn = get_connection(MYSQL_DATABASE)
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute('SELECT MIN(day) AS day FROM `stock_daily`')
+        anchor = cur.fetchone()['day']
+        if anchor is None:
+            snapshot()
+            anchor = datetime.date.today()
+        cur.execute('SELECT role, paddy_type, closing_amount FROM `stock_daily` WHERE day = %s', (anchor,))
+        balances = {(r['role'], r['paddy_type']): float(r['closing_amount']) for r in cur.fetchall()}
+
+        deltas = _daily_deltas(cur)
+        first_day = min((day for day, _, _ in deltas), default=anchor)
+        by_day = defaultdict(dict)
+        for (day, role, paddy_type), amount in deltas.items():
+            by_day[day][(role, paddy_type)] = amount
+
+        rows = []
+        day = anchor
+        while day > first_day:
+            for group, amount in by_day.get(day, {}).items():
+                balances[group] = balances.get(group, 0.0) - amount
+            day -= datetime.timedelta(days=1)
+            rows.extend((day, role, paddy_type, round(amount, 3)) for (role, paddy_type), amount in balances.items())
+
+        conn.start_transaction()
+        for i in range(0, len(rows), 1000):
+            cur.executemany(_UPSERT, rows[i:i + 1000])
+        conn.commit()
+        return (anchor - first_day).days if anchor > first_day else 0
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+def history(cur, start, end, paddy_type=None):
+    """Closing balance per role for every day in [start, end].
+
+    Returns {day: {role: amount}}; days before the first snapshot are absent.
+    """
+    type_filter = ' AND paddy_type = %s' if paddy_type else ''
+    type_params = (paddy_type,) if paddy_type else ()
+    # latest snapshot day at or before start, so a gap at the beginning is carried forward
+    cur.execute(f'SELECT MAX(day) FROM `stock_daily` WHERE day <= %s{type_filter}', (start,) + type_params)
+    first = cur.fetchone()[0] or start
+    cur.execute(
+        f'SELECT day, role, SUM(closing_amount) FROM `stock_daily` '
+        f'WHERE day BETWEEN %s AND %s{type_filter} GROUP BY day, role ORDER BY day',
+        (first, end) + type_params
+    )
+    snapshots = defaultdict(dict)
+    for day, role, amount in cur.fetchall():
+        snapshots[day][role] = float(amount or 0)
+
+    out = {}
+    current = None
+    day = first
+    while day <= end:
+        if day in snapshots:
+            current = snapshots[day]
+        if current is not None and day >= start:
+            out[day] = current
+        day += datetime.timedelta(days=1)
+    return out
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _seconds_to_midnight():
+    now = datetime.datetime.now()
+    tomorrow = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+    return (tomorrow - now).total_seconds()
+
+
+def _run():
+    while True:
+        try:
+            snapshot()
+        except mysql.connector.Error as e:
+            logger.error('Stock snapshot database error: %s', e)
+        except Exception as e:
+            logger.error('Stock snapshot error: %s', e)
+        # wake up just before midnight so the day's closing balance is captured
+        remaining = _seconds_to_midnight()
+        time.sleep(min(SNAPSHOT_INTERVAL, remaining - 5) if remaining > 10 else remaining + 1)
+
+
+def ensure_worker():
+    """Start the background snapshot thread once per process."""
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='stock-snapshots', daemon=True)
+            _worker.start()
+
+
+if __name__ == '__main__':
+    # `python stock_snapshots.py` rebuilds history before the first snapshot
+    print('Backfilled', backfill(), 'days')
@@ -0,0 +1,75 @@
+"""Fixtures for query-plan tests, which need a MySQL server and skip without one.
+
+Each test copies the tables it explains into TEMPORARY tables with the same
+columns and indexes, fills them with synthetic rows and runs EXPLAIN against the
+copies, so the plans come from realistic row counts and no real data is touched.
+"""
+import os
+import re
+import sys
+
+import mysql.connector
+import pytest
+
+# the app's modules are imported top-level, as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def mysql_cur():
+    """Dictionary cursor on a fresh, unpooled connection to the app database."""
+    try:
+        conn = mysql.connector.connect(
+            host=db.MYSQL_HOST, port=db.MYSQL_PORT, user=db.MYSQL_USER,
+            password=db.MYSQL_PASSWORD, database=db.MYSQL_DATABASE, autocommit=True,
+            connection_timeout=3)
+    except mysql.connector.Error as e:
+        pytest.skip(f'MySQL not available: {e}')
+    cur = conn.cursor(dictionary=True, buffered=True)
+    yield cur
+    cur.close()
+    conn.close()
+
+
+@pytest.fixture
+def app_module(mysql_cur):
+    """The app module, so tests explain the SQL its query builders produce."""
+    try:
+        import app
+    except Exception as e:  # chain settings missing, etc.
+        pytest.skip(f'app not importable: {e}')
+    return app
+
+
+class Capture:
+    """Cursor stand-in that records the last statement instead of running it."""
+
+    def execute(self, sql, params=()):
+        self.sql, self.params = sql, params
+
+    def fetchall(self):
+        return []
+
+
+def shadow(cur, table, columns, rows):
+    """Replace `table` for this session with an indexed TEMPORARY copy holding `rows`."""
+    try:
+        cur.execute(f'SHOW CREATE TABLE `{table}`')
+    except mysql.connector.Error as e:
+        pytest.skip(f'{table} missing, run the migrations first: {e}')
+    ddl = cur.fetchone()['Create Table']
+    # InnoDB temporary tables cannot hold FULLTEXT indexes; none of the explained queries use one
+    ddl = re.sub(r',\s*FULLTEXT KEY[^\n]*', '', ddl)
+    cur.execute(ddl.replace('CREATE TABLE', 'CREATE TEMPORARY TABLE', 1))
+    names = ', '.join(f'`{c}`' for c in columns)
+    cur.executemany(
+        f'INSERT INTO `{table}` ({names}) VALUES ({", ".join(["%s"] * len(columns))})', rows)
+    cur.execute(f'ANALYZE TABLE `{table}`')
+
+
+def explain(cur, sql, params=()):
+    """EXPLAIN rows of `sql`, keyed by table alias."""
+    cur.execute('EXPLAIN ' + sql, tuple(params))
+    return {row['table']: row for row in cur.fetchall()}
@@ -0,0 +1,61 @@
+"""History queries filter on the raw date columns, so a window is an index range (see date_window.py)."""
+import datetime
+
+import pytest
+
+from conftest import Capture, explain, shadow
+
+START = datetime.datetime(2023, 1, 1, 8, 0)
+DAYS = 600
+# ten days out of DAYS: narrow enough that a range read beats a scan
+WINDOW = {'from_date': '2024-03-01', 'to_date': '2024-03-10'}
+
+
+def _when(n):
+    return START + datetime.timedelta(days=n % DAYS, minutes=n % 97)
+
+
+@pytest.fixture
+def history_app(mysql_cur, app_module):
+    # the queries LEFT JOIN users for names
+    shadow(mysql_cur, 'users', ('id', 'user_type', 'role', 'full_name'),
+           [(f'FAR{n}', 'Farmer', 'farmer', f'Farmer {n}') for n in range(200)]
+           + [(f'MIL{n}', 'Miller', 'miller', f'Miller {n}') for n in range(20)])
+    return app_module
+
+
+def test_rice_transactions_window_is_a_datetime_range(mysql_cur, history_app):
+    shadow(mysql_cur, 'rice_transaction', ('from', 'to', 'rice_type', 'quantity', 'datetime'),
+           [(f'MIL{n % 20}', f'FAR{n % 200}', 'Samba', 10, _when(n)) for n in range(6000)])
+    sql, params = history_app._rice_transactions_query(WINDOW)
+    plan = explain(mysql_cur, sql, params)['rt']
+    assert (plan['type'], plan['key']) == ('range', 'datetime_id')
+
+
+def test_damage_lookup_window_is_a_damage_date_range(mysql_cur, history_app):
+    shadow(mysql_cur, 'damage', ('user_id', 'paddy_type', 'quantity', 'reason', 'damage_date'),
+           [(f'FAR{n % 200}', 'Samba', n % 50, 'rain', _when(n)) for n in range(6000)])
+    sql, params = history_app._damage_lookup_query({'date_from': WINDOW['from_date'], 'date_to': WINDOW['to_date']})
+    plan = explain(mysql_cur, sql, params)['d']
+    assert (plan['type'], plan['key']) == ('range', 'damage_date')
+
+
+def test_milling_window_is_a_milling_date_range(mysql_cur, history_app):
+    shadow(mysql_cur, 'milling', ('miller_id', 'paddy_type', 'input_paddy', 'output_rice', 'milling_date'),
+           [(f'MIL{n % 20}', 'Samba', 100, 65, _when(n).date()) for n in range(6000)])
+    sql, params = history_app._milling_query(mysql_cur, WINDOW)
+    plan = explain(mysql_cur, sql, params)['m']
+    assert (plan['type'], plan['key']) == ('range', 'milling_date')
+
+
+def test_farmer_lookup_page_is_a_from_datetime_range(mysql_cur, history_app):
+    shadow(mysql_cur, 'transaction', ('from', 'to', 'type', 'quantity', 'status', 'datetime'),
+           [(f'FAR{n % 200}', f'MIL{n % 20}', 'Samba', 10, 1, _when(n)) for n in range(6000)])
+    # the same page query api_farmer_lookup builds for one farmer and a window
+    window = history_app.date_window.parse({'date_from': WINDOW['from_date'], 'date_to': WINDOW['to_date']})
+    cond, cond_params = history_app.date_window.predicate('t.`datetime`', window)
+    where = "t.`from` = %s AND t.`type` IS NOT NULL AND t.`type` <> '' AND " + cond
+    capture = Capture()
+    history_app.keyset.page(capture, [('paddy', 'transaction', 't', where, ['FAR7'] + cond_params)], None, 200)
+    plan = explain(mysql_cur, capture.sql, capture.params)['t']
+    assert (plan['type'], plan['key']) == ('range', 'from_datetime')
@@ -0,0 +1,45 @@
+"""Role filters are served from users.role_district_id (see roles.py).
+
+/api/users/by_type answers from the in-process user_directory cache, so it sends
+no per-request role query; the queries below are the ones that do.
+"""
+import pytest
+
+from conftest import Capture, explain, shadow
+
+import roles
+
+DISTRICTS = [f'District {n}' for n in range(25)]
+
+
+@pytest.fixture
+def users(mysql_cur):
+    # mostly farmers, as in production; every other role a few percent
+    others = [role for role in roles.ROLES if role != 'farmer']
+    rows = []
+    for n in range(4000):
+        role = 'farmer' if n % 10 < 7 else others[n % len(others)]
+        rows.append((f'U{n:05d}', role, role, DISTRICTS[n % len(DISTRICTS)], f'User {n}'))
+    shadow(mysql_cur, 'users', ('id', 'user_type', 'role', 'district', 'full_name'), rows)
+    return mysql_cur
+
+
+def test_users_by_role_uses_index(users, app_module):
+    sql, params = app_module._users_query({'user_type': 'Miller'})
+    plan = explain(users, sql, params)
+    assert plan['users']['key'] == 'role_district_id'
+    assert plan['users']['type'] == 'ref'
+
+
+def test_miller_lookup_reads_from_index(users, app_module):
+    # the miller filter of /api/milling resolves ids first; one character takes the LIKE path
+    capture = Capture()
+    app_module._milling_query(capture, {'miller_id': 'U'})
+    plan = explain(users, capture.sql, capture.params)
+    assert plan['users']['key'] == 'role_district_id'
+    assert plan['users']['type'] == 'ref'
+
+
+def test_stats_count_per_role_uses_index(users, app_module):
+    plan = explain(users, app_module._ROLE_COUNTS_SQL)
+    assert plan['users']['key'] == 'role_district_id'
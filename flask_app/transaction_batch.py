@@ -0,0 +1,235 @@
+"""Batched transfers (POST /api/transactions/bulk).
+
+Each item is the body POST /api/transactions takes ({from, to, type, quantity,
+datetime, price, status, original_transaction_id}) and is applied with the same
+rules: farmers have no sender stock, rice moves between `rice_stock` rows when
+the sender is a miller/PMB/wholesaler/retailer, and a revert (status 0) moves
+stock back.
+
+A batch is one database transaction:
+  1. every stock row the batch touches is locked with one SELECT ... FOR UPDATE
+     per table, ordered by (user_id, type), so two batches touching the same
+     rows lock them in the same order and cannot deadlock each other; the
+     (user_id, type) / (miller_id, paddy_type) indexes make that a lookup of
+     exactly those rows, walked in key order;
+  2. items are checked in request order against the locked balances; an item
+     that fails (bad fields, insufficient stock) is reported and left out, the
+     others go ahead (or nothing is written when atomic is set);
+  3. the deltas are netted per stock row and written with one UPDATE per row
+     (new rows with one INSERT), and the transaction rows and their outbox
+     entries are inserted with executemany.
+"""
+import os
+
+import mysql.connector
+
+import outbox
+import user_directory
+
+# largest accepted batch
+BATCH_MAX_ITEMS = int(os.environ.get('TRANSACTION_BATCH_MAX_ITEMS', 1000))
+
+# stock table -> (user column, type column, amount column)
+STOCK_TABLES = {
+    'stock': ('user_id', '`type`', 'amount'),
+    'rice_stock': ('miller_id', 'paddy_type', 'quantity'),
+}
+
+_INSERT = {
+    'transaction': 'INSERT INTO `transaction` (`from`, `to`, `type`, quantity, price, status, `datetime`) '
+                   'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+    'rice_transaction': 'INSERT INTO `rice_transaction` (`from`, `to`, rice_type, quantity, price, reverted, `datetime`) '
+                        'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+}
+
+_MARK_REVERTED = {
+    'transaction': 'UPDATE `transaction` SET status = 0 WHERE id = %s',
+    'rice_transaction': 'UPDATE `rice_transaction` SET reverted = 1 WHERE id = %s',
+}
+
+
+class ItemError(Exception):
+    pass
+
+
+def _parse(item):
+    """Normalised item, or ItemError; the same checks api_add_transaction makes."""
+    if not isinstance(item, dict):
+        raise ItemError('item must be an object')
+    from_val, to_val, ttype, quantity = item.get('from'), item.get('to'), item.get('type'), item.get('quantity')
+    if from_val is None or to_val is None or not ttype or quantity is None:
+        raise ItemError('Missing required fields (from,to,type,quantity)')
+    try:
+        qty = float(quantity)
+    except (TypeError, ValueError):
+        raise ItemError('Invalid quantity')
+    try:
+        price = round(float(item.get('price') or 0.0), 2)
+    except (TypeError, ValueError):
+        raise ItemError('Invalid price')
+    status = item.get('status', 1)
+    original = item.get('original_transaction_id')
+    if original is not None:
+        try:
+            # ids may come prefixed, e.g. 'srv-8'
+            original = int(str(original).split('-')[-1])
+        except ValueError:
+            raise ItemError('Invalid original_transaction_id')
+
+    sender_type = (user_directory.user_type(from_val) or '').strip().lower()
+    is_rice = any(t in sender_type for t in ('miller', 'pmb', 'wholesaler', 'retailer'))
+    return {
+        'from': str(from_val), 'to': str(to_val), 'type': ttype, 'quantity': qty, 'price': price,
+        'datetime': item.get('datetime'), 'revert': status == 0, 'original': original,
+        'sender_has_stock': not sender_type.startswith('farmer'),
+        'stock_table': 'rice_stock' if is_rice else 'stock',
+        'table': 'rice_transaction' if is_rice else 'transaction',
+    }
+
+
+def _lock(cur, table, keys):
+    """Lock the stock rows for (user_id, type) keys; returns {key: [row id, amount]}."""
+    user_col, type_col, amount_col = STOCK_TABLES[table]
+    keys = sorted(keys)
+    rows = {}
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        cur.execute(
+            f'SELECT id, {user_col}, {type_col}, {amount_col} FROM `{table}` '
+            f'WHERE ({user_col}, {type_col}) IN ({", ".join(["(%s, %s)"] * len(chunk))}) '
+            f'ORDER BY {user_col}, {type_col}, id FOR UPDATE',
+            [v for key in chunk for v in key]
+        )
+        for row_id, user_id, ttype, amount in cur.fetchall():
+            # like the single endpoint, the first row of a (user, type) is the one used
+            rows.setdefault(_fold((user_id, ttype)), [row_id, float(amount or 0)])
+    # keys as the caller gave them; the columns compare case-insensitively
+    return {key: rows[_fold(key)] for key in keys if _fold(key) in rows}
+
+
+def _fold(key):
+    return tuple(str(v).casefold() for v in key)
+
+
+def _apply(item, balances):
+    """Check one item against the running balances; returns its stock deltas or raises ItemError."""
+    table, qty, ttype = item['stock_table'], item['quantity'], item['type']
+    noun = 'rice stock' if table == 'rice_stock' else 'stock'
+    deltas = []
+    if item['sender_has_stock']:
+        key = (table, item['from'], ttype)
+        if not item['revert']:
+            if key not in balances:
+                raise ItemError(f'Insufficient {noun}: sender has no {noun} for this type')
+            if balances[key] < qty:
+                raise ItemError(f'Insufficient {noun}: sender balance is lower than requested quantity')
+        deltas.append((key, qty if item['revert'] else -qty))
+    key = (table, item['to'], ttype)
+    if item['revert']:
+        if key not in balances:
+            raise ItemError(f'Cannot revert: recipient has no {noun} for this type to deduct from')
+        if balances[key] - qty < 0:
+            raise ItemError(f'Cannot revert: recipient has insufficient {noun} to deduct from')
+    deltas.append((key, -qty if item['revert'] else qty))
+    # a sender and recipient can be the same row; apply both before the next item
+    for key, delta in deltas:
+        balances[key] = balances.get(key, 0.0) + delta
+    return deltas
+
+
+def run(conn, items, atomic=False):
+    """Apply a batch on `conn`; returns (results, outbox ids). Commits, or rolls back on error."""
+    results = [{'index': i, 'ok': False} for i in range(len(items))]
+    parsed = {}
+    for i, item in enumerate(items):
+        try:
+            parsed[i] = _parse(item)
+        except ItemError as e:
+            results[i]['error'] = str(e)
+    if atomic and len(parsed) < len(items):
+        return results, []
+
+    cur = conn.cursor(buffered=True)
+    try:
+        conn.start_transaction()
+        keys = {'stock': set(), 'rice_stock': set()}
+        for item in parsed.values():
+            keys[item['stock_table']].add((item['to'], item['type']))
+            if item['sender_has_stock']:
+                keys[item['stock_table']].add((item['from'], item['type']))
+        locked = {}  # (table, user_id, type) -> [row id, amount as locked]
+        for table in sorted(keys):
+            if keys[table]:
+                for (user_id, ttype), row in _lock(cur, table, keys[table]).items():
+                    locked[(table, user_id, ttype)] = row
+
+        balances = {key: row[1] for key, row in locked.items()}
+        net = {}
+        accepted = []
+        for i in sorted(parsed):
+            try:
+                deltas = _apply(parsed[i], balances)
+            except ItemError as e:
+                results[i]['error'] = str(e)
+                continue
+            for key, delta in deltas:
+                net[key] = net.get(key, 0.0) + delta
+            accepted.append(i)
+        if atomic and len(accepted) < len(items):
+            conn.rollback()
+            return results, []
+
+        # one write per stock row, whatever the number of items that touched it
+        for table, (user_col, type_col, amount_col) in STOCK_TABLES.items():
+            updates = [(delta, locked[key][0]) for key, delta in sorted(net.items())
+                       if key[0] == table and key in locked and delta != 0]
+            inserts = [(key[1], key[2], delta) for key, delta in sorted(net.items())
+                       if key[0] == table and key not in locked]
+            if updates:
+                cur.executemany(
+                    f'UPDATE `{table}` SET {amount_col} = {amount_col} + %s, updated_at = CURRENT_TIMESTAMP '
+                    'WHERE id = %s', updates)
+            if inserts:
+                cur.executemany(
+                    f'INSERT INTO `{table}` ({user_col}, {type_col}, {amount_col}) VALUES (%s, %s, %s)', inserts)
+
+        outbox_ids = []
+        for table in ('transaction', 'rice_transaction'):
+            batch = [i for i in accepted if parsed[i]['table'] == table]
+            if not batch:
+                continue
+            cur.executemany(_INSERT[table], [
+                (parsed[i]['from'], parsed[i]['to'], parsed[i]['type'], parsed[i]['quantity'], parsed[i]['price'],
+                 (1 if parsed[i]['revert'] else 0) if table == 'rice_transaction' else (0 if parsed[i]['revert'] else 1),
+                 parsed[i]['datetime'])
+                for i in batch
+            ])
+            # executemany sends one multi-row INSERT; InnoDB gives a simple insert consecutive ids
+            first_id = cur.lastrowid
+            payloads = []
+            for offset, i in enumerate(batch):
+                item = parsed[i]
+                results[i].update({'ok': True, 'id': first_id + offset, 'table': table})
+                payloads.append((first_id + offset, {
+                    'from': item['from'], 'to': item['to'], 'type': item['type'], 'quantity': item['quantity'],
+                    'price': item['price'], 'status': 0 if item['revert'] else 1,
+                }))
+            first_outbox_id = outbox.enqueue_many(cur, table, payloads)
+            for offset, i in enumerate(batch):
+                results[i]['outbox_id'] = first_outbox_id + offset
+                outbox_ids.append(first_outbox_id + offset)
+
+            originals = [(parsed[i]['original'],) for i in batch if parsed[i]['revert'] and parsed[i]['original']]
+            if originals:
+                cur.executemany(_MARK_REVERTED[table], originals)
+
+        conn.commit()
+        return results, outbox_ids
+    except mysql.connector.Error:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    finally:
+        cur.close()
@@ -0,0 +1,163 @@
+"""In-process directory of users: id, type, role, names, district and contact.
+
+Endpoints that only need a user's type or name (transaction, damage and revert
+handlers, /api/users/<id>, /api/users/by_type) read it from here instead of
+querying `users` each time. Users change rarely, so the whole table is kept as
+compact records keyed by id, with secondary maps by role and by district.
+
+Coherence across worker processes: triggers on `users` bump the single row of
+`user_directory_version` on every insert and delete, and on updates that change
+one of the cached columns (not, say, a wallet or chain-status write, which would
+make every process reload the whole table for nothing). A process compares
+that number with the one it loaded at most every CHECK_INTERVAL seconds (one
+primary-key read) and reloads when it changed. api_add_user/api_update_user call
+invalidate() so the writing process sees its own change at once, and a lookup
+for an unknown id checks the version before reporting the user missing. An id
+still missing after that check is remembered until the version changes, so
+repeated lookups of a bad id do not query the database each time.
+"""
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+import mysql.connector
+
+from db import MYSQL_DATABASE, get_connection
+
+logger = logging.getLogger(__name__)
+
+# seconds between version checks
+CHECK_INTERVAL = float(os.environ.get('USER_DIRECTORY_CHECK_INTERVAL', 5))
+# unknown ids remembered per version; the set is emptied when it grows past this
+MISSING_MAX = int(os.environ.get('USER_DIRECTORY_MISSING_MAX', 10000))
+
+User = namedtuple('User', 'id user_type role full_name company_name district contact_number address')
+
+CREATE_TABLE = '''
+CREATE TABLE IF NOT EXISTS `user_directory_version` (
+    id TINYINT NOT NULL PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+'''
+
+_BUMP = 'UPDATE `user_directory_version` SET version = version + 1 WHERE id = 1'
+
+# true when an update leaves every cached column as it was (NULL-safe)
+_UNCHANGED = ' AND '.join(f'OLD.`{col}` <=> NEW.`{col}`' for col in User._fields)
+
+# (name, CREATE TRIGGER statement)
+TRIGGERS = [
+    ('user_directory_after_insert',
+     f'CREATE TRIGGER `user_directory_after_insert` AFTER INSERT ON `users` FOR EACH ROW {_BUMP}'),
+    ('user_directory_after_update',
+     f'CREATE TRIGGER `user_directory_after_update` AFTER UPDATE ON `users` FOR EACH ROW '
+     f'BEGIN IF NOT ({_UNCHANGED}) THEN {_BUMP}; END IF; END'),
+    ('user_directory_after_delete',
+     f'CREATE TRIGGER `user_directory_after_delete` AFTER DELETE ON `users` FOR EACH ROW {_BUMP}'),
+]
+
+
+def install(cur):
+    """Create the version row and the triggers that bump it."""
+    cur.execute(CREATE_TABLE)
+    cur.execute('INSERT IGNORE INTO `user_directory_version` (id, version) VALUES (1, 0)')
+    for name, ddl in TRIGGERS:
+        cur.execute(f'DROP TRIGGER IF EXISTS `{name}`')
+        cur.execute(ddl)
+
+
+class UserDirectory:
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._version = None  # None = not loaded / invalidated
+        self._checked_at = 0.0
+        self._by_id = {}
+        self._by_role = {}
+        self._by_district = {}
+        self._missing = set()  # ids not found at the loaded version
+
+    def invalidate(self):
+        """Drop the loaded data; the next lookup reloads it."""
+        with self._lock:
+            self._version = None
+
+    def _load(self, cur):
+        cur.execute('SELECT version FROM `user_directory_version` WHERE id = 1')
+        row = cur.fetchone()
+        version = row[0] if row else 0
+        if version == self._version:
+            return
+        cur.execute('SELECT id, user_type, role, full_name, company_name, district, contact_number, address FROM users')
+        by_id, by_role, by_district = {}, {}, {}
+        for r in cur.fetchall():
+            user = User(*r)
+            by_id[str(user.id)] = user
+            by_role.setdefault(user.role, []).append(user)
+            by_district.setdefault(user.district or '', []).append(user)
+        # swap whole maps so readers never see a half-built directory
+        self._by_id, self._by_role, self._by_district = by_id, by_role, by_district
+        self._missing = set()
+        self._version = version
+
+    def refresh(self, force=False):
+        """Reload if the stored version moved; checks at most every check_interval unless forced."""
+        now = time.monotonic()
+        if not force and self._version is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if not force and self._version is not None and now - self._checked_at < self.check_interval:
+                return
+            try:
+                conn = get_connection(MYSQL_DATABASE)
+                cur = conn.cursor()
+                try:
+                    self._load(cur)
+                finally:
+                    cur.close()
+                    conn.close()
+                self._checked_at = time.monotonic()
+            except mysql.connector.Error as e:
+                # keep serving what we have; an empty directory makes callers fall back to defaults
+                logger.warning('User directory refresh failed: %s', e)
+
+    def get(self, user_id):
+        """User record for `user_id`, or None."""
+        if user_id is None:
+            return None
+        self.refresh()
+        user_id = str(user_id)
+        user = self._by_id.get(user_id)
+        if user is None and user_id not in self._missing:
+            # it may have been added by another process since the last check
+            self.refresh(force=True)
+            user = self._by_id.get(user_id)
+            if user is None and self._version is not None:
+                missing = self._missing
+                if len(missing) >= MISSING_MAX:
+                    missing.clear()
+                missing.add(user_id)
+        return user
+
+    def user_type(self, user_id):
+        user = self.get(user_id)
+        return user.user_type if user else None
+
+    def by_role(self, role):
+        self.refresh()
+        return list(self._by_role.get(role, ()))
+
+    def by_district(self, district):
+        self.refresh()
+        return list(self._by_district.get(district or '', ()))
+
+
+directory = UserDirectory()
+
+get = directory.get
+user_type = directory.user_type
+by_role = directory.by_role
+by_district = directory.by_district
+invalidate = directory.invalidate
@@ -0,0 +1,178 @@
+"""Bulk user onboarding (POST /api/users/bulk).
+
+Rows come as CSV (header row) or JSON lines with the same field names the
+single-user form posts: userType, nic, fullName, companyRegisterNumber,
+companyName, address, district, contactNumber, totalAreaOfPaddyLand.
+
+All rows are validated up front, including one query for NICs that are
+already registered. Ids are reserved per user type as one range (see
+id_sequence). Users are then inserted with executemany in chunks of
+IMPORT_CHUNK_SIZE, one transaction per chunk, together with a `chain_outbox`
+row per user. The outbox worker sends those registrations to UserAccounts
+without waiting on each receipt, and writes the block fields back to the
+user row once mined. A failing chunk is rolled back and reported without
+stopping the others.
+"""
+import csv
+import io
+import json
+import os
+import time
+
+import mysql.connector
+
+import id_sequence
+import outbox
+import user_directory
+from db import MYSQL_DATABASE, get_connection
+
+# users inserted (and committed) per executemany
+IMPORT_CHUNK_SIZE = int(os.environ.get('USER_IMPORT_CHUNK_SIZE', 500))
+# largest accepted import
+IMPORT_MAX_ROWS = int(os.environ.get('USER_IMPORT_MAX_ROWS', 20000))
+
+# form field -> users column
+FIELDS = {
+    'userType': 'user_type',
+    'nic': 'nic',
+    'fullName': 'full_name',
+    'companyRegisterNumber': 'company_register_number',
+    'companyName': 'company_name',
+    'address': 'address',
+    'district': 'district',
+    'contactNumber': 'contact_number',
+    'totalAreaOfPaddyLand': 'total_area',
+}
+
+# user types registered by name rather than by company
+_PERSON_TYPES = {'Farmer', 'Collecter', 'Retailer'}
+
+_INSERT = (
+    'INSERT INTO users (user_type, nic, full_name, company_register_number, company_name, address, district, '
+    'contact_number, total_area_of_paddy_land, id, password) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)'
+)
+
+
+def parse(text, fmt=None):
+    """Rows (dicts keyed by users column) from CSV or JSON lines; fmt is 'csv' or 'jsonl', else sniffed."""
+    if fmt is None:
+        fmt = 'jsonl' if text.lstrip().startswith('{') else 'csv'
+    if fmt == 'jsonl':
+        raw = []
+        for n, line in enumerate(text.splitlines(), 1):
+            if line.strip():
+                try:
+                    raw.append(json.loads(line))
+                except ValueError as e:
+                    raise ValueError(f'line {n}: {e}')
+    else:
+        raw = list(csv.DictReader(io.StringIO(text)))
+    rows = []
+    for r in raw:
+        if not isinstance(r, dict):
+            raise ValueError('every row must be an object')
+        rows.append({col: (str(r[key]).strip() if r.get(key) is not None else None) or None
+                     for key, col in FIELDS.items()})
+    return rows
+
+
+def validate(cur, rows, default_user_type=None):
+    """List of error strings per row (empty = valid)."""
+    errors = [[] for _ in rows]
+    seen_nics = {}
+    for i, row in enumerate(rows):
+        row['user_type'] = row['user_type'] or default_user_type
+        user_type = row['user_type']
+        if user_type not in id_sequence.PREFIXES:
+            errors[i].append(f'unknown userType {user_type!r}')
+        elif user_type in _PERSON_TYPES and not row['full_name']:
+            errors[i].append('fullName is required')
+        elif user_type not in _PERSON_TYPES and not (row['company_name'] or row['full_name']):
+            errors[i].append('companyName is required')
+        if not row['district']:
+            errors[i].append('district is required')
+        if row['total_area']:
+            try:
+                float(row['total_area'])
+            except ValueError:
+                errors[i].append('totalAreaOfPaddyLand must be a number')
+        if row['nic']:
+            if row['nic'] in seen_nics:
+                errors[i].append(f'duplicate nic (row {seen_nics[row["nic"]] + 1})')
+            else:
+                seen_nics[row['nic']] = i
+
+    # one round trip for NICs that are already registered
+    nics = list(seen_nics)
+    existing = set()
+    for start in range(0, len(nics), 1000):
+        chunk = nics[start:start + 1000]
+        cur.execute('SELECT nic FROM users WHERE nic IN ({})'.format(', '.join(['%s'] * len(chunk))), chunk)
+        existing.update(r[0] for r in cur.fetchall())
+    for nic in existing:
+        errors[seen_nics[nic]].append('nic is already registered')
+    return errors
+
+
+def run(rows, default_user_type=None):
+    """Validate and insert rows; returns the response body with per-row results."""
+    started = time.monotonic()
+    conn = get_connection(MYSQL_DATABASE)
+    cur = conn.cursor()
+    results = [{'row': i + 1, 'ok': False} for i in range(len(rows))]
+    try:
+        errors = validate(cur, rows, default_user_type)
+        valid = [i for i, errs in enumerate(errors) if not errs]
+        for i, errs in enumerate(errors):
+            if errs:
+                results[i]['errors'] = errs
+
+        # one id range per user type
+        by_type = {}
+        for i in valid:
+            by_type.setdefault(rows[i]['user_type'], []).append(i)
+        for user_type, indexes in by_type.items():
+            for i, user_id in zip(indexes, id_sequence.reserve_ids(user_type, len(indexes), cur)):
+                rows[i]['id'] = user_id
+
+        inserted = 0
+        for start in range(0, len(valid), IMPORT_CHUNK_SIZE):
+            chunk = valid[start:start + IMPORT_CHUNK_SIZE]
+            try:
+                conn.start_transaction()
+                cur.executemany(_INSERT, [
+                    (rows[i]['user_type'], rows[i]['nic'], rows[i]['full_name'], rows[i]['company_register_number'],
+                     rows[i]['company_name'], rows[i]['address'] or '', rows[i]['district'], rows[i]['contact_number'],
+                     rows[i]['total_area'], rows[i]['id'], '123456')
+                    for i in chunk
+                ])
+                outbox.enqueue_many(cur, 'user_registration', [(rows[i]['id'], rows[i]) for i in chunk])
+                conn.commit()
+            except mysql.connector.Error as e:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                for i in chunk:
+                    results[i]['errors'] = [f'insert failed: {e}']
+                continue
+            for i in chunk:
+                results[i].update({'ok': True, 'id': rows[i]['id'], 'chain': 'queued'})
+            inserted += len(chunk)
+    finally:
+        cur.close()
+        conn.close()
+    if inserted:
+        user_directory.invalidate()
+        outbox.notify()
+
+    seconds = time.monotonic() - started
+    return {
+        'ok': inserted == len(rows),
+        'total': len(rows),
+        'inserted': inserted,
+        'failed': len(rows) - inserted,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(inserted / seconds, 1) if seconds > 0 else None,
+        'results': results,
+    }